@@ -0,0 +1,154 @@
+"""
+Confidence signals for adaptive ensemble retrieval.
+
+For ingredient lists made of well-covered terms, dense vector search and
+BM25 already return mostly the same chunks, and the Cohere rerank leg (a
+network round trip) or multi-query expansion (an LLM call) adds latency
+for no gain. The adaptive ensemble measures how strongly the two cheap
+legs agree and only escalates to rerank/expansion when confidence is low.
+
+Signals:
+    agreement    fraction of the top-k chunks returned by both legs
+    dense_gap    similarity margin between the dense top-1 and k-th hit
+    top1_agree   the top hit of either leg appears in the other's top-k
+"""
+
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from backend.config import ADAPTIVE_AGREEMENT_THRESHOLD, ADAPTIVE_SCORE_GAP_THRESHOLD
+
+# Weight of the newest sample in the per-stage latency moving average
+_LATENCY_EWMA_ALPHA = 0.2
+
+
+@dataclass(frozen=True)
+class RetrievalConfidence:
+    """Agreement and score-gap signals between the dense and sparse legs."""
+    agreement: float
+    dense_gap: float
+    sparse_gap: float
+    top1_agree: bool
+    confident: bool
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def measure_confidence(
+    dense_hits: List[Tuple[Document, float]],
+    sparse_hits: List[Tuple[Document, float]],
+    k: int,
+    agreement_threshold: float = ADAPTIVE_AGREEMENT_THRESHOLD,
+    gap_threshold: float = ADAPTIVE_SCORE_GAP_THRESHOLD
+) -> RetrievalConfidence:
+    """
+    Compute confidence signals for one query.
+
+    Retrieval is confident when the legs share at least agreement_threshold
+    of their top-k, or when the dense top hit stands out by gap_threshold
+    and the legs agree on a top hit.
+
+    Args:
+        dense_hits: (document, similarity) pairs from vector search, best first
+        sparse_hits: (document, BM25 score) pairs, best first
+        k: Number of top hits compared
+        agreement_threshold: Minimum top-k overlap for confidence
+        gap_threshold: Minimum dense top-1 vs k-th similarity margin
+
+    Returns:
+        RetrievalConfidence
+    """
+    dense_top = [doc.page_content for doc, _ in dense_hits[:k]]
+    sparse_top = [doc.page_content for doc, score in sparse_hits[:k] if score > 0]
+    shared = len(set(dense_top) & set(sparse_top))
+    agreement = shared / min(k, max(len(dense_top), 1))
+
+    dense_scores = [score for _, score in dense_hits[:k]]
+    dense_gap = dense_scores[0] - dense_scores[-1] if len(dense_scores) > 1 else 0.0
+    sparse_scores = [score for _, score in sparse_hits[:k]]
+    sparse_gap = (
+        (sparse_scores[0] - sparse_scores[-1]) / sparse_scores[0]
+        if len(sparse_scores) > 1 and sparse_scores[0] > 0 else 0.0
+    )
+    top1_agree = bool(dense_top and sparse_top) and (
+        dense_top[0] in sparse_top or sparse_top[0] in dense_top
+    )
+    confident = agreement >= agreement_threshold or (dense_gap >= gap_threshold and top1_agree)
+    return RetrievalConfidence(
+        agreement=round(agreement, 3),
+        dense_gap=round(dense_gap, 4),
+        sparse_gap=round(sparse_gap, 4),
+        top1_agree=top1_agree,
+        confident=confident
+    )
+
+
+class AdaptiveRetrievalStats:
+    """Counts of the paths taken and the latency saved by skipping stages."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths: Dict[str, int] = {}
+        self._requests = 0
+        self._confident = 0
+        self._skipped: Dict[str, int] = {'rerank': 0, 'expansion': 0}
+        self._latency_ms: Dict[str, Optional[float]] = {'rerank': None, 'expansion': None}
+        self._saved_ms = 0.0
+
+    def record_stage(self, stage: str, duration_ms: float):
+        """Update the moving-average latency of an escalation stage that ran."""
+        with self._lock:
+            previous = self._latency_ms[stage]
+            self._latency_ms[stage] = duration_ms if previous is None else (
+                previous + _LATENCY_EWMA_ALPHA * (duration_ms - previous)
+            )
+
+    def record(self, path: str, confident: bool, skipped: List[str]) -> float:
+        """
+        Record one retrieval.
+
+        Args:
+            path: Path taken, e.g. "fast", "rerank" or "expand+rerank"
+            confident: Whether the signals were confident
+            skipped: Available escalation stages that were not run
+
+        Returns:
+            Estimated latency saved in milliseconds
+        """
+        with self._lock:
+            self._requests += 1
+            self._confident += int(confident)
+            self._paths[path] = self._paths.get(path, 0) + 1
+            saved = 0.0
+            for stage in skipped:
+                self._skipped[stage] += 1
+                saved += self._latency_ms[stage] or 0.0
+            self._saved_ms += saved
+            return saved
+
+    def stats(self) -> dict:
+        """
+        Get path counts and latency savings.
+
+        Returns:
+            Dictionary with requests, paths, skipped stages and latency saved
+        """
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'confident_ratio': self._confident / self._requests if self._requests else 0.0,
+                'paths': dict(self._paths),
+                'skipped': dict(self._skipped),
+                'stage_latency_ms': {
+                    stage: round(ms, 2) if ms is not None else None
+                    for stage, ms in self._latency_ms.items()
+                },
+                'estimated_latency_saved_ms': round(self._saved_ms, 2),
+            }
+
+
+adaptive_stats = AdaptiveRetrievalStats()
@@ -7,19 +7,241 @@ Implements multiple retrieval strategies that can be used individually or combin
 - Multi-Query (LLM-generated query expansion)
 - Compression with Cohere Rerank
 - Ensemble (combines multiple strategies)
+
+Each strategy imports its LangChain retriever classes (and Cohere) on
+first use, so a process only pays for the dependencies of the strategy
+it serves. STRATEGY_MODULES lists them for explicit warm-up.
+
+Chunks are kept in a ChunkStore shared by the BM25 index and the manager;
+retrievers that score chunks by position build Documents for their top k
+only.
 """
 
-from typing import List, Optional
-from langchain.retrievers import EnsembleRetriever, ParentDocumentRetriever
-from langchain.retrievers.contextual_compression import ContextualCompressionRetriever
-from langchain.retrievers.multi_query import MultiQueryRetriever
-from langchain.storage import InMemoryStore
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.retrievers import BM25Retriever
-from langchain_cohere import CohereRerank
+import threading
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
-from langchain_openai import ChatOpenAI
-from langchain_qdrant import QdrantVectorStore
+from langchain_core.retrievers import BaseRetriever
+
+from backend.adaptive_retrieval import adaptive_stats, measure_confidence
+from backend.chunk_store import ChunkDocstore, ChunkStore
+from backend.clients import client_registry
+from backend.config import ADAPTIVE_QUERY_EXPANSION, ADAPTIVE_RETRIEVAL_ENABLED, EMBEDDING_MODEL
+from backend.degradation import DegradationPolicy, RetrievalPlan, note_stage, record_decision
+from backend.instrumentation import span
+from backend.resilience import model_calls, remaining_budget
+
+if TYPE_CHECKING:
+    from langchain_qdrant import QdrantVectorStore
+
+# Modules imported on first use by each strategy's retrievers ("rerank" is
+# needed by the compression strategy and by ensembles with a Cohere key)
+STRATEGY_MODULES: Dict[str, Tuple[str, ...]] = {
+    'naive': (),
+    'bm25': ('rank_bm25',),
+    'multi_query': ('langchain.retrievers.multi_query',),
+    'compression': ('langchain.retrievers.contextual_compression',),
+    'ensemble': (
+        'rank_bm25',
+        'langchain.retrievers.ensemble',
+        'langchain.retrievers.multi_query',
+    ),
+    'rerank': ('langchain_cohere',),
+}
+
+
+class InstrumentedRetriever(BaseRetriever):
+    """Wraps a retriever to record its latency and document count."""
+    
+    retriever: Any
+    stage: str
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        with span(self.stage) as s:
+            docs = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+            s.set(documents=len(docs))
+        return docs
+
+
+class VectorSearchRetriever(BaseRetriever):
+    """Dense retriever that times query embedding and vector search separately."""
+    
+    vectorstore: Any
+    k: int = 5
+    embeddings: Any = None  # query embedder; None uses the vector store's own
+    
+    def search_with_scores(self, query: str) -> List[Tuple[Document, float]]:
+        """Search and return (document, similarity) pairs, best first."""
+        embeddings = self.embeddings or self.vectorstore.embeddings
+        with span("embed"):
+            embedding = model_calls.call("embedding", lambda: embeddings.embed_query(query))
+        with span("vector_search") as s:
+            hits = self.vectorstore.similarity_search_with_score_by_vector(embedding, k=self.k)
+            s.set(documents=len(hits))
+        return hits
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [doc for doc, _ in self.search_with_scores(query)]
+
+
+def bm25_tokens(text: str) -> List[str]:
+    """BM25 tokenization of chunks and queries (LangChain BM25Retriever's default)."""
+    return text.split()
+
+
+class ChunkBM25Retriever(BaseRetriever):
+    """BM25 over a ChunkStore; only the top k chunks are built as Documents."""
+    
+    vectorizer: Any
+    chunks: Any
+    k: int = 5
+    preprocess_func: Callable[[str], List[str]] = bm25_tokens
+    
+    def search_with_scores(self, query: str) -> List[Tuple[Document, float]]:
+        """Search and return (document, BM25 score) pairs, best first."""
+        import numpy as np
+        
+        scores = self.vectorizer.get_scores(self.preprocess_func(query))
+        top = np.argsort(-scores, kind='stable')[:self.k]
+        return [(self.chunks[int(i)], float(scores[i])) for i in top]
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [doc for doc, _ in self.search_with_scores(query)]
+
+
+@lru_cache(maxsize=None)
+def instrumented_cohere_rerank():
+    """The InstrumentedCohereRerank class (langchain_cohere is imported on first call)."""
+    from langchain_cohere import CohereRerank
+    
+    class InstrumentedCohereRerank(CohereRerank):
+        """
+        Cohere reranker that records rerank latency.
+        
+        Rerank runs under a deadline with hedging and a circuit breaker. If it
+        fails, times out or its circuit is open, the documents are returned in
+        retrieval order instead of failing the request.
+        """
+        
+        def compress_documents(self, documents, query, callbacks=None):
+            compress = super().compress_documents
+            with span("rerank") as s:
+                try:
+                    reranked = model_calls.call("rerank", lambda: compress(documents, query, callbacks))
+                except Exception as e:
+                    print(f"Warning: rerank skipped ({e}), using retrieval order")
+                    reranked = list(documents)[:self.top_n]
+                    s.set(skipped=True)
+                s.set(documents=len(reranked))
+            return reranked
+    
+    return InstrumentedCohereRerank
+
+
+def _fuse(ranked_lists: List[List[Document]], weights: List[float], c: int = 60) -> List[Document]:
+    """Weighted Reciprocal Rank Fusion, as used by EnsembleRetriever."""
+    scores = {}
+    first_seen = {}
+    for docs, weight in zip(ranked_lists, weights):
+        for rank, doc in enumerate(docs, start=1):
+            scores[doc.page_content] = scores.get(doc.page_content, 0.0) + weight / (rank + c)
+            first_seen.setdefault(doc.page_content, doc)
+    return [first_seen[content] for content in sorted(scores, key=lambda content: -scores[content])]
+
+
+class AdaptiveEnsembleRetriever(BaseRetriever):
+    """
+    Ensemble of dense and BM25 search that escalates only when they disagree.
+    
+    Both cheap legs always run. If their results agree strongly (see
+    backend/adaptive_retrieval.py) they are fused directly; otherwise
+    query expansion and/or Cohere reranking of the candidates run and
+    join the fusion as extra legs, like the static ensemble.
+    """
+    
+    dense: Any
+    sparse: Any
+    k: int = 5
+    reranker: Any = None
+    expander: Any = None
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense_hits = self.dense.search_with_scores(query)
+        with span("retriever.bm25") as s:
+            sparse_hits = self.sparse.search_with_scores(query)
+            s.set(documents=len(sparse_hits))
+        
+        confidence = measure_confidence(dense_hits, sparse_hits, self.k)
+        legs = [[doc for doc, _ in dense_hits], [doc for doc, _ in sparse_hits]]
+        path = []
+        skipped = []
+        
+        if confidence.confident:
+            skipped = [stage for stage, component in (('expansion', self.expander), ('rerank', self.reranker)) if component]
+        else:
+            if self.expander is not None:
+                start = time.perf_counter()
+                legs.append(self.expander.invoke(query, config={"callbacks": run_manager.get_child()}))
+                adaptive_stats.record_stage('expansion', (time.perf_counter() - start) * 1000)
+                path.append('expand')
+            if self.reranker is not None:
+                candidates = _fuse(legs, [1.0] * len(legs))
+                start = time.perf_counter()
+                legs.append(self.reranker.compress_documents(candidates, query))
+                adaptive_stats.record_stage('rerank', (time.perf_counter() - start) * 1000)
+                path.append('rerank')
+        
+        if self.expander is not None:
+            note_stage('query_expansion', 'expand' in path)
+        if self.reranker is not None:
+            note_stage('rerank', 'rerank' in path)
+        path_name = "+".join(path) or "fast"
+        saved_ms = adaptive_stats.record(path_name, confidence.confident, skipped)
+        print(
+            f"Adaptive retrieval: {path_name} (agreement {confidence.agreement:.2f}, "
+            f"dense gap {confidence.dense_gap:.3f}, saved ~{saved_ms:.0f} ms)"
+        )
+        return _fuse(legs, [1.0 / len(legs)] * len(legs))
+
+
+class DegradingRetriever(BaseRetriever):
+    """
+    Picks a cheaper retrieval plan per request when the budget or queue demands it.
+    
+    The configured retriever serves the full plan; degraded plans use
+    retrievers built (once) by AdvancedRetrievalManager.get_degraded_retriever().
+    """
+    
+    full_retriever: Any
+    manager: Any
+    strategy: str
+    policy: Any
+    queue_depth: Callable[[], int]
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        remaining = remaining_budget()
+        depth = self.queue_depth()
+        plan = self.policy.choose(remaining, depth)
+        record_decision(plan, self.strategy, bool(self.manager.cohere_api_key), remaining, depth)
+        if plan.level == "full":
+            retriever = self.full_retriever
+        else:
+            budget = f"{remaining:.1f}s" if remaining is not None else "unbounded"
+            print(f"Degraded retrieval: {plan.level} (budget left {budget}, queue depth {depth})")
+            retriever = self.manager.get_degraded_retriever(self.strategy, plan)
+        return retriever.invoke(query, config={"callbacks": run_manager.get_child()})
 
 
 class AdvancedRetrievalManager:
@@ -27,25 +249,107 @@ class AdvancedRetrievalManager:
     
     def __init__(
         self, 
-        vectorstore: QdrantVectorStore,
-        documents: List[Document],
+        vectorstore: "QdrantVectorStore",
+        documents: Iterable[Document],
         openai_api_key: str,
-        cohere_api_key: Optional[str] = None
+        cohere_api_key: Optional[str] = None,
+        embeddings: Any = None
     ):
         """
         Initialize the advanced retrieval manager.
         
         Args:
             vectorstore: Qdrant vector store
-            documents: Original documents for BM25
+            documents: Chunks for BM25, as a ChunkStore (other iterables
+                of Documents are copied into one)
             openai_api_key: OpenAI API key
             cohere_api_key: Cohere API key (optional, for reranking)
+            embeddings: Query embedder (defaults to the vector store's own)
         """
         self.vectorstore = vectorstore
-        self.documents = documents
+        self.documents = documents if isinstance(documents, ChunkStore) else ChunkStore.from_documents(documents)
         self.openai_api_key = openai_api_key
         self.cohere_api_key = cohere_api_key
-        self.llm = ChatOpenAI(model="gpt-4o-mini", api_key=openai_api_key)
+        self.embeddings = embeddings
+        self.llm = client_registry.chat_model(api_key=openai_api_key, model="gpt-4o-mini")
+        self._bm25_index: Optional[ChunkBM25Retriever] = None
+        self._bm25_lock = threading.Lock()
+        self.parent_docstore: Optional[ChunkDocstore] = None  # Parents of the parent document retriever, once built
+        self._degraded = {}
+        self._degraded_lock = threading.Lock()
+    
+    def for_tenant(self, openai_api_key: str, cohere_api_key: Optional[str] = None) -> "AdvancedRetrievalManager":
+        """
+        Get a manager for another tenant that shares this one's indexes.
+        
+        The vector store, chunks and BM25 index are shared read-only; only
+        the model clients (query embeddings, LLM, reranker) use the
+        tenant's own keys, so no document is re-embedded or re-tokenized.
+        
+        Args:
+            openai_api_key: Tenant's OpenAI API key
+            cohere_api_key: Tenant's Cohere API key (optional)
+            
+        Returns:
+            AdvancedRetrievalManager instance
+        """
+        tenant = AdvancedRetrievalManager(
+            vectorstore=self.vectorstore,
+            documents=self.documents,
+            openai_api_key=openai_api_key,
+            cohere_api_key=cohere_api_key,
+            embeddings=client_registry.embeddings(api_key=openai_api_key, model=EMBEDDING_MODEL)
+        )
+        tenant._bm25_index = self._get_bm25_index()
+        return tenant
+    
+    @property
+    def bm25_index(self) -> Optional[ChunkBM25Retriever]:
+        """The shared BM25 index, or None until a BM25 retriever is first built."""
+        return self._bm25_index
+    
+    def preload(self):
+        """Build the lazily created BM25 index now (e.g. before the server forks workers)."""
+        self._get_bm25_index()
+    
+    def _get_bm25_index(self) -> ChunkBM25Retriever:
+        """BM25 index over the chunks, built once and shared by every BM25 retriever."""
+        from rank_bm25 import BM25Okapi
+        
+        with self._bm25_lock:
+            if self._bm25_index is None:
+                self._bm25_index = ChunkBM25Retriever(
+                    vectorizer=BM25Okapi([bm25_tokens(text) for text in self.documents.texts()]),
+                    chunks=self.documents
+                )
+            return self._bm25_index
+    
+    def _sparse(self, k: int) -> ChunkBM25Retriever:
+        """BM25 retriever returning k documents from the shared index."""
+        index = self._get_bm25_index()
+        return ChunkBM25Retriever(
+            vectorizer=index.vectorizer,
+            chunks=index.chunks,
+            k=k,
+            preprocess_func=index.preprocess_func
+        )
+    
+    def _dense(self, k: int) -> VectorSearchRetriever:
+        """Vector search retriever returning k documents."""
+        return VectorSearchRetriever(vectorstore=self.vectorstore, k=k, embeddings=self.embeddings)
+    
+    def _instrument(self, retriever, name: str) -> InstrumentedRetriever:
+        """
+        Wrap a retriever so its latency and document count are recorded.
+        
+        Args:
+            retriever: Retriever to wrap
+            name: Strategy name, recorded as stage "retriever.<name>"
+            
+        Returns:
+            InstrumentedRetriever instance
+        """
+        return InstrumentedRetriever(retriever=retriever, stage=f"retriever.{name}")
         
     def get_naive_retriever(self, k: int = 5):
         """
@@ -57,7 +361,7 @@ class AdvancedRetrievalManager:
         Returns:
             Retriever instance
         """
-        return self.vectorstore.as_retriever(search_kwargs={"k": k})
+        return self._instrument(self._dense(k), "naive")
     
     def get_bm25_retriever(self, k: int = 5):
         """
@@ -67,9 +371,9 @@ class AdvancedRetrievalManager:
             k: Number of documents to retrieve
             
         Returns:
-            BM25Retriever instance
+            ChunkBM25Retriever instance
         """
-        return BM25Retriever.from_documents(self.documents, k=k)
+        return self._instrument(self._sparse(k), "bm25")
     
     def get_multi_query_retriever(self, k: int = 5):
         """
@@ -84,10 +388,20 @@ class AdvancedRetrievalManager:
         Returns:
             MultiQueryRetriever instance
         """
-        base_retriever = self.vectorstore.as_retriever(search_kwargs={"k": k})
-        return MultiQueryRetriever.from_llm(
-            retriever=base_retriever,
-            llm=self.llm
+        from langchain.retrievers.multi_query import MultiQueryRetriever
+        
+        base_retriever = self._dense(k)
+        return self._instrument(
+            MultiQueryRetriever.from_llm(retriever=base_retriever, llm=self.llm),
+            "multi_query"
+        )
+    
+    def _get_reranker(self, top_n: int):
+        """Cohere reranker on the shared client."""
+        return instrumented_cohere_rerank()(
+            model="rerank-english-v3.0",
+            client=client_registry.cohere_client(self.cohere_api_key),
+            top_n=top_n
         )
     
     def get_compression_retriever(self, k: int = 10, top_n: int = 5):
@@ -108,18 +422,19 @@ class AdvancedRetrievalManager:
             print("Warning: Cohere API key not provided. Compression retriever unavailable.")
             return None
         
-        base_retriever = self.vectorstore.as_retriever(search_kwargs={"k": k})
+        from langchain.retrievers.contextual_compression import ContextualCompressionRetriever
         
-        # Cohere Rerank for compression
-        compressor = CohereRerank(
-            model="rerank-english-v3.0",
-            cohere_api_key=self.cohere_api_key,
-            top_n=top_n
-        )
+        base_retriever = self._dense(k)
         
-        return ContextualCompressionRetriever(
-            base_compressor=compressor,
-            base_retriever=base_retriever
+        # Cohere Rerank for compression
+        compressor = self._get_reranker(top_n)
+        
+        return self._instrument(
+            ContextualCompressionRetriever(
+                base_compressor=compressor,
+                base_retriever=base_retriever
+            ),
+            "compression"
         )
     
     def get_parent_document_retriever(
@@ -142,6 +457,9 @@ class AdvancedRetrievalManager:
         Returns:
             ParentDocumentRetriever instance
         """
+        from langchain.retrievers import ParentDocumentRetriever
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        
         # Child splitter for search
         child_splitter = RecursiveCharacterTextSplitter(
             chunk_size=child_chunk_size,
@@ -154,8 +472,9 @@ class AdvancedRetrievalManager:
             chunk_overlap=200
         )
         
-        # In-memory store for parent documents
-        store = InMemoryStore()
+        # Compact store for parent documents
+        store = ChunkDocstore()
+        self.parent_docstore = store
         
         retriever = ParentDocumentRetriever(
             vectorstore=self.vectorstore,
@@ -168,13 +487,15 @@ class AdvancedRetrievalManager:
         # Add documents
         retriever.add_documents(self.documents)
         
-        return retriever
+        return self._instrument(retriever, "parent_document")
     
     def get_ensemble_retriever(
         self, 
         k: int = 5,
         use_compression: bool = True,
-        weights: Optional[List[float]] = None
+        weights: Optional[List[float]] = None,
+        adaptive: bool = False,
+        use_expansion: bool = False
     ):
         """
         Get ensemble retriever that combines multiple strategies.
@@ -182,14 +503,40 @@ class AdvancedRetrievalManager:
         Combines naive vector search, BM25, and optionally compression
         using Reciprocal Rank Fusion (RRF).
         
+        In adaptive mode, compression (and multi-query expansion, if
+        use_expansion) only run for queries where dense and BM25 results
+        disagree; custom weights are not supported there.
+        
         Args:
             k: Number of documents to retrieve per retriever
             use_compression: Whether to include compression retriever
             weights: Custom weights for each retriever (must sum to 1.0)
+            adaptive: Escalate to rerank/expansion only on low confidence
+            use_expansion: Allow multi-query expansion in adaptive mode
             
         Returns:
-            EnsembleRetriever instance
+            EnsembleRetriever (or AdaptiveEnsembleRetriever) instance
         """
+        if adaptive and weights is None:
+            reranker = self._get_reranker(top_n=k) if use_compression and self.cohere_api_key else None
+            expander = self.get_multi_query_retriever(k=k) if use_expansion else None
+            print(
+                f"Creating adaptive ensemble (dense + BM25; rerank: {reranker is not None}, "
+                f"expansion: {expander is not None} on low confidence)"
+            )
+            return self._instrument(
+                AdaptiveEnsembleRetriever(
+                    dense=self._dense(k),
+                    sparse=self._sparse(k),
+                    k=k,
+                    reranker=reranker,
+                    expander=expander
+                ),
+                "ensemble"
+            )
+        
+        from langchain.retrievers.ensemble import EnsembleRetriever
+        
         # Build list of retrievers
         retrievers = []
         
@@ -225,9 +572,73 @@ class AdvancedRetrievalManager:
         if len(retrievers) > 2:
             print(f"  3. Cohere Rerank (weight: {weights[2]:.2f})")
         
-        return EnsembleRetriever(
-            retrievers=retrievers,
-            weights=weights
+        return self._instrument(
+            EnsembleRetriever(retrievers=retrievers, weights=weights),
+            "ensemble"
+        )
+    
+    def get_degraded_retriever(self, strategy: str, plan: RetrievalPlan):
+        """
+        Get the retriever for a strategy under a degraded plan.
+        
+        Retrievers are built on first use and reused afterwards.
+        
+        Args:
+            strategy: Configured retrieval strategy
+            plan: Degraded retrieval plan
+            
+        Returns:
+            Retriever instance
+        """
+        key = (strategy, plan.level)
+        with self._degraded_lock:
+            retriever = self._degraded.get(key)
+            if retriever is not None:
+                return retriever
+            
+            k = plan.k
+            if not plan.dense or strategy == 'bm25':
+                retriever = self.get_bm25_retriever(k=k)
+            elif strategy == 'naive':
+                retriever = self.get_naive_retriever(k=k)
+            elif strategy == 'multi_query':
+                retriever = self.get_multi_query_retriever(k=k) if plan.query_expansion else self.get_naive_retriever(k=k)
+            elif strategy == 'compression':
+                retriever = None
+                if plan.rerank:
+                    retriever = self.get_compression_retriever(k=k*2, top_n=k)
+                if retriever is None:
+                    retriever = self.get_naive_retriever(k=k)
+            else:
+                retriever = self.get_ensemble_retriever(
+                    k=k,
+                    use_compression=plan.rerank,
+                    adaptive=ADAPTIVE_RETRIEVAL_ENABLED,
+                    use_expansion=ADAPTIVE_QUERY_EXPANSION and plan.query_expansion
+                )
+            
+            self._degraded[key] = retriever
+            return retriever
+    
+    def get_degrading_retriever(self, retriever, strategy: str, policy: DegradationPolicy, queue_depth: Callable[[], int]):
+        """
+        Wrap the configured retriever with SLO-aware degradation.
+        
+        Args:
+            retriever: Retriever for the full plan
+            strategy: Configured retrieval strategy
+            policy: Degradation policy
+            queue_depth: Function returning the number of analyses in flight
+            
+        Returns:
+            DegradingRetriever instance
+        """
+        return DegradingRetriever(
+            full_retriever=retriever,
+            manager=self,
+            strategy=strategy,
+            policy=policy,
+            queue_depth=queue_depth
         )
     
     def compare_retrievers(self, query: str, k: int = 5):
@@ -0,0 +1,192 @@
+"""
+Analysis cache for the KidSafe Food Analyzer.
+
+Finished ingredient analyses are kept in an in-memory LRU keyed by the
+retrieval strategy, product name and canonical ingredient list (see
+backend/ingredients.py), so casing, filler and typos in the label text
+do not split one product across entries. The cache can be
+backed by a SQLite file so entries survive restarts.
+
+Keys carry CACHE_KEY_VERSION. Bump it whenever the key inputs or the
+ingredient normalization change, so a persisted cache never serves an
+entry stored under the old meaning of a key.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from backend.ingredients import normalize_ingredients
+
+# 1: raw ingredient text; 2: canonical ingredient list from backend/ingredients.py
+CACHE_KEY_VERSION = 2
+
+
+def make_cache_key(retrieval_strategy: str, cereal_name: str, ingredients: str) -> str:
+    """
+    Build the cache key for an analysis request.
+
+    Args:
+        retrieval_strategy: Name of the retrieval strategy in use
+        cereal_name: Name of the cereal product
+        ingredients: Comma-separated list of ingredients
+
+    Returns:
+        "v<CACHE_KEY_VERSION>:" followed by a hex digest identifying the analysis
+    """
+    normalized = "\x1f".join([
+        retrieval_strategy,
+        " ".join(cereal_name.lower().split()),
+        normalize_ingredients(ingredients).text,
+    ])
+    return f"v{CACHE_KEY_VERSION}:" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Thread-safe LRU cache of analyses with optional SQLite persistence."""
+
+    def __init__(self, max_entries: int = 1024, persist_path: Optional[str] = None):
+        """
+        Initialize the analysis cache.
+
+        Args:
+            max_entries: Maximum number of analyses held in memory
+            persist_path: Optional SQLite file used to persist analyses
+        """
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+        if persist_path:
+            self._db = sqlite3.connect(str(persist_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "key TEXT PRIMARY KEY, analysis TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT key, analysis FROM analyses ORDER BY updated_at DESC LIMIT ?",
+                (max_entries,)
+            ).fetchall()
+            for key, analysis in reversed(rows):
+                self._entries[key] = analysis
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up an analysis, promoting it to most recently used.
+
+        Args:
+            key: Cache key from make_cache_key()
+
+        Returns:
+            Cached analysis or None
+        """
+        with self._lock:
+            analysis = self._entries.get(key)
+            if analysis is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT analysis FROM analyses WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    analysis = row[0]
+                    self._store(key, analysis)
+            if analysis is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return analysis
+
+    def set(self, key: str, analysis: str):
+        """
+        Store an analysis.
+
+        Args:
+            key: Cache key from make_cache_key()
+            analysis: Analysis text to cache
+        """
+        with self._lock:
+            self._store(key, analysis)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO analyses (key, analysis, updated_at) VALUES (?, ?, ?)",
+                    (key, analysis, time.time())
+                )
+                self._db.commit()
+
+    def peek(self, key: str) -> Optional[str]:
+        """Look up an analysis without touching hit/miss counters or LRU order."""
+        with self._lock:
+            analysis = self._entries.get(key)
+            if analysis is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT analysis FROM analyses WHERE key = ?", (key,)
+                ).fetchone()
+                analysis = row[0] if row else None
+            return analysis
+
+    def contains(self, key: str) -> bool:
+        """Check for an analysis without touching hit/miss counters or LRU order."""
+        with self._lock:
+            if key in self._entries:
+                return True
+            if self._db is None:
+                return False
+            row = self._db.execute(
+                "SELECT 1 FROM analyses WHERE key = ?", (key,)
+            ).fetchone()
+            return row is not None
+
+    def clear(self):
+        """Drop every cached analysis, including persisted ones."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM analyses")
+                self._db.commit()
+
+    def reopen(self):
+        """Open a new SQLite connection (in a forked child; the parent's must not be shared)."""
+        with self._lock:
+            if self.persist_path:
+                self._db = sqlite3.connect(str(self.persist_path), check_same_thread=False)
+
+    def memory_roots(self) -> list:
+        """Objects holding the cached analyses, for memory accounting."""
+        return [self._entries]
+
+    def stats(self) -> dict:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with entry count, hits, misses and hit ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'persistent': self._db is not None,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _store(self, key: str, analysis: str):
+        """Insert into the in-memory LRU. Caller must hold the lock."""
+        self._entries[key] = analysis
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
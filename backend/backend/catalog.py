@@ -0,0 +1,276 @@
+"""
+In-memory product catalog with change detection.
+
+The catalog file used to be re-opened and re-parsed on every request to
+/ and /api/cereals. ProductCatalog loads it once (CSV, JSON Lines or
+Parquet, streamed into a columnar CatalogStore) and keeps an immutable
+CatalogSnapshot holding the store, an ETag and, for catalogs of up to
+CATALOG_FULL_LIST_MAX_PRODUCTS products, the serialized JSON body and its
+gzip (and, if the optional brotli package is installed, brotli)
+encodings. Larger catalogs are streamed from the store on request. The
+file is stat()ed at most once per check_interval; a changed mtime or size
+triggers a content hash, and the catalog is only reloaded when the hash
+differs.
+
+Checks and reloads run outside the catalog lock, one at a time: the new
+snapshot is built first and then swapped in, so while one request reloads
+the file every other request keeps being served the previous snapshot.
+Only the very first load makes callers wait. If a reload fails, the
+previous snapshot stays current and the next check tries again.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional, Tuple
+
+from backend.config import (
+    CATALOG_CHECK_INTERVAL_SECONDS,
+    CATALOG_FULL_LIST_MAX_PRODUCTS,
+    CATALOG_GZIP_LEVEL,
+    CATALOG_MIN_COMPRESS_BYTES,
+    CATALOG_PATH
+)
+from backend.catalog_search import CatalogSearchIndex
+from backend.catalog_store import CatalogStore, load_catalog_store
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is used without it
+    brotli = None
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """One loaded version of the catalog file and its precomputed responses."""
+    store: CatalogStore
+    etag: str
+    bodies: Dict[Optional[str], bytes]  # content-encoding (None = identity) -> body; empty if streamed
+    digest: str
+    loaded_at: float = field(default_factory=time.time)
+
+
+def file_digest(path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stream_catalog_json(store: CatalogStore, batch_size: int = 1000) -> Iterator[bytes]:
+    """
+    Serialize the catalog as a JSON array, a batch of products at a time.
+
+    Args:
+        store: Catalog to serialize
+        batch_size: Products per yielded chunk
+
+    Yields:
+        Chunks of the same JSON body the precomputed path serves
+    """
+    yield b'['
+    for start in range(0, len(store), batch_size):
+        products = [store[i] for i in range(start, min(start + batch_size, len(store)))]
+        chunk = json.dumps(products, separators=(',', ':'))[1:-1]
+        yield (chunk if start == 0 else ',' + chunk).encode('utf-8')
+    yield b']'
+
+
+def choose_encoding(accept_encoding: str, available) -> Optional[str]:
+    """
+    Pick the best content-encoding the client accepts.
+
+    Args:
+        accept_encoding: Accept-Encoding request header
+        available: Encodings with a precomputed body
+
+    Returns:
+        "br", "gzip" or None for identity
+    """
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        name, *params = part.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip())
+    for encoding in ('br', 'gzip'):
+        if encoding in available and (encoding in accepted or '*' in accepted):
+            return encoding
+    return None
+
+
+class ProductCatalog:
+    """Catalog loaded once and reloaded only when the file content changes."""
+
+    def __init__(self, path=CATALOG_PATH, check_interval: float = CATALOG_CHECK_INTERVAL_SECONDS):
+        """
+        Initialize the catalog (the file is read on first use).
+
+        Args:
+            path: Catalog file (.csv, .jsonl/.ndjson or .parquet/.pq)
+            check_interval: Minimum seconds between stat() checks of the file
+        """
+        self.path = str(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()  # Guards the snapshot swap and counters, never held during I/O
+        self._refresh_lock = threading.Lock()  # Held by the one thread checking or reloading the file
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._signature: Optional[Tuple[int, int]] = None  # (mtime_ns, size)
+        self._next_check = 0.0
+        self._search_index = None
+        self._search_lock = threading.Lock()
+        self._stats = {
+            'loads': 0, 'failed_loads': 0, 'stat_checks': 0, 'hash_checks': 0, 'unchanged_rewrites': 0,
+            'load_ms': None,
+        }
+
+    def snapshot(self) -> CatalogSnapshot:
+        """
+        Get the current catalog, reloading it if the file changed.
+
+        Returns:
+            CatalogSnapshot
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+        if snapshot is None:
+            # First load: there is nothing to serve until it is done
+            with self._refresh_lock:
+                if self._snapshot is None:
+                    self._refresh()
+            return self._snapshot
+        if self._refresh_lock.acquire(blocking=False):
+            try:
+                if time.monotonic() >= self._next_check:
+                    self._refresh()
+            finally:
+                self._refresh_lock.release()
+        # Another request is checking or reloading: serve the current snapshot meanwhile
+        return self._snapshot
+
+    def products(self) -> CatalogStore:
+        """The catalog: a sequence of {'brand', 'ingredients'} dicts indexed by product ID."""
+        return self.snapshot().store
+
+    def search_index(self) -> Tuple[CatalogSnapshot, CatalogSearchIndex]:
+        """
+        Get the search indexes for the current catalog, building them on first use.
+
+        Returns:
+            Tuple of (snapshot, CatalogSearchIndex built from it)
+        """
+        snapshot = self.snapshot()
+        index = self._search_index
+        if index is not None and index.version == snapshot.etag:
+            return snapshot, index
+        with self._search_lock:
+            index = self._search_index
+            if index is None or index.version != snapshot.etag:
+                index = CatalogSearchIndex(snapshot.store, version=snapshot.etag)
+                self._search_index = index
+                print(f"Built catalog search index in {index.build_ms} ms")
+            return snapshot, index
+
+    def memory_roots(self) -> list:
+        """The loaded snapshot (store and precomputed bodies), for memory accounting."""
+        snapshot = self._snapshot
+        return [snapshot] if snapshot is not None else []
+
+    def current_search_index(self) -> Optional[CatalogSearchIndex]:
+        """The search index if it has been built (without building it)."""
+        return self._search_index
+
+    def stats(self) -> dict:
+        """
+        Get catalog statistics.
+
+        Returns:
+            Dictionary with product count, store sizes, body sizes per
+            encoding, ETag and load/check counters
+        """
+        snapshot = self._snapshot
+        with self._lock:
+            stats = dict(self._stats)
+        if snapshot is not None:
+            stats['products'] = len(snapshot.store)
+            stats['store'] = snapshot.store.stats()
+            stats['etag'] = snapshot.etag
+            stats['bytes'] = {encoding or 'identity': len(body) for encoding, body in snapshot.bodies.items()}
+            stats['streamed'] = not snapshot.bodies
+            stats['loaded_at'] = snapshot.loaded_at
+        index = self._search_index
+        if index is not None:
+            stats['search_index'] = index.stats()
+        return stats
+
+    def _refresh(self):
+        """Check the file and swap in a new snapshot if it changed (called holding _refresh_lock)."""
+        current = self._snapshot
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            self._stats['stat_checks'] += 1
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if current is not None and signature == self._signature:
+                return
+
+            digest = file_digest(self.path)
+            if current is not None and digest == current.digest:
+                # Touched or rewritten with identical content: nothing to reload
+                with self._lock:
+                    self._signature = signature
+                    self._stats['hash_checks'] += 1
+                    self._stats['unchanged_rewrites'] += 1
+                return
+
+            start = time.perf_counter()
+            snapshot = self._build(self.path, digest)
+        except Exception as e:
+            if current is None:
+                raise
+            with self._lock:
+                self._stats['failed_loads'] += 1
+            print(f"Warning: catalog reload failed ({e}), serving the previous version")
+            return
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._signature = signature
+            if current is not None:
+                self._stats['hash_checks'] += 1
+            self._stats['loads'] += 1
+            self._stats['load_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        print(f"Loaded catalog: {len(snapshot.store)} products from {self.path}")
+
+    @staticmethod
+    def _build(path: str, digest: str) -> CatalogSnapshot:
+        store = load_catalog_store(path)
+        bodies: Dict[Optional[str], bytes] = {}
+        if len(store) <= CATALOG_FULL_LIST_MAX_PRODUCTS:
+            body = b''.join(stream_catalog_json(store))
+            bodies[None] = body
+            if len(body) >= CATALOG_MIN_COMPRESS_BYTES:
+                bodies['gzip'] = gzip.compress(body, compresslevel=CATALOG_GZIP_LEVEL, mtime=0)
+                if brotli is not None:
+                    bodies['br'] = brotli.compress(body, quality=5)
+        return CatalogSnapshot(
+            store=store,
+            etag=digest[:32],
+            bodies=bodies,
+            digest=digest
+        )
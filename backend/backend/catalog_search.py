@@ -0,0 +1,321 @@
+"""
+Prebuilt in-memory indexes for searching large product catalogs.
+
+Built once per catalog version (see ProductCatalog.search_index()):
+
+    sorted names     normalized brand names in sorted order, for prefix
+                     search by binary search (alphabetical results)
+    word postings    brand word -> sorted array of product IDs
+    delete index     each brand word with one character removed -> words,
+                     for typo-tolerant (one edit) fuzzy search
+    ingredients      normalized ingredient -> sorted array of product IDs,
+                     plus word -> ingredients for "contains" queries. Each
+                     ingredient is indexed as written and under its
+                     canonical names (backend/ingredients.py), so
+                     "riboflavin" finds a label that says "Roboflavin"
+
+Product IDs are positions in the catalog. Prefix results are returned in
+alphabetical order; fuzzy and ingredient-only searches in product ID
+order, so every search resumes from a cursor without recomputing
+earlier pages.
+"""
+
+import base64
+import heapq
+import re
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from backend.catalog_store import CatalogStore
+from backend.config import CATALOG_FUZZY_MIN_WORD_LENGTH
+from backend.ingredients import get_normalizer
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+# Result orderings, recorded in cursors
+ALPHABETICAL = "a"
+BY_ID = "i"
+
+
+class InvalidCursorError(ValueError):
+    """Raised for a malformed cursor or one from another catalog version or ordering."""
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_PUNCTUATION.sub("", text.lower()).split())
+
+
+def _deletes(word: str) -> Iterable[str]:
+    """The word and every variant with one character removed."""
+    yield word
+    for i in range(len(word)):
+        yield word[:i] + word[i + 1:]
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if a and b differ by at most one insertion, deletion, substitution or transposition."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:])
+    return a[i + 1:] == b[i:] if len(a) > len(b) else a[i:] == b[i + 1:]
+
+
+def _contains(postings: array, product_id: int) -> bool:
+    i = bisect_left(postings, product_id)
+    return i < len(postings) and postings[i] == product_id
+
+
+def _iter_from(postings: array, start: int) -> Iterator[int]:
+    for i in range(bisect_left(postings, start), len(postings)):
+        yield postings[i]
+
+
+class _AnyOf:
+    """Union of posting lists: iterated in ID order, tested by binary search."""
+
+    def __init__(self, postings: List[array]):
+        self.postings = postings
+        self.size = sum(len(p) for p in postings)
+
+    def iter_from(self, start: int) -> Iterator[int]:
+        if len(self.postings) == 1:
+            yield from _iter_from(self.postings[0], start)
+            return
+        previous = None
+        for product_id in heapq.merge(*(_iter_from(p, start) for p in self.postings)):
+            if product_id != previous:
+                yield product_id
+                previous = product_id
+
+    def contains(self, product_id: int) -> bool:
+        return any(_contains(p, product_id) for p in self.postings)
+
+
+def encode_cursor(version: str, ordering: str, position: int) -> str:
+    """Opaque cursor for resuming a search."""
+    return base64.urlsafe_b64encode(f"{version}:{ordering}:{position}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, version: str, ordering: str) -> int:
+    """
+    Position stored in a cursor.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed or was issued for
+            another catalog version or result ordering
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_version, cursor_ordering, position = base64.urlsafe_b64decode(padded).decode().rsplit(":", 2)
+        position = int(position)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursorError("Malformed cursor")
+    if cursor_version != version:
+        raise InvalidCursorError("The catalog changed since this cursor was issued; restart the search")
+    if cursor_ordering != ordering or position < 0:
+        raise InvalidCursorError("Cursor does not belong to this search")
+    return position
+
+
+class CatalogSearchIndex:
+    """Prefix, fuzzy and ingredient indexes over one catalog version."""
+
+    def __init__(self, store: CatalogStore, version: str = ""):
+        """
+        Build the indexes.
+
+        Args:
+            store: Catalog to index
+            version: Catalog version (e.g. its ETag), embedded in cursors
+        """
+        start = time.perf_counter()
+        self.version = version
+        # Brands and ingredients are interned in the store: normalize each distinct one once
+        normalized_brands: Dict[str, str] = {}
+        self._names = []
+        for brand in store.brands:
+            name = normalized_brands.get(brand)
+            if name is None:
+                name = normalized_brands[brand] = normalize_text(brand)
+            self._names.append(name)
+        self._normalizer = get_normalizer()
+        phrases_of = [
+            {normalize_text(name), *self._normalizer.canonical(name)} - {""}
+            for name in store.vocabulary
+        ]
+        order = sorted(range(len(self._names)), key=self._names.__getitem__)
+        self._sorted_names = [self._names[i] for i in order]
+        self._sorted_ids = array('I', order)
+
+        words: Dict[str, array] = {}
+        phrases: Dict[str, array] = {}
+        for product_id, name in enumerate(self._names):
+            for word in set(name.split()):
+                words.setdefault(word, array('I')).append(product_id)
+            product_phrases = set()
+            for i in store.ingredient_ids(product_id):
+                product_phrases.update(phrases_of[i])
+            for phrase in product_phrases:
+                phrases.setdefault(phrase, array('I')).append(product_id)
+        self._word_postings = words
+        self._ingredient_postings = phrases
+
+        self._deletes: Dict[str, List[str]] = {}
+        for word in words:
+            if len(word) >= CATALOG_FUZZY_MIN_WORD_LENGTH:
+                for variant in set(_deletes(word)):
+                    self._deletes.setdefault(variant, []).append(word)
+
+        self._phrases_by_word: Dict[str, List[str]] = {}
+        for phrase in phrases:
+            for word in set(phrase.split()):
+                self._phrases_by_word.setdefault(word, []).append(phrase)
+        self.build_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def search(
+        self,
+        query: str = "",
+        fuzzy: bool = False,
+        ingredients: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Tuple[int, Optional[int]]], Optional[str]]:
+        """
+        Search the catalog.
+
+        Args:
+            query: Brand name prefix, or brand words when fuzzy
+            fuzzy: Match every query word against brand words with up to
+                one typo (words shorter than CATALOG_FUZZY_MIN_WORD_LENGTH
+                must match exactly)
+            ingredients: Products must contain each of these (an
+                ingredient matches if it contains the query's words in order)
+            exclude: Products must contain none of these
+            limit: Page size
+            cursor: Cursor from the previous page
+
+        Returns:
+            Tuple of ([(product ID, edit distance or None)], next cursor or None)
+
+        Raises:
+            InvalidCursorError: If the cursor is invalid for this search
+        """
+        query = normalize_text(query)
+        required = [self._ingredient_matches(text) for text in ingredients]
+        excluded = [self._ingredient_matches(text) for text in exclude]
+        if any(source is None for source in required):
+            return [], None  # An unknown ingredient matches nothing
+        excluded = [source for source in excluded if source is not None]
+
+        if query and fuzzy:
+            distances = []
+            for word in query.split():
+                matches = self._fuzzy_words(word)
+                if not matches:
+                    return [], None
+                distances.append(matches)
+                required.append(_AnyOf([self._word_postings[w] for w in matches]))
+            return self._search_by_id(required, excluded, limit, cursor, distances)
+        if not query and required:
+            return self._search_by_id(required, excluded, limit, cursor)
+        return self._search_prefix(query, required, excluded, limit, cursor)
+
+    def stats(self) -> dict:
+        """
+        Get index sizes.
+
+        Returns:
+            Dictionary with products, brand words, ingredients and build time
+        """
+        return {
+            'products': len(self._names),
+            'brand_words': len(self._word_postings),
+            'ingredients': len(self._ingredient_postings),
+            'build_ms': self.build_ms,
+        }
+
+    def _ingredient_matches(self, text: str) -> Optional[_AnyOf]:
+        """Products whose ingredients contain the given ingredient words, in order."""
+        needle = normalize_text(text)
+        if not needle:
+            return None
+        postings = self._phrase_postings(needle)
+        # Also match the query's canonical name, for typos and aliases ("thiamine" -> "thiamin")
+        canonical = " ".join(self._normalizer.canonical(text))
+        if canonical and canonical != needle:
+            postings += [p for p in self._phrase_postings(canonical) if all(p is not q for q in postings)]
+        return _AnyOf(postings) if postings else None
+
+    def _phrase_postings(self, needle: str) -> List[array]:
+        candidates = None
+        for word in needle.split():
+            phrases = self._phrases_by_word.get(word)
+            if not phrases:
+                return []
+            candidates = phrases if candidates is None or len(phrases) < len(candidates) else candidates
+        padded = f" {needle} "
+        return [self._ingredient_postings[p] for p in candidates if padded in f" {p} "]
+
+    def _fuzzy_words(self, word: str) -> Dict[str, int]:
+        """Brand words within one edit of a query word, with their distance."""
+        if len(word) < CATALOG_FUZZY_MIN_WORD_LENGTH:
+            return {word: 0} if word in self._word_postings else {}
+        matches = {}
+        for variant in set(_deletes(word)):
+            for candidate in self._deletes.get(variant, ()):
+                if candidate not in matches and _within_one_edit(word, candidate):
+                    matches[candidate] = 0 if candidate == word else 1
+        return matches
+
+    def _search_prefix(self, prefix, required, excluded, limit, cursor):
+        if cursor:
+            position = decode_cursor(cursor, self.version, ALPHABETICAL)
+        else:
+            position = bisect_left(self._sorted_names, prefix)
+        results = []
+        names = self._sorted_names
+        while position < len(names) and names[position].startswith(prefix):
+            product_id = self._sorted_ids[position]
+            if self._accepts(product_id, required, excluded):
+                if len(results) == limit:
+                    return results, encode_cursor(self.version, ALPHABETICAL, position)
+                results.append((product_id, None))
+            position += 1
+        return results, None
+
+    def _search_by_id(self, required, excluded, limit, cursor, distances=None):
+        start = decode_cursor(cursor, self.version, BY_ID) if cursor else 0
+        # Drive the scan from the smallest set and test membership in the rest
+        driver = min(required, key=lambda source: source.size)
+        others = [source for source in required if source is not driver]
+        results = []
+        for product_id in driver.iter_from(start):
+            if self._accepts(product_id, others, excluded):
+                if len(results) == limit:
+                    return results, encode_cursor(self.version, BY_ID, product_id)
+                results.append((product_id, self._distance(product_id, distances)))
+        return results, None
+
+    def _distance(self, product_id: int, distances: Optional[List[Dict[str, int]]]) -> Optional[int]:
+        if distances is None:
+            return None
+        words = self._names[product_id].split()
+        return sum(min(matches[w] for w in words if w in matches) for matches in distances)
+
+    @staticmethod
+    def _accepts(product_id: int, required, excluded) -> bool:
+        return (all(source.contains(product_id) for source in required)
+                and not any(source.contains(product_id) for source in excluded))
@@ -0,0 +1,287 @@
+"""
+Columnar product catalog store and streaming readers.
+
+A catalog of millions of products held as a list of dicts costs several
+hundred bytes per product, mostly in per-dict and per-string overhead.
+CatalogStore keeps the same data in a few columns:
+
+    brands           list of brand names (identical names share one string)
+    vocabulary       each distinct ingredient once; products refer to it by ID
+    offsets          array('I'): product i's ingredient IDs are
+                     ingredient_ids[offsets[i]:offsets[i + 1]]
+    ingredient_ids   array('I') of all products' ingredient IDs, concatenated
+
+The ingredient text of a product is rebuilt by joining its ingredients
+with ", ". Texts that would not round-trip exactly (other spacing, empty
+entries) are kept verbatim, so the catalog reproduces the source text and
+analysis cache keys stay stable.
+
+Catalog files are read one row at a time from CSV, JSON Lines or Parquet
+(Parquet needs the optional pyarrow package), so loading never holds the
+raw file or intermediate rows in memory.
+"""
+
+import csv
+import json
+import os
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# Accepted column names, in order of preference
+BRAND_FIELDS = ('Brand_Name', 'brand')
+INGREDIENT_FIELDS = ('Ingredients', 'ingredients')
+
+INGREDIENT_SEPARATOR = ", "
+
+
+class CatalogStore:
+    """Read-only columnar catalog; product IDs are row positions."""
+
+    def __init__(
+        self,
+        brands: List[str],
+        vocabulary: List[str],
+        offsets: array,
+        ingredient_ids: array,
+        verbatim: Dict[int, str]
+    ):
+        """
+        Initialize the store (use CatalogStoreBuilder or load_catalog_store).
+
+        Args:
+            brands: Brand name per product ID
+            vocabulary: Ingredient name per ingredient ID
+            offsets: Start of each product's ingredient IDs, plus the end
+            ingredient_ids: Concatenated ingredient IDs of all products
+            verbatim: Ingredient text of products whose text does not
+                round-trip through the vocabulary
+        """
+        self.brands = brands
+        self.vocabulary = vocabulary
+        self._offsets = offsets
+        self._ingredient_ids = ingredient_ids
+        self._verbatim = verbatim
+        self._stats = None  # Computed once; the store never changes
+
+    def __len__(self) -> int:
+        return len(self.brands)
+
+    def __getitem__(self, product_id: int) -> dict:
+        """The product as a {'brand', 'ingredients'} dict."""
+        if not 0 <= product_id < len(self.brands):
+            raise IndexError(f"Unknown product ID {product_id}")
+        return {'brand': self.brands[product_id], 'ingredients': self.ingredients(product_id)}
+
+    def __iter__(self) -> Iterator[dict]:
+        for product_id in range(len(self.brands)):
+            yield self[product_id]
+
+    def ingredient_ids(self, product_id: int) -> array:
+        """IDs (into vocabulary) of a product's ingredients, in label order."""
+        return self._ingredient_ids[self._offsets[product_id]:self._offsets[product_id + 1]]
+
+    def ingredients(self, product_id: int) -> str:
+        """A product's ingredient text, as in the source file."""
+        text = self._verbatim.get(product_id)
+        if text is not None:
+            return text
+        vocabulary = self.vocabulary
+        return INGREDIENT_SEPARATOR.join(vocabulary[i] for i in self.ingredient_ids(product_id))
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the store's columns and strings."""
+        strings = {id(s): s for s in self.brands}
+        strings.update((id(s), s) for s in self.vocabulary)
+        strings.update((id(s), s) for s in self._verbatim.values())
+        return (
+            sys.getsizeof(self.brands) + sys.getsizeof(self.vocabulary)
+            + sum(sys.getsizeof(s) for s in strings.values())
+            + self._offsets.itemsize * len(self._offsets)
+            + self._ingredient_ids.itemsize * len(self._ingredient_ids)
+            + sys.getsizeof(self._verbatim)
+        )
+
+    def stats(self) -> dict:
+        """
+        Get store sizes.
+
+        Returns:
+            Dictionary with product, distinct brand and ingredient counts,
+            verbatim texts and approximate memory
+        """
+        if self._stats is None:
+            self._stats = {
+                'products': len(self.brands),
+                'distinct_brands': len({id(brand) for brand in self.brands}),
+                'ingredients': len(self.vocabulary),
+                'ingredient_refs': len(self._ingredient_ids),
+                'verbatim_texts': len(self._verbatim),
+                'memory_bytes': self.memory_bytes(),
+            }
+        return dict(self._stats)
+
+
+class CatalogStoreBuilder:
+    """Accumulates products row by row into a CatalogStore."""
+
+    def __init__(self):
+        self._brands: List[str] = []
+        self._brand_strings: Dict[str, str] = {}
+        self._vocabulary: List[str] = []
+        self._ingredient_index: Dict[str, int] = {}
+        self._offsets = array('I', [0])
+        self._ingredient_ids = array('I')
+        self._verbatim: Dict[int, str] = {}
+
+    def add(self, brand: str, ingredients: str) -> int:
+        """
+        Append a product.
+
+        Args:
+            brand: Brand name
+            ingredients: Comma-separated ingredient text
+
+        Returns:
+            The product's ID
+        """
+        product_id = len(self._brands)
+        self._brands.append(self._brand_strings.setdefault(brand, brand))
+
+        names = [name for name in (part.strip() for part in ingredients.split(',')) if name]
+        for name in names:
+            ingredient_id = self._ingredient_index.get(name)
+            if ingredient_id is None:
+                ingredient_id = self._ingredient_index[name] = len(self._vocabulary)
+                self._vocabulary.append(name)
+            self._ingredient_ids.append(ingredient_id)
+        self._offsets.append(len(self._ingredient_ids))
+        if INGREDIENT_SEPARATOR.join(names) != ingredients:
+            self._verbatim[product_id] = ingredients
+        return product_id
+
+    def build(self) -> CatalogStore:
+        """The accumulated catalog as a CatalogStore."""
+        return CatalogStore(
+            brands=self._brands,
+            vocabulary=self._vocabulary,
+            offsets=self._offsets,
+            ingredient_ids=self._ingredient_ids,
+            verbatim=self._verbatim
+        )
+
+
+def _field(row: dict, names: Tuple[str, ...]):
+    for name in names:
+        value = row.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def _ingredient_text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return INGREDIENT_SEPARATOR.join(str(item) for item in value)
+    return str(value)
+
+
+def iter_csv(path) -> Iterator[Tuple[str, str]]:
+    """Stream (brand, ingredients) rows from a CSV file with a header row."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            brand = _field(row, BRAND_FIELDS)
+            if brand:
+                yield brand, _ingredient_text(_field(row, INGREDIENT_FIELDS))
+
+
+def iter_jsonl(path) -> Iterator[Tuple[str, str]]:
+    """Stream (brand, ingredients) rows from a JSON Lines file."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            brand = _field(row, BRAND_FIELDS)
+            if brand:
+                yield str(brand), _ingredient_text(_field(row, INGREDIENT_FIELDS))
+
+
+def parquet_module():
+    """pyarrow.parquet, imported on first use; None if pyarrow is not installed."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:  # Optional: only needed for .parquet catalogs
+        return None
+    return pq
+
+
+def iter_parquet(path, batch_size: int = 65536) -> Iterator[Tuple[str, str]]:
+    """
+    Stream (brand, ingredients) rows from a Parquet file, one record batch at a time.
+
+    Raises:
+        RuntimeError: If pyarrow is not installed
+        ValueError: If the file has no brand column
+    """
+    pq = parquet_module()
+    if pq is None:
+        raise RuntimeError("Reading Parquet catalogs requires the pyarrow package")
+    parquet = pq.ParquetFile(path)
+    columns = set(parquet.schema_arrow.names)
+    brand_column = next((name for name in BRAND_FIELDS if name in columns), None)
+    if brand_column is None:
+        raise ValueError(f"{path} has no brand column (expected one of {', '.join(BRAND_FIELDS)})")
+    ingredient_column = next((name for name in INGREDIENT_FIELDS if name in columns), None)
+    wanted = [brand_column] + ([ingredient_column] if ingredient_column else [])
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=wanted):
+        brands = batch.column(0).to_pylist()
+        ingredients = batch.column(1).to_pylist() if ingredient_column else [None] * len(brands)
+        for brand, text in zip(brands, ingredients):
+            if brand:
+                yield str(brand), _ingredient_text(text)
+
+
+READERS = {
+    '.csv': iter_csv,
+    '.jsonl': iter_jsonl,
+    '.ndjson': iter_jsonl,
+    '.parquet': iter_parquet,
+    '.pq': iter_parquet,
+}
+
+
+def iter_catalog_rows(path) -> Iterator[Tuple[str, str]]:
+    """
+    Stream (brand, ingredients) rows from a catalog file, chosen by extension.
+
+    Raises:
+        ValueError: If the extension is not .csv, .jsonl/.ndjson or .parquet/.pq
+    """
+    extension = os.path.splitext(str(path))[1].lower()
+    reader = READERS.get(extension)
+    if reader is None:
+        raise ValueError(f"Unsupported catalog format {extension!r} (use {', '.join(sorted(READERS))})")
+    return reader(path)
+
+
+def build_store(rows: Iterable[Tuple[str, str]]) -> CatalogStore:
+    """Build a CatalogStore from (brand, ingredients) rows."""
+    builder = CatalogStoreBuilder()
+    for brand, ingredients in rows:
+        builder.add(brand, ingredients)
+    return builder.build()
+
+
+def load_catalog_store(path) -> CatalogStore:
+    """
+    Load a CSV, JSON Lines or Parquet catalog file into a CatalogStore.
+
+    Args:
+        path: Catalog file
+
+    Returns:
+        CatalogStore with one product per row that has a brand name
+    """
+    return build_store(iter_catalog_rows(path))
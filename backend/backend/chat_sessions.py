@@ -0,0 +1,279 @@
+"""
+Server-side chat sessions for follow-up questions about an analysis.
+
+/api/analyze opens a session holding the product, ingredients and
+analysis; /api/chat then only needs the session ID and the new question.
+Sessions live in an in-memory LRU with TTL expiry and can optionally be
+persisted to SQLite; server processes sharing one SQLite file read
+sessions from it, so each turn sees the others' updates.
+
+Chat prompts are built with a stable prefix followed by the conversation,
+so provider-side prompt caching can reuse the prefix across turns. The
+prefix starts with the product and analysis, the longest part of the
+prompt and the same on every turn of a session, so a session whose
+analysis passes the provider's minimum (1024 tokens for OpenAI) has it
+cached from the second turn on.
+"""
+
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+# The product and analysis come first: they are the long part of the prompt
+# and never change within a session, so they start the cached prefix
+CHAT_SYSTEM_PROMPT = """You have already analyzed this product:
+Product: {cereal_name}
+Ingredients: {ingredients}
+
+Previous Analysis:
+{analysis}
+
+You are a helpful AI assistant specializing in food ingredients and nutrition for children.
+
+Provide a helpful, clear, and concise answer based on the analysis and your knowledge of food ingredients.
+Be friendly and conversational. If the question is about something not covered in the analysis,
+use your knowledge about food ingredients to provide accurate information.
+
+Keep your response focused and under 200 words unless more detail is specifically requested.
+"""
+
+
+@dataclass
+class ChatSession:
+    """Conversation state for one analyzed product."""
+    session_id: str
+    cereal_name: str
+    ingredients: str
+    analysis: str
+    history: List[Dict[str, str]] = field(default_factory=list)
+    analysis_summary: str = ""  # Condensed analysis, if the analysis is long
+    history_summary: str = ""  # Running summary of history[:summarized_messages]
+    summarized_messages: int = 0
+    tenant_id: Optional[str] = None  # Tenant that opened the session (None for the operator)
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+
+
+def build_chat_messages(
+    cereal_name: str,
+    ingredients: str,
+    analysis: str,
+    history: List[Dict[str, str]],
+    question: str,
+    history_messages: int = 4,
+    summary: str = ""
+) -> List[BaseMessage]:
+    """
+    Build chat messages with a stable, cacheable prefix.
+
+    The product and analysis come first, then the instructions, so every
+    turn of a session shares a prefix that starts with the long analysis.
+
+    Args:
+        cereal_name: Name of the cereal product
+        ingredients: Comma-separated list of ingredients
+        analysis: Previous analysis of the product
+        history: Earlier turns as {'role', 'content'} dicts
+        question: New user question
+        history_messages: Number of most recent history messages to include
+        summary: Summary of conversation turns older than the included history
+
+    Returns:
+        List of messages: system prefix, summary, recent history, then the question
+    """
+    messages: List[BaseMessage] = [SystemMessage(content=CHAT_SYSTEM_PROMPT.format(
+        cereal_name=cereal_name,
+        ingredients=ingredients,
+        analysis=analysis
+    ))]
+    if summary:
+        messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+    recent = history[-history_messages:] if history_messages > 0 else []
+    for msg in recent:
+        if msg.get('role') == 'user':
+            messages.append(HumanMessage(content=msg.get('content', '')))
+        else:
+            messages.append(AIMessage(content=msg.get('content', '')))
+    messages.append(HumanMessage(content=question))
+    return messages
+
+
+class ChatSessionStore:
+    """Thread-safe LRU + TTL store of chat sessions with optional SQLite backing."""
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        ttl_seconds: float = 3600,
+        persist_path: Optional[str] = None,
+        shared: bool = False
+    ):
+        """
+        Initialize the session store.
+
+        Args:
+            max_sessions: Maximum number of sessions held in memory
+            ttl_seconds: Idle time after which a session expires
+            persist_path: Optional SQLite file used to persist sessions
+            shared: Other processes update the same file; get() reads from
+                SQLite instead of a possibly stale in-memory copy
+        """
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.shared = shared and bool(persist_path)
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.expired = 0
+        self.evicted = 0
+
+        if persist_path:
+            self._db = sqlite3.connect(str(persist_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def create(self, cereal_name: str, ingredients: str, analysis: str,
+               tenant_id: Optional[str] = None) -> ChatSession:
+        """
+        Open a new session for an analyzed product.
+
+        Args:
+            cereal_name: Name of the cereal product
+            ingredients: Comma-separated list of ingredients
+            analysis: Analysis text the conversation is about
+            tenant_id: Tenant the session belongs to (None for the operator)
+
+        Returns:
+            The new ChatSession
+        """
+        session = ChatSession(
+            session_id=secrets.token_urlsafe(16),
+            cereal_name=cereal_name,
+            ingredients=ingredients,
+            analysis=analysis,
+            tenant_id=tenant_id
+        )
+        with self._lock:
+            self._expire_locked()
+            self._put_locked(session)
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """
+        Look up a live session, refreshing its TTL.
+
+        Args:
+            session_id: Session ID returned by /api/analyze
+
+        Returns:
+            ChatSession or None if unknown or expired
+        """
+        now = time.time()
+        with self._lock:
+            session = None if self.shared else self._sessions.get(session_id)
+            if session is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT data FROM chat_sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if row:
+                    session = ChatSession(**json.loads(row[0]))
+            if session is None:
+                return None
+            if now - session.last_used > self.ttl_seconds:
+                self._delete_locked(session_id)
+                self.expired += 1
+                return None
+            session.last_used = now
+            self._put_locked(session)
+            return session
+
+    def append(self, session: ChatSession, role: str, content: str):
+        """
+        Append a message to a session's history.
+
+        Args:
+            session: Session to update
+            role: 'user' or 'assistant'
+            content: Message text
+        """
+        with self._lock:
+            session.history.append({'role': role, 'content': content})
+            session.last_used = time.time()
+            self._put_locked(session)
+
+    def save(self, session: ChatSession):
+        """Persist changes made to a session outside append()."""
+        with self._lock:
+            self._put_locked(session)
+
+    def reopen(self):
+        """Open a new SQLite connection (in a forked child; the parent's must not be shared)."""
+        with self._lock:
+            if self.persist_path:
+                self._db = sqlite3.connect(str(self.persist_path), check_same_thread=False)
+
+    def memory_roots(self) -> list:
+        """Objects holding the in-memory sessions, for memory accounting."""
+        return [self._sessions]
+
+    def stats(self) -> dict:
+        """
+        Get session store statistics.
+
+        Returns:
+            Dictionary with live, expired and evicted session counts
+        """
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'ttl_seconds': self.ttl_seconds,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'persistent': self._db is not None,
+                'shared': self.shared,
+            }
+
+    def _put_locked(self, session: ChatSession):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            # Evicted sessions stay in SQLite (if enabled) until they expire
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, data, last_used) VALUES (?, ?, ?)",
+                (session.session_id, json.dumps(asdict(session)), session.last_used)
+            )
+            self._db.commit()
+
+    def _delete_locked(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def _expire_locked(self):
+        """Drop sessions idle for longer than the TTL (LRU order = idle order)."""
+        cutoff = time.time() - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used > cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+        if self._db is not None:
+            self._db.execute("DELETE FROM chat_sessions WHERE last_used <= ?", (cutoff,))
+            self._db.commit()
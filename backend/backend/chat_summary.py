@@ -0,0 +1,226 @@
+"""
+Rolling summarization to bound chat prompt size.
+
+Each chat prompt contains the analysis, a running summary of older turns
+and the most recent messages verbatim. Long analyses are condensed once
+(cached by content, so every session about the same cached analysis
+shares the summary) and older turns are folded into the session's
+running summary incrementally. If the prompt still exceeds the token cap,
+recent messages, then the summary, then the analysis are trimmed.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from backend.chat_sessions import ChatSession, build_chat_messages
+from backend.config import CHAT_MODEL
+from backend.context_packing import get_token_counter, truncate_to_tokens
+from backend.instrumentation import span
+from backend.resilience import model_calls
+
+ANALYSIS_SUMMARY_PROMPT = """Condense this ingredient analysis of a children's cereal for use as chat context.
+Keep the verdict, every ingredient flagged as concerning or positive with the reason, added sugar findings
+and allergens. Drop formatting and repetition. Use at most {max_tokens} tokens.
+
+Product: {cereal_name}
+
+Analysis:
+{analysis}"""
+
+HISTORY_SUMMARY_PROMPT = """Update the running summary of a conversation between a parent and an assistant
+about the ingredients of {cereal_name}. Keep questions asked, facts given and any preferences or concerns the
+parent mentioned. Use at most {max_tokens} tokens.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+
+def _count_message_tokens(messages: List[BaseMessage], count_tokens: Callable[[str], int]) -> int:
+    # ~4 tokens of per-message overhead in the chat format
+    return sum(count_tokens(m.content) + 4 for m in messages)
+
+
+class RollingChatSummarizer:
+    """Keeps chat prompts under a token cap with cached, incremental summaries."""
+
+    def __init__(
+        self,
+        llm,
+        prompt_token_cap: int,
+        recent_messages: int = 4,
+        analysis_token_limit: int = 800,
+        summary_token_limit: int = 300,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        max_cached_analyses: int = 256
+    ):
+        """
+        Initialize the summarizer.
+
+        Args:
+            llm: Chat model used to write summaries
+            prompt_token_cap: Maximum prompt tokens for a chat turn
+            recent_messages: Number of most recent messages kept verbatim
+            analysis_token_limit: Analyses longer than this are condensed
+            summary_token_limit: Target size of the running history summary
+            count_tokens: Token counting function (defaults to the chat model tokenizer)
+            max_cached_analyses: Number of condensed analyses to keep
+        """
+        self.llm = llm
+        self.prompt_token_cap = prompt_token_cap
+        self.recent_messages = recent_messages
+        self.analysis_token_limit = analysis_token_limit
+        self.summary_token_limit = summary_token_limit
+        self.count_tokens = count_tokens or get_token_counter()
+        self.max_cached_analyses = max_cached_analyses
+        self._analysis_summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._totals = {
+            'turns': 0,
+            'full_prompt_tokens': 0,
+            'prompt_tokens': 0,
+            'tokens_saved': 0,
+            'analysis_summaries': 0,
+            'history_summaries': 0,
+        }
+
+    def build_messages(self, session: ChatSession, question: str) -> Tuple[List[BaseMessage], dict]:
+        """
+        Build the prompt for a chat turn, updating the session's running summary.
+
+        Args:
+            session: Chat session (its summary fields are updated in place)
+            question: New user question
+
+        Returns:
+            Tuple of (messages, statistics with prompt tokens and tokens saved)
+        """
+        analysis = self._condensed_analysis(session)
+        self._fold_history(session)
+
+        recent = session.history[session.summarized_messages:]
+        summary = session.history_summary
+        messages = build_chat_messages(
+            cereal_name=session.cereal_name,
+            ingredients=session.ingredients,
+            analysis=analysis,
+            history=recent,
+            question=question,
+            history_messages=len(recent),
+            summary=summary
+        )
+
+        # Enforce the cap: drop recent messages, then trim the summary and analysis
+        prompt_tokens = _count_message_tokens(messages, self.count_tokens)
+        while prompt_tokens > self.prompt_token_cap and recent:
+            recent = recent[1:]
+            messages = build_chat_messages(
+                session.cereal_name, session.ingredients, analysis, recent, question,
+                history_messages=len(recent), summary=summary
+            )
+            prompt_tokens = _count_message_tokens(messages, self.count_tokens)
+        for field in ('summary', 'analysis'):
+            if prompt_tokens <= self.prompt_token_cap:
+                break
+            overflow = prompt_tokens - self.prompt_token_cap
+            if field == 'summary':
+                summary = truncate_to_tokens(summary, self.count_tokens(summary) - overflow, self.count_tokens)
+            else:
+                analysis = truncate_to_tokens(analysis, self.count_tokens(analysis) - overflow, self.count_tokens)
+            messages = build_chat_messages(
+                session.cereal_name, session.ingredients, analysis, recent, question,
+                history_messages=len(recent), summary=summary
+            )
+            prompt_tokens = _count_message_tokens(messages, self.count_tokens)
+
+        full_messages = build_chat_messages(
+            session.cereal_name, session.ingredients, session.analysis, session.history, question,
+            history_messages=len(session.history)
+        )
+        full_tokens = _count_message_tokens(full_messages, self.count_tokens)
+        stats = {
+            'prompt_tokens': prompt_tokens,
+            'full_prompt_tokens': full_tokens,
+            'tokens_saved': max(full_tokens - prompt_tokens, 0),
+            'prompt_token_cap': self.prompt_token_cap,
+            'summarized_messages': session.summarized_messages,
+        }
+        with self._lock:
+            self._totals['turns'] += 1
+            self._totals['full_prompt_tokens'] += full_tokens
+            self._totals['prompt_tokens'] += prompt_tokens
+            self._totals['tokens_saved'] += stats['tokens_saved']
+        return messages, stats
+
+    def stats(self) -> dict:
+        """
+        Get cumulative summarization statistics.
+
+        Returns:
+            Dictionary with turn count, token totals and summaries written
+        """
+        with self._lock:
+            totals = dict(self._totals)
+            totals['cached_analysis_summaries'] = len(self._analysis_summaries)
+        totals['prompt_token_cap'] = self.prompt_token_cap
+        return totals
+
+    def _condensed_analysis(self, session: ChatSession) -> str:
+        """Analysis text for the prompt, condensed once per distinct analysis."""
+        if session.analysis_summary:
+            return session.analysis_summary
+        if self.count_tokens(session.analysis) <= self.analysis_token_limit:
+            return session.analysis
+
+        key = hashlib.sha256(session.analysis.encode('utf-8')).hexdigest()
+        with self._lock:
+            condensed = self._analysis_summaries.get(key)
+            if condensed is not None:
+                self._analysis_summaries.move_to_end(key)
+        if condensed is None:
+            condensed = self._summarize(ANALYSIS_SUMMARY_PROMPT.format(
+                cereal_name=session.cereal_name,
+                analysis=session.analysis,
+                max_tokens=self.analysis_token_limit
+            ))
+            with self._lock:
+                self._analysis_summaries[key] = condensed
+                while len(self._analysis_summaries) > self.max_cached_analyses:
+                    self._analysis_summaries.popitem(last=False)
+                self._totals['analysis_summaries'] += 1
+        session.analysis_summary = condensed
+        return condensed
+
+    def _fold_history(self, session: ChatSession):
+        """Fold messages older than the recent window into the running summary."""
+        fold_until = len(session.history) - self.recent_messages
+        if fold_until <= session.summarized_messages:
+            return
+        new_messages = session.history[session.summarized_messages:fold_until]
+        transcript = "\n".join(
+            f"{'User' if m.get('role') == 'user' else 'Assistant'}: {m.get('content', '')}"
+            for m in new_messages
+        )
+        session.history_summary = self._summarize(HISTORY_SUMMARY_PROMPT.format(
+            cereal_name=session.cereal_name,
+            summary=session.history_summary or "(none yet)",
+            messages=transcript,
+            max_tokens=self.summary_token_limit
+        ))
+        session.summarized_messages = fold_until
+        with self._lock:
+            self._totals['history_summaries'] += 1
+
+    def _summarize(self, prompt: str) -> str:
+        with span("chat_summarize") as s:
+            response = model_calls.call("llm", lambda: self.llm.invoke([HumanMessage(content=prompt)]))
+            s.record_llm_usage(CHAT_MODEL, response)
+        return response.content.strip()
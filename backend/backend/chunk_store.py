@@ -0,0 +1,331 @@
+"""
+Compact, memory-mappable store of knowledge chunks.
+
+A chunk held as a LangChain Document costs its string plus a pydantic
+object and a metadata dict of its own (the PDF loader's fourteen fields,
+copied into every chunk of a page). ChunkStore keeps the chunks in a few
+flat buffers instead:
+
+    text       every chunk's text, UTF-8 encoded, concatenated
+    offsets    array: chunk i's text is text[offsets[i]:offsets[i + 1]]
+    columns    one per metadata key: each distinct value once, and an
+               array of codes (0 = key absent, n = values[n - 1])
+
+Documents are built only when a chunk is read (store[i]), so retrievers
+that score chunks by position (BM25) materialize just their top k.
+
+A store saved with save() can be opened with load(), which memory-maps
+the file: the text and arrays stay in the page cache, shared by every
+server worker that maps the same file, instead of in each worker's heap.
+
+File layout (native byte order; every section starts at a multiple of 8):
+
+    b"KSCHUNK1", header length (8 bytes), header JSON
+    offsets, then each column's codes in header order, then the text
+"""
+
+import json
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.stores import BaseStore
+
+MAGIC = b"KSCHUNK1"
+ALIGNMENT = 8
+
+
+def _narrowest(values: array, typecodes: str) -> array:
+    """`values` in the smallest of the unsigned array types that holds them."""
+    largest = max(values, default=0)
+    for typecode in typecodes:
+        if largest < 1 << (8 * array(typecode).itemsize):
+            return array(typecode, values)
+    return values
+
+
+def _padding(position: int) -> bytes:
+    return b"\0" * (-position % ALIGNMENT)
+
+
+class ChunkStore:
+    """Read-only chunk texts and metadata; chunk IDs are positions."""
+
+    def __init__(
+        self,
+        text,
+        offsets,
+        columns: List[Tuple[str, List[Any], Any]],
+        mapped: Optional[mmap.mmap] = None
+    ):
+        """
+        Initialize the store (use ChunkStoreBuilder, from_documents or load).
+
+        Args:
+            text: UTF-8 text of all chunks (bytes-like)
+            offsets: Start of each chunk's text, plus the end
+            columns: (metadata key, distinct values, codes per chunk)
+            mapped: The memory map the buffers point into, if loaded from a file
+        """
+        self._text = memoryview(text)
+        self._offsets = offsets
+        self._columns = columns
+        self._mapped = mapped
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Document]) -> "ChunkStore":
+        """Store the text and metadata of `documents`, in order."""
+        builder = ChunkStoreBuilder()
+        for document in documents:
+            builder.add(document.page_content, document.metadata)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, chunk_id: int) -> Document:
+        """The chunk as a new Document."""
+        if not 0 <= chunk_id < len(self):
+            raise IndexError(f"Unknown chunk ID {chunk_id}")
+        return Document(page_content=self.text(chunk_id), metadata=self.metadata(chunk_id))
+
+    def __iter__(self) -> Iterator[Document]:
+        for chunk_id in range(len(self)):
+            yield self[chunk_id]
+
+    def text(self, chunk_id: int) -> str:
+        """A chunk's text."""
+        return str(self._text[self._offsets[chunk_id]:self._offsets[chunk_id + 1]], 'utf-8')
+
+    def texts(self) -> Iterator[str]:
+        """Every chunk's text, in order, without building Documents."""
+        for chunk_id in range(len(self)):
+            yield self.text(chunk_id)
+
+    def metadata(self, chunk_id: int) -> dict:
+        """A chunk's metadata, as a new dict."""
+        metadata = {}
+        for key, values, codes in self._columns:
+            code = codes[chunk_id]
+            if code:
+                metadata[key] = values[code - 1]
+        return metadata
+
+    @property
+    def mapped(self) -> bool:
+        """Whether the buffers are memory-mapped from a file."""
+        return self._mapped is not None
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the buffers and distinct metadata values (mapped or not)."""
+        values = {id(value): value for _, column, _ in self._columns for value in column}
+        return (
+            self._text.nbytes
+            + self._offsets.itemsize * len(self._offsets)
+            + sum(codes.itemsize * len(codes) for _, _, codes in self._columns)
+            + sum(sys.getsizeof(value) for value in values.values())
+        )
+
+    def stats(self) -> dict:
+        """
+        Get store sizes.
+
+        Returns:
+            Dictionary with chunk count, text bytes, metadata columns,
+            whether the store is memory-mapped and approximate memory
+        """
+        return {
+            'chunks': len(self),
+            'text_bytes': self._text.nbytes,
+            'metadata_columns': {key: len(values) for key, values, _ in self._columns},
+            'mapped': self.mapped,
+            'memory_bytes': self.memory_bytes(),
+        }
+
+    def save(self, path) -> str:
+        """
+        Write the store to a file that load() can map.
+
+        The file is written to a uniquely named temporary file next to
+        `path`, flushed to disk and renamed into place, so workers saving
+        at the same time never write into each other's file, and processes
+        that already mapped an earlier version keep reading it.
+
+        Returns:
+            Path of the file
+
+        Raises:
+            TypeError: If a metadata value is not JSON-serializable
+        """
+        path = str(path)
+        header = json.dumps({
+            'byteorder': sys.byteorder,
+            'chunks': len(self),
+            'text_bytes': self._text.nbytes,
+            'offsets': self._offsets.typecode if isinstance(self._offsets, array) else self._offsets.format,
+            'columns': [
+                {'key': key, 'values': values,
+                 'codes': codes.typecode if isinstance(codes, array) else codes.format}
+                for key, values, codes in self._columns
+            ],
+        }).encode('utf-8')
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                position = f.write(MAGIC + len(header).to_bytes(8, sys.byteorder) + header)
+                for section in [self._offsets] + [codes for _, _, codes in self._columns]:
+                    position += f.write(_padding(position))
+                    position += f.write(memoryview(section).cast('B'))
+                position += f.write(_padding(position))
+                f.write(self._text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(temporary, 0o644)  # mkstemp creates the file owner-only
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return path
+
+    @classmethod
+    def load(cls, path) -> "ChunkStore":
+        """
+        Memory-map a store written by save().
+
+        Raises:
+            ValueError: If the file is not a chunk store or was written
+                on a machine of the other byte order
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a chunk store")
+        start = len(MAGIC) + 8
+        header_length = int.from_bytes(mapped[len(MAGIC):start], sys.byteorder)
+        header = json.loads(mapped[start:start + header_length])
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was written with {header['byteorder']}-endian byte order")
+
+        view = memoryview(mapped)
+        position = start + header_length
+
+        def section(typecode: str, count: int):
+            nonlocal position
+            position += -position % ALIGNMENT
+            size = array(typecode).itemsize * count
+            data = view[position:position + size].cast(typecode)
+            position += size
+            return data
+
+        offsets = section(header['offsets'], header['chunks'] + 1)
+        columns = [(column['key'], column['values'], section(column['codes'], header['chunks']))
+                   for column in header['columns']]
+        text = section('B', header['text_bytes'])
+        return cls(text, offsets, columns, mapped=mapped)
+
+
+class ChunkStoreBuilder:
+    """Accumulates chunks into a ChunkStore."""
+
+    def __init__(self):
+        self._text = bytearray()
+        self._offsets = array('Q', [0])
+        self._keys: Dict[str, int] = {}
+        self._columns: List[Tuple[str, List[Any], Dict[Any, int], array]] = []
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def add(self, text: str, metadata: Optional[dict] = None) -> int:
+        """
+        Append a chunk.
+
+        Args:
+            text: Chunk text
+            metadata: Chunk metadata (JSON-serializable values)
+
+        Returns:
+            The chunk's ID
+        """
+        chunk_id = len(self)
+        self._text += text.encode('utf-8')
+        self._offsets.append(len(self._text))
+        for key, value in (metadata or {}).items():
+            column = self._keys.get(key)
+            if column is None:
+                column = self._keys[key] = len(self._columns)
+                self._columns.append((key, [], {}, array('I', [0]) * chunk_id))
+            _, values, index, codes = self._columns[column]
+            try:
+                signature = (type(value), value)  # 1 and True are distinct values
+                code = index.get(signature)
+            except TypeError:  # Lists and dicts
+                signature = (type(value), json.dumps(value, sort_keys=True, default=repr))
+                code = index.get(signature)
+            if code is None:
+                values.append(value)
+                code = index[signature] = len(values)
+            codes.append(code)
+        for _, _, _, codes in self._columns:
+            if len(codes) == chunk_id:
+                codes.append(0)  # Key absent from this chunk
+        return chunk_id
+
+    def build(self) -> ChunkStore:
+        """The accumulated chunks as a ChunkStore."""
+        return ChunkStore(
+            text=bytes(self._text),
+            offsets=_narrowest(self._offsets, 'IQ'),
+            columns=[(key, list(values), _narrowest(codes, 'BHI')) for key, values, _, codes in self._columns]
+        )
+
+
+class ChunkDocstore(BaseStore[str, Document]):
+    """
+    Document store keeping its documents in a ChunkStore.
+
+    A drop-in for InMemoryStore as the parent document retriever's
+    docstore: parents are stored compactly and become Documents only
+    when mget() returns them. Deleted keys are forgotten, but their text
+    stays in the store.
+    """
+
+    def __init__(self):
+        self.chunks = ChunkStore.from_documents([])
+        self._ids: Dict[str, int] = {}
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[Document]]:
+        chunks = self.chunks
+        return [chunks[self._ids[key]] if key in self._ids else None for key in keys]
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, Document]]) -> None:
+        # The store is rebuilt with the new documents appended; the parent
+        # document retriever sets all of its parents in one call
+        builder = ChunkStoreBuilder()
+        for chunk_id in range(len(self.chunks)):
+            builder.add(self.chunks.text(chunk_id), self.chunks.metadata(chunk_id))
+        ids = {}
+        for key, document in key_value_pairs:
+            ids[key] = builder.add(document.page_content, document.metadata)
+        self.chunks = builder.build()
+        self._ids.update(ids)
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        for key in keys:
+            self._ids.pop(key, None)
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        for key in list(self._ids):
+            if prefix is None or key.startswith(prefix):
+                yield key
+
+    def __len__(self) -> int:
+        return len(self._ids)
@@ -0,0 +1,228 @@
+"""
+Shared model clients with pooled, keep-alive HTTP connections.
+
+Every component used to construct its own ChatOpenAI, OpenAIEmbeddings
+or Cohere client, each with its own connection pool, and /api/chat built
+a new one per request. The registry builds each client once per
+configuration (model, key, temperature, ...) and all of them share one
+thread-safe httpx.Client, so TLS connections are reused across
+components, requests and threads.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional
+
+import httpx
+
+from backend.config import (
+    CHAT_MODEL,
+    EMBEDDING_MODEL,
+    HTTP_POOL_MAX_CONNECTIONS,
+    HTTP_POOL_MAX_KEEPALIVE,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_TIMEOUT_SECONDS
+)
+
+# Hosts whose connections are opened ahead of the first real request
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+COHERE_BASE_URL = "https://api.cohere.com"
+
+
+class _ConnectionTracer:
+    """httpcore trace callback counting newly opened connections."""
+
+    def __init__(self, registry: "ClientRegistry"):
+        self.registry = registry
+
+    def __call__(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.registry._count('new_connections')
+
+
+class ClientRegistry:
+    """Builds model clients once per configuration over a shared connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[Hashable, object] = {}
+        self._http_client: Optional[httpx.Client] = None
+        self._transport: Optional[httpx.HTTPTransport] = None
+        self._stats = {
+            'requests': 0,
+            'new_connections': 0,
+            'clients_built': 0,
+            'client_reuses': 0,
+            'prewarm_ms': None,
+        }
+        self._tracer = _ConnectionTracer(self)
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """Shared keep-alive HTTP client, created on first use."""
+        with self._lock:
+            if self._http_client is None:
+                # The registry owns the transport (the connection pool) so it can close its connections
+                self._transport = httpx.HTTPTransport(limits=httpx.Limits(
+                    max_connections=HTTP_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS
+                ))
+                self._http_client = httpx.Client(
+                    transport=self._transport,
+                    timeout=HTTP_TIMEOUT_SECONDS,
+                    event_hooks={'request': [self._on_request]}
+                )
+            return self._http_client
+
+    def _on_request(self, request: httpx.Request):
+        request.extensions['trace'] = self._tracer
+        self._count('requests')
+
+    def _count(self, field: str, amount: int = 1):
+        with self._lock:
+            self._stats[field] += amount
+
+    def _get_or_build(self, key: Hashable, build: Callable[[], object]):
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._stats['client_reuses'] += 1
+                return client
+        built = build()
+        with self._lock:
+            # Another thread may have built the same client meanwhile; keep the first
+            client = self._clients.setdefault(key, built)
+            if client is built:
+                self._stats['clients_built'] += 1
+        return client
+
+    def chat_model(self, api_key: str, model: str = CHAT_MODEL, temperature: Optional[float] = None):
+        """
+        Get the shared ChatOpenAI client for a configuration.
+
+        Args:
+            api_key: OpenAI API key
+            model: Chat model name
+            temperature: Sampling temperature (None uses the model default)
+
+        Returns:
+            ChatOpenAI instance
+        """
+        from langchain_openai import ChatOpenAI
+
+        def build():
+            kwargs = {'model': model, 'api_key': api_key, 'http_client': self.http_client}
+            if temperature is not None:
+                kwargs['temperature'] = temperature
+            return ChatOpenAI(**kwargs)
+
+        return self._get_or_build(('chat', model, api_key, temperature), build)
+
+    def embeddings(self, api_key: str, model: str = EMBEDDING_MODEL):
+        """
+        Get the shared OpenAIEmbeddings client for a configuration.
+
+        Args:
+            api_key: OpenAI API key
+            model: Embedding model name
+
+        Returns:
+            OpenAIEmbeddings instance
+        """
+        from langchain_openai import OpenAIEmbeddings
+
+        return self._get_or_build(
+            ('embeddings', model, api_key),
+            lambda: OpenAIEmbeddings(model=model, api_key=api_key, http_client=self.http_client)
+        )
+
+    def cohere_client(self, api_key: str):
+        """
+        Get the shared Cohere client for an API key.
+
+        Args:
+            api_key: Cohere API key
+
+        Returns:
+            cohere.ClientV2 instance
+        """
+        import cohere
+
+        return self._get_or_build(
+            ('cohere', api_key),
+            lambda: cohere.ClientV2(api_key, client_name="langchain:partner", httpx_client=self.http_client)
+        )
+
+    def discard(self, api_key: str) -> int:
+        """
+        Drop every client built for an API key (e.g. an evicted tenant's).
+
+        The shared connection pool is kept; other clients are unaffected.
+
+        Args:
+            api_key: API key whose clients are dropped
+
+        Returns:
+            Number of clients dropped
+        """
+        with self._lock:
+            keys = [key for key in self._clients if api_key in key]
+            for key in keys:
+                del self._clients[key]
+        return len(keys)
+
+    def close_connections(self):
+        """
+        Close the pooled connections, e.g. before the server forks workers.
+
+        A socket (and its TLS state) inherited by several processes would
+        interleave their traffic. Only the transport is closed: the shared
+        httpx.Client is held by every model client built so far (including
+        the preloaded pipeline's) and stays usable, opening new connections
+        on its next request. Client.close() would close it for good.
+        """
+        with self._lock:
+            if self._transport is not None:
+                self._transport.close()
+
+    def prewarm(self, include_cohere: bool = False):
+        """
+        Open pooled connections to the model providers ahead of the first request.
+
+        Any HTTP response (even 401/404) means the TCP and TLS handshakes
+        are done and the connection is back in the keep-alive pool.
+
+        Args:
+            include_cohere: Also warm the Cohere connection
+        """
+        urls = [OPENAI_BASE_URL + "/models"]
+        if include_cohere:
+            urls.append(COHERE_BASE_URL)
+        start = time.perf_counter()
+        for url in urls:
+            try:
+                self.http_client.head(url)
+            except httpx.HTTPError as e:
+                print(f"Warning: could not pre-warm connection to {url}: {e}")
+        with self._lock:
+            self._stats['prewarm_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+    def stats(self) -> dict:
+        """
+        Get client and connection reuse statistics.
+
+        Returns:
+            Dictionary with request and connection counts and the reuse ratio
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['clients'] = len(self._clients)
+        stats['reused_connections'] = max(stats['requests'] - stats['new_connections'], 0)
+        stats['connection_reuse_ratio'] = (
+            stats['reused_connections'] / stats['requests'] if stats['requests'] else 0.0
+        )
+        return stats
+
+
+client_registry = ClientRegistry()
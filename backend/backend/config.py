@@ -2,6 +2,7 @@
 Configuration file for the KidSafe Food Analyzer backend.
 """
 
+import os
 from pathlib import Path
 
 # Project structure
@@ -12,9 +13,49 @@ INPUT_DIR = DATA_DIR / "Input"
 # PDF file path
 FOOD_LABELING_PDF = INPUT_DIR / "Food-Labeling-Guide-(PDF).pdf"
 
+# Product catalog
+CEREAL_CSV = DATA_DIR / "cereal.csv"
+CATALOG_PATH = CEREAL_CSV  # .csv, .jsonl/.ndjson or .parquet/.pq (Parquet needs pyarrow)
+CATALOG_FULL_LIST_MAX_PRODUCTS = 100_000  # Larger catalogs are streamed by /api/cereals, not kept serialized
+CATALOG_CHECK_INTERVAL_SECONDS = 1.0  # How often the file is stat()ed for changes
+CATALOG_GZIP_LEVEL = 6
+CATALOG_MIN_COMPRESS_BYTES = 1024  # Smaller responses are sent uncompressed
+CATALOG_SEARCH_DEFAULT_LIMIT = 20
+CATALOG_SEARCH_MAX_LIMIT = 100
+CATALOG_FUZZY_MIN_WORD_LENGTH = 4  # Shorter query words must match exactly in fuzzy search
+
 # Model configurations
 DEFAULT_CHUNK_SIZE = 1000
 DEFAULT_CHUNK_OVERLAP = 200
+CHUNK_STORE_PATH = DATA_DIR / "knowledge_chunks.store"  # Memory-mapped chunk store, shared by server workers; None keeps chunks in memory
+
+# Retrieval
+DEFAULT_RETRIEVAL_K = 5
+DEGRADED_RETRIEVAL_K = 3
+
+# Adaptive ensemble: rerank/expansion only when dense and BM25 results disagree
+ADAPTIVE_RETRIEVAL_ENABLED = True
+# Allow multi-query expansion on low confidence. This is a cost the static
+# ensemble never had: one extra CHAT_MODEL call (about 200 prompt and 60
+# completion tokens, typically 0.5-1.5 s) plus three more embedding calls
+# and vector searches for its query variants. It only runs when dense and
+# BM25 results disagree and the degradation policy chose the full plan, so
+# it needs DEGRADATION_ENABLED. /api/status adaptive_retrieval counts how
+# often it ran.
+ADAPTIVE_QUERY_EXPANSION = True
+ADAPTIVE_AGREEMENT_THRESHOLD = 0.4  # Fraction of top-k shared by both legs
+ADAPTIVE_SCORE_GAP_THRESHOLD = 0.08  # Dense top-1 vs k-th similarity margin
+
+# Graceful degradation: level -> (minimum remaining request budget in seconds,
+# maximum analyses in flight). The first level whose limits hold is used;
+# bm25_only is the fallback.
+DEGRADATION_ENABLED = True
+DEGRADATION_THRESHOLDS = {
+    "full": (25, 4),
+    "no_expansion": (20, 8),
+    "no_rerank": (15, 12),
+    "reduced_k": (10, 16),
+}
 
 # Vector store configurations
 QDRANT_COLLECTION_NAME = "food_safety_knowledge"
@@ -24,3 +65,110 @@ QDRANT_LOCATION = ":memory:"  # In-memory for simplicity, can change to persiste
 CHAT_MODEL = "gpt-4o-mini"
 EMBEDDING_MODEL = "text-embedding-3-small"
 
+# Shared HTTP connection pool for model clients (OpenAI, Cohere)
+HTTP_POOL_MAX_CONNECTIONS = 20
+HTTP_POOL_MAX_KEEPALIVE = 10
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 120
+HTTP_TIMEOUT_SECONDS = 60
+PREWARM_CONNECTIONS_ON_CONFIGURE = True
+
+# Outbound model call resilience
+MODEL_CALL_TIMEOUT_SECONDS = 30  # Per-call deadline, capped by the request budget
+ANALYZE_REQUEST_BUDGET_SECONDS = 45
+CHAT_REQUEST_BUDGET_SECONDS = 30
+HEDGED_DEPENDENCIES = ("llm", "embedding", "rerank")
+HEDGE_PERCENTILE = 0.95  # Send a duplicate once an attempt is slower than this percentile
+HEDGE_MIN_DELAY_SECONDS = 0.25
+HEDGE_MIN_SAMPLES = 20  # Latency history needed before hedging starts
+HEDGE_MAX_ATTEMPTS = 2  # 1 disables hedging
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures that open a dependency's circuit
+BREAKER_RESET_SECONDS = 30
+RESILIENCE_MAX_WORKERS = 32
+
+# USD per 1M tokens, used to estimate request cost
+MODEL_PRICING_PER_1M_TOKENS = {
+    "gpt-4o-mini": {"input": 0.15, "output": 0.60},
+    "text-embedding-3-small": {"input": 0.02, "output": 0.0},
+}
+
+# Aggregate per-stage latency/token statistics in process
+INSTRUMENTATION_ENABLED = True
+
+# Sampled request tracing (analysis and chat requests). Failed and slow
+# requests are always traced; others with probability TRACING_HEAD_SAMPLE_RATE.
+TRACING_ENABLED = True
+TRACING_HEAD_SAMPLE_RATE = 0.05
+TRACING_SLOW_REQUEST_MS = 10_000
+TRACING_QUEUE_SIZE = 1000  # Traces waiting for export; new ones are dropped when full
+TRACING_BATCH_SIZE = 50
+TRACING_FLUSH_INTERVAL_SECONDS = 2.0  # Longest a partial batch waits before export
+TRACING_SHUTDOWN_FLUSH_SECONDS = 5.0  # Time an exiting worker gives queued traces
+TRACING_FILE_PATH = None  # e.g. DATA_DIR / "traces.jsonl" to keep traces locally (works offline)
+TRACING_LANGSMITH_PROJECT = "KidSafe-Food-Analyzer"
+TRACING_LANGCHAIN_RUNS = False  # True also enables LangChain's own tracing of every run (LANGCHAIN_TRACING_V2)
+
+# Admin endpoints and request profiling need this token in ADMIN_TOKEN_HEADER
+# (empty disables them)
+ADMIN_TOKEN = os.environ.get("KIDSAFE_ADMIN_TOKEN", "")
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+# Sampling profiler: per request (X-Profile: 1 or ?profile=1 on /api/analyze
+# and /api/chat, admin only) and always-on background sampling
+PROFILE_HEADER = "X-Profile"
+PROFILE_INTERVAL_SECONDS = 0.005  # Per-request sampling rate (200 Hz)
+PROFILE_DIR = DATA_DIR / "profiles"  # Request profiles (<id>.folded), shared by server workers
+PROFILE_MAX_STORED = 20  # Most recent request profiles kept
+BACKGROUND_PROFILER_ENABLED = True
+BACKGROUND_PROFILER_INTERVAL_SECONDS = 0.1  # 10 samples per second of every busy thread
+BACKGROUND_PROFILER_MAX_STACKS = 5000  # Distinct stacks kept; further ones are counted as "(other)"
+
+# Maximum tokens of retrieved context packed into the analysis prompt
+CONTEXT_TOKEN_BUDGET = 1500
+
+
+# Analysis cache
+ANALYSIS_CACHE_MAX_ENTRIES = 1024
+ANALYSIS_CACHE_PATH = DATA_DIR / "analysis_cache.sqlite3"  # Set to None for memory-only
+
+# Chat sessions
+CHAT_SESSION_MAX = 1000
+CHAT_SESSION_TTL_SECONDS = 3600
+CHAT_SESSION_PATH = None  # e.g. DATA_DIR / "chat_sessions.sqlite3" to persist sessions
+CHAT_HISTORY_MESSAGES = 4  # Most recent messages kept verbatim; older ones are summarized
+PROMPT_CACHE_MIN_TOKENS = 1024  # OpenAI caches prompt prefixes of at least this many tokens
+CHAT_PROMPT_TOKEN_CAP = 2000  # Upper bound on chat prompt tokens
+CHAT_ANALYSIS_TOKEN_LIMIT = 800  # Longer analyses are condensed for chat prompts
+CHAT_SUMMARY_TOKEN_LIMIT = 300  # Target size of the rolling conversation summary
+
+# Asynchronous analysis jobs (/api/jobs)
+JOBS_DB_PATH = DATA_DIR / "jobs.sqlite3"  # ":memory:" to keep the queue in memory
+JOB_WORKERS = 4  # Jobs executed concurrently
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF_SECONDS = 2  # Doubles with every retry
+JOB_RETENTION_SECONDS = 86400  # Finished jobs are purged after a day
+JOB_LONG_POLL_MAX_SECONDS = 30
+JOB_MAX_BATCH_ITEMS = 100
+
+# Multi-tenant mode: tenants share the index and bring their own model keys
+TENANT_HEADER = "X-Tenant-ID"
+TENANT_TOKEN_HEADER = "X-Tenant-Token"  # Secret returned when the tenant is registered
+TENANT_MAX_REGISTERED = 1000  # Registered tenants (keys only, a few hundred bytes each)
+TENANT_MAX_ACTIVE = 32  # Tenants with live clients and caches; least recently used are evicted
+TENANT_CACHE_MAX_ENTRIES = 128  # In-memory analyses cached per active tenant
+
+# Catalog warm-up
+WARMUP_ON_CONFIGURE = True
+WARMUP_INTERVAL_SECONDS = None  # e.g. 3600 to re-walk the catalog hourly
+WARMUP_ITEM_DELAY_SECONDS = 0.5
+WARMUP_LOCK_PATH = DATA_DIR / "warmup.lock"  # With several server workers, only the lock holder warms the catalog
+
+# Production server (serve.py / gunicorn.conf.py); KIDSAFE_* environment variables override these
+SERVER_BIND = "0.0.0.0:5001"
+SERVER_WORKERS = 2  # Worker processes
+SERVER_THREADS = 8  # Request threads per worker (requests mostly wait on model calls)
+SERVER_PRELOAD = True  # Load the app, catalog and index in the master; workers share them copy-on-write
+SERVER_TIMEOUT_SECONDS = 120  # A worker silent for longer is killed and replaced
+SERVER_GRACEFUL_TIMEOUT_SECONDS = 60  # Time in-flight requests get to finish on reload (SIGHUP) or shutdown
+SERVER_MAX_REQUESTS = 0  # Recycle a worker after this many requests (0 = never)
+SERVER_MAX_REQUESTS_JITTER = 0  # Random extra requests, so workers are not all recycled at once
+SERVER_CHAT_SESSION_PATH = DATA_DIR / "chat_sessions.sqlite3"  # Used if CHAT_SESSION_PATH is None: workers share sessions
@@ -0,0 +1,242 @@
+"""
+Token-budgeted context packing for the analysis prompt.
+
+Retrieved chunks overlap (chunk overlap, plus the same chunk coming back
+from several ensemble legs), so concatenating them verbatim repeats the
+same sentences. The packer splits chunks into sentences, drops sentences
+already covered by another chunk, ranks the rest by relevance to the
+ingredient list and fills a token budget measured with the model's
+tokenizer.
+"""
+
+import math
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from backend.config import CHAT_MODEL
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Words too common to signal relevance
+_STOPWORDS = {
+    "and", "the", "for", "with", "from", "that", "this", "are", "was", "not",
+    "any", "all", "may", "must", "have", "has", "other", "such", "than",
+    "organic", "added", "whole", "grain", "contains", "less", "more",
+}
+
+# Sentences shorter than this are dropped as PDF noise (page numbers, headers)
+_MIN_SENTENCE_CHARS = 20
+
+_counters: Dict[str, Callable[[str], int]] = {}
+
+
+def get_token_counter(model: str = CHAT_MODEL) -> Callable[[str], int]:
+    """
+    Get a function that counts tokens for a chat model.
+
+    Uses tiktoken (installed with langchain-openai). Falls back to a
+    4-characters-per-token estimate if the encoding cannot be loaded.
+
+    Args:
+        model: Chat model name
+
+    Returns:
+        Function mapping text to a token count
+    """
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        print(f"Warning: tiktoken unavailable ({e}), estimating tokens from characters")
+        return lambda text: math.ceil(len(text) / 4)
+
+
+def count_tokens(text: str, model: str = CHAT_MODEL) -> int:
+    """
+    Count the tokens of text with a chat model's tokenizer.
+
+    The counter is built once per model (see get_token_counter).
+
+    Args:
+        text: Text to count
+        model: Chat model name
+
+    Returns:
+        Number of tokens
+    """
+    counter = _counters.get(model)
+    if counter is None:
+        counter = _counters.setdefault(model, get_token_counter(model))
+    return counter(text)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    """
+    Cut text to at most max_tokens tokens, at a word boundary.
+
+    Args:
+        text: Text to truncate
+        max_tokens: Token limit
+        count_tokens: Token counting function
+
+    Returns:
+        The text itself if it fits, otherwise its longest fitting prefix
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split(" ")
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle]) + " ...") <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low]) + " ..." if low else ""
+
+
+def _terms(text: str) -> set:
+    return {w for w in _WORD.findall(text.lower()) if len(w) > 2 and w not in _STOPWORDS}
+
+
+def _normalize(sentence: str) -> str:
+    return " ".join(sentence.lower().split())
+
+
+class ContextPacker:
+    """Deduplicates, ranks and budget-packs retrieved chunks into prompt context."""
+
+    def __init__(self, token_budget: int, count_tokens: Optional[Callable[[str], int]] = None):
+        """
+        Initialize the context packer.
+
+        Args:
+            token_budget: Maximum tokens of context to place in the prompt
+            count_tokens: Token counting function (defaults to the chat model tokenizer)
+        """
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens or get_token_counter()
+        self._lock = threading.Lock()
+        self._totals = {
+            'requests': 0,
+            'original_tokens': 0,
+            'packed_tokens': 0,
+            'tokens_saved': 0,
+        }
+
+    def pack(self, documents: List[Document], ingredients: str, question: str = "") -> Tuple[str, Dict]:
+        """
+        Pack retrieved documents into a context string within the token budget.
+
+        Args:
+            documents: Retrieved documents, best first
+            ingredients: Ingredient list the context should be relevant to
+            question: Retrieval question, used as a weaker relevance signal
+
+        Returns:
+            Tuple of (context text, packing statistics)
+        """
+        original_text = "\n\n".join(
+            f"Source {i+1}:\n{doc.page_content}" for i, doc in enumerate(documents)
+        )
+        original_tokens = self.count_tokens(original_text) if original_text else 0
+
+        # Split into sentences, remembering which source each came from
+        candidates = []
+        for source, doc in enumerate(documents):
+            for position, sentence in enumerate(_SENTENCE_SPLIT.split(doc.page_content)):
+                sentence = " ".join(sentence.split())
+                if len(sentence) >= _MIN_SENTENCE_CHARS:
+                    candidates.append((source, position, sentence))
+
+        # Drop sentences already covered by another chunk. Longest first, so a
+        # fragment cut at a chunk-overlap boundary is dropped in favour of the
+        # complete sentence.
+        seen = []
+        unique = []
+        duplicates = 0
+        for source, position, sentence in sorted(candidates, key=lambda c: -len(c[2])):
+            normalized = _normalize(sentence)
+            if any(normalized in kept for kept in seen):
+                duplicates += 1
+                continue
+            seen.append(normalized)
+            unique.append((source, position, sentence))
+
+        # Rank by ingredient-term overlap, then question-term overlap and source rank
+        ingredient_terms = _terms(ingredients)
+        question_terms = _terms(question) - ingredient_terms
+        ranked = []
+        for source, position, sentence in unique:
+            terms = _terms(sentence)
+            length_norm = math.sqrt(max(len(terms), 1))
+            score = (
+                len(terms & ingredient_terms) / length_norm
+                + 0.25 * len(terms & question_terms) / length_norm
+                + 0.1 / (1 + source)
+            )
+            ranked.append((score, source, position, sentence))
+        ranked.sort(key=lambda r: (-r[0], r[1], r[2]))
+
+        # Greedily fill the budget; reserve room for the "Source N:" headers
+        selected = []
+        used = 0
+        for score, source, position, sentence in ranked:
+            tokens = self.count_tokens(sentence) + 1
+            if used + tokens > self.token_budget:
+                continue
+            selected.append((source, position, sentence))
+            used += tokens
+
+        # Re-assemble in document order so each source reads naturally
+        by_source: Dict[int, List[Tuple[int, str]]] = {}
+        for source, position, sentence in selected:
+            by_source.setdefault(source, []).append((position, sentence))
+        context_text = "\n\n".join(
+            f"Source {n+1}:\n" + " ".join(s for _, s in sorted(by_source[source]))
+            for n, source in enumerate(sorted(by_source))
+        )
+        packed_tokens = self.count_tokens(context_text) if context_text else 0
+
+        stats = {
+            'documents': len(documents),
+            'sentences': len(candidates),
+            'duplicate_sentences': duplicates,
+            'selected_sentences': len(selected),
+            'original_tokens': original_tokens,
+            'packed_tokens': packed_tokens,
+            'tokens_saved': max(original_tokens - packed_tokens, 0),
+            'token_budget': self.token_budget,
+        }
+        with self._lock:
+            self._totals['requests'] += 1
+            self._totals['original_tokens'] += original_tokens
+            self._totals['packed_tokens'] += packed_tokens
+            self._totals['tokens_saved'] += stats['tokens_saved']
+
+        return context_text, stats
+
+    def stats(self) -> dict:
+        """
+        Get cumulative packing statistics.
+
+        Returns:
+            Dictionary with request count and token totals
+        """
+        with self._lock:
+            totals = dict(self._totals)
+        totals['token_budget'] = self.token_budget
+        totals['avg_tokens_saved'] = (
+            totals['tokens_saved'] / totals['requests'] if totals['requests'] else 0.0
+        )
+        return totals
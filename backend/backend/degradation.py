@@ -0,0 +1,181 @@
+"""
+SLO-aware graceful degradation of the retrieval pipeline.
+
+Under load, or when a request has little of its latency budget left, it
+is better to drop expensive retrieval stages than to time out. The
+policy maps (remaining request budget, analysis queue depth) to a
+retrieval plan, from the full configured strategy down to BM25 only:
+
+    full          configured strategy as-is
+    no_expansion  skip multi-query expansion (an extra LLM call)
+    no_rerank     also skip the Cohere rerank leg (a network round trip)
+    reduced_k     also retrieve fewer documents
+    bm25_only     local keyword search only, no embedding call
+
+The plan chosen for a request is recorded in the context opened by
+track_degradation(), so the analysis endpoint can report it.
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from backend.config import DEGRADATION_THRESHOLDS, DEFAULT_RETRIEVAL_K, DEGRADED_RETRIEVAL_K
+
+_decision: ContextVar[Optional[dict]] = ContextVar("degradation_decision", default=None)
+
+
+@dataclass(frozen=True)
+class RetrievalPlan:
+    """Which retrieval stages may run for a request."""
+    level: str
+    query_expansion: bool
+    rerank: bool
+    k: int
+    dense: bool
+
+    def stages(self, strategy: str, rerank_available: bool) -> List[str]:
+        """
+        Retrieval stages this plan runs for a strategy.
+
+        Args:
+            strategy: Configured retrieval strategy
+            rerank_available: Whether a Cohere key is configured
+
+        Returns:
+            Stage names in execution order
+        """
+        if not self.dense or strategy == 'bm25':
+            return ['bm25']
+        stages = []
+        if strategy == 'multi_query' and self.query_expansion:
+            stages.append('query_expansion')
+        stages += ['embed', 'vector_search']
+        if strategy not in ('naive', 'multi_query', 'compression'):
+            stages.append('bm25')  # ensemble
+        if strategy in ('compression', 'ensemble') and self.rerank and rerank_available:
+            stages.append('rerank')
+        return stages
+
+
+PLANS: Tuple[RetrievalPlan, ...] = (
+    RetrievalPlan('full', query_expansion=True, rerank=True, k=DEFAULT_RETRIEVAL_K, dense=True),
+    RetrievalPlan('no_expansion', query_expansion=False, rerank=True, k=DEFAULT_RETRIEVAL_K, dense=True),
+    RetrievalPlan('no_rerank', query_expansion=False, rerank=False, k=DEFAULT_RETRIEVAL_K, dense=True),
+    RetrievalPlan('reduced_k', query_expansion=False, rerank=False, k=DEGRADED_RETRIEVAL_K, dense=True),
+    RetrievalPlan('bm25_only', query_expansion=False, rerank=False, k=DEGRADED_RETRIEVAL_K, dense=False),
+)
+FULL_PLAN = PLANS[0]
+
+
+class DegradationPolicy:
+    """Chooses a retrieval plan from the remaining budget and queue depth."""
+
+    def __init__(self, thresholds: Optional[Dict[str, Tuple[float, int]]] = None):
+        """
+        Initialize the policy.
+
+        Args:
+            thresholds: Level name -> (minimum remaining budget in seconds,
+                maximum queue depth). A level is chosen when both hold; the
+                last level (bm25_only) is the fallback.
+        """
+        self.thresholds = thresholds if thresholds is not None else DEGRADATION_THRESHOLDS
+        self._lock = threading.Lock()
+        self._counts = {plan.level: 0 for plan in PLANS}
+
+    def choose(self, remaining_seconds: Optional[float], queue_depth: int) -> RetrievalPlan:
+        """
+        Pick the most complete plan the request can afford.
+
+        Args:
+            remaining_seconds: Remaining request budget (None if unbounded)
+            queue_depth: Number of analyses currently running
+
+        Returns:
+            RetrievalPlan to use
+        """
+        chosen = PLANS[-1]
+        for plan in PLANS[:-1]:
+            threshold = self.thresholds.get(plan.level)
+            if threshold is None:
+                continue
+            min_remaining, max_queue = threshold
+            if (remaining_seconds is None or remaining_seconds >= min_remaining) and queue_depth <= max_queue:
+                chosen = plan
+                break
+        with self._lock:
+            self._counts[chosen.level] += 1
+        return chosen
+
+    def stats(self) -> dict:
+        """
+        Get how often each plan was chosen.
+
+        Returns:
+            Dictionary mapping level name to count
+        """
+        with self._lock:
+            return dict(self._counts)
+
+
+@contextmanager
+def track_degradation():
+    """
+    Collect the retrieval plan chosen while running the block.
+
+    Yields:
+        Dictionary filled in by record_decision() (empty if retrieval did not run)
+    """
+    decision: dict = {}
+    token = _decision.set(decision)
+    try:
+        yield decision
+    finally:
+        _decision.reset(token)
+
+
+def record_decision(plan: RetrievalPlan, strategy: str, rerank_available: bool,
+                    remaining_seconds: Optional[float], queue_depth: int):
+    """Record the chosen plan in the enclosing track_degradation() block, if any."""
+    decision = _decision.get()
+    if decision is None:
+        return
+    ran = plan.stages(strategy, rerank_available)
+    decision.update(
+        level=plan.level,
+        stages=ran,
+        skipped=[stage for stage in FULL_PLAN.stages(strategy, rerank_available) if stage not in ran],
+        k=plan.k,
+        remaining_budget_s=round(remaining_seconds, 2) if remaining_seconds is not None else None,
+        queue_depth=queue_depth
+    )
+
+
+def note_stage(stage: str, ran: bool):
+    """
+    Correct the recorded stages for a stage decided at retrieval time.
+
+    The adaptive ensemble may skip rerank or run query expansion depending
+    on the query; this keeps the reported stages accurate.
+
+    Args:
+        stage: Stage name, e.g. "rerank" or "query_expansion"
+        ran: Whether the stage ran
+    """
+    decision = _decision.get()
+    if not decision:
+        return
+    stages, skipped = decision['stages'], decision['skipped']
+    if ran:
+        if stage not in stages:
+            stages.append(stage)
+        if stage in skipped:
+            skipped.remove(stage)
+    else:
+        if stage in stages:
+            stages.remove(stage)
+        if stage not in skipped:
+            skipped.append(stage)
@@ -0,0 +1,430 @@
+"""
+Ingredient list normalization and interning.
+
+Ingredient lists arrive as free text: inconsistent casing, label filler
+("Contains 2% or less of", "added to preserve freshness"), annotations
+in parentheses and typos ("Coconute Sugar", "Roboflavin", "Babana").
+IngredientNormalizer turns a list into canonical ingredients:
+
+1. Tokenize into items on commas, semicolons, colons and periods.
+   Parentheses list sub-ingredients ("Color (Red 40)", "Vegetable Oil
+   (Partially Hydrogenated Soybean Oil)"), which are kept. Only a
+   parenthesis that holds nothing but an annotation of the item before
+   it is dropped: label filler ("(for freshness)"), a percentage
+   ("(2%)") or the item's own name ("Sugar (Sugars)").
+2. Strip label filler and group headers ("Vitamins and Minerals"), and
+   set a leading qualifier aside ("Organic"): it stays on the name, but
+   the checks below look at the ingredient after it.
+3. Correct each word to a known ingredient word within one edit, through
+   a delete-neighbourhood index, when the correction is unambiguous and
+   the corrected item is a known ingredient ("Organic Babana Puree"). A
+   one-word item must be longer still, and ordinary words one edit from
+   an ingredient (DICTIONARY_WORDS) are never corrected, so they stay as
+   written ("Money" is not "honey", "Lactase" is not "lactose").
+4. Map aliases to one canonical name ("thiamine" -> "thiamin"), and split
+   an unknown item that is two known ingredients with the comma missing
+   ("Riboflavin Niacinamide").
+5. Intern the name: every canonical ingredient gets a stable integer ID.
+
+The known vocabulary is fixed (COMMON_INGREDIENTS, INGREDIENT_ALIASES and
+the rule lexicons), so the same text always normalizes the same way and
+cache keys built from it stay stable. Items and whole lists are memoized.
+The rule engine (backend/rules.py) classifies the normalized list, so rule
+matching and cache keys see the same ingredients.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.rules import ADDED_SUGARS, ALLERGENS, BAD_ADDITIVES
+
+# Canonical names of common packaged-food ingredients
+COMMON_INGREDIENTS: List[str] = [
+    # Grains and flours
+    "oats", "whole grain oats", "whole grain rolled oats", "oat flour", "whole grain oat flour", "oat bran",
+    "wheat", "whole grain wheat", "wheat flour", "whole wheat flour", "wheat bran", "wheat starch",
+    "enriched flour", "corn", "corn meal", "whole grain corn", "corn flour", "corn starch", "rice",
+    "brown rice", "red rice", "rice flour", "brown rice flour", "barley", "barley flakes", "barley malt extract",
+    "rye flakes", "sorghum", "whole grain sorghum", "sorghum flakes", "quinoa", "red quinoa", "amaranth",
+    "millet", "buckwheat", "buckwheat kernels", "spelt", "kamut", "teff", "tapioca starch", "potato starch",
+    # Fruit, nuts and seeds
+    "raisins", "cranberries", "dried cranberries", "dried bananas", "banana puree", "apples", "dried apples",
+    "apple puree", "raspberry puree", "strawberries", "blueberries", "dates", "almonds", "pecans", "walnuts",
+    "cashews", "hazelnuts", "peanuts", "coconut", "chia seeds", "flax seeds", "hulled hemp seeds",
+    "pumpkin seeds", "sunflower seeds", "sesame seeds",
+    # Fats and oils
+    "canola oil", "sunflower oil", "safflower oil", "palm oil", "palm kernel oil", "coconut oil", "soybean oil",
+    "vegetable oil", "high oleic sunflower oil",
+    # Flavor and color
+    "salt", "sea salt", "cinnamon", "cocoa", "cocoa powder", "chocolate", "vanilla", "vanilla extract",
+    "natural flavor", "malt flavor", "caramel color", "annatto extract", "turmeric extract", "paprika extract",
+    "vegetable juice concentrate", "fruit juice concentrate", "rosemary extract", "rosemary",
+    # Proteins and fibers
+    "pea protein", "soy protein isolate", "whey protein", "milk protein", "chicory root fiber", "inulin",
+    "psyllium husk", "gum arabic", "guar gum", "xanthan gum", "gelatin",
+    # Processing aids and leavening
+    "alpha amylase", "baking soda", "calcium carbonate", "tripotassium phosphate",
+    "trisodium phosphate", "sodium ascorbate", "citric acid", "malic acid", "soy lecithin", "sunflower lecithin",
+    "yeast", "enzymes", "modified corn starch", "maltodextrin", "glycerin",
+    # Preservatives
+    "tocopherols", "mixed tocopherols", "ascorbic acid",
+    # Vitamins and minerals
+    "vitamin a", "vitamin a palmitate", "vitamin c", "vitamin d", "vitamin d3", "vitamin e", "vitamin b6",
+    "vitamin b12", "thiamin", "thiamin mononitrate", "thiamin hydrochloride", "riboflavin", "niacin",
+    "niacinamide", "pantothenic acid", "calcium pantothenate", "pyridoxine hydrochloride", "folic acid",
+    "biotin", "iron", "reduced iron", "electrolytic iron", "ferric orthophosphate", "ferrous fumarate",
+    "zinc oxide", "potassium chloride", "magnesium oxide", "calcium phosphate", "potassium iodide",
+]
+
+# Alias -> canonical name (true synonyms and spelling variants only)
+INGREDIENT_ALIASES: Dict[str, str] = {
+    "sugars": "sugar",
+    "hfcs": "high fructose corn syrup",
+    "natural flavors": "natural flavor",
+    "natural flavour": "natural flavor",
+    "artificial flavors": "artificial flavor",
+    "artificial colors": "artificial color",
+    "thiamine": "thiamin",
+    "thiamine mononitrate": "thiamin mononitrate",
+    "thiamine hydrochloride": "thiamin hydrochloride",
+    "vitamin b1": "thiamin",
+    "vitamin b2": "riboflavin",
+    "vitamin b3": "niacin",
+    "vitamin b5": "pantothenic acid",
+    "vitamin b9": "folic acid",
+    "folate": "folic acid",
+    "retinyl palmitate": "vitamin a palmitate",
+    "cholecalciferol": "vitamin d3",
+    "oat": "oats",
+    "whole grain oat": "whole grain oats",
+    "rolled oats": "whole grain rolled oats",
+    "butylated hydroxytoluene": "bht",
+    "butylated hydroxyanisole": "bha",
+    "sodium bicarbonate": "baking soda",
+}
+
+# Words that are only ever label filler, kept in the vocabulary so they are not "corrected"
+_FILLER_WORDS = ["contains", "less", "than", "following", "added", "preserve", "maintain", "protect",
+                 "freshness", "quality", "ingredient", "ingredients", "vitamins", "minerals", "source",
+                 "organic", "whole", "grain"]
+
+# Ordinary words within one edit of an ingredient word. They are in the
+# vocabulary, so they are never typo-corrected to the ingredient word.
+DICTIONARY_WORDS: List[str] = [
+    "allure", "apply", "batter", "bellow", "better", "bitter", "brain", "butler", "casing", "cheat", "colon",
+    "cried", "crown", "drain", "drown", "feeds", "fellow", "floor", "flora", "folks", "fried", "frown", "grade",
+    "graph", "grate", "grown", "gutter", "holes", "honed", "hones", "insert", "invent", "invest", "lactase",
+    "mellow", "money", "needs", "phoney", "powered", "pried", "putter", "reeds", "train", "weeds", "whale",
+    "wheal", "while", "whose", "yokes",
+]
+
+_LIST_TOKEN = re.compile(r"[a-z0-9]+|[(\[{]|[)\]}]|[,;:]|(?<!\bno)\.(?!\d)")  # "No." and "2.5" do not end an item
+_OPEN = "([{"
+_CLOSE = ")]}"
+_PREFIX_FILLER = re.compile(
+    r"^(?:(?:and|or|also|contains)\s+)*"
+    r"(?:(?:\d+\s+)*(?:or\s+)?less(?:\s+than)?(?:\s+\d+)*(?:\s+of)?(?:\s+each)?(?:\s+of)?(?:\s+the\s+following)?\s*)?"
+)
+_SUFFIX_FILLER = re.compile(
+    r"\s*(?:(?:added\s+)?(?:to\s+(?:preserve|maintain|protect)|for)\s+(?:freshness|color|colour|flavor|quality))$"
+)
+# Qualifiers kept on the name but not part of the ingredient ("organic banana puree")
+_QUALIFIER = re.compile(r"^(?:organic\s+)+(?=\S)")
+# "FD&C Red No. 40", "Red Dye 40" -> "red 40" (lakes keep their suffix)
+_COLOR = re.compile(r"^(?:fd c\s+)?(red|yellow|blue|green)\s+(?:no\s+|dye\s+)?(\d+)(\s+lake)?$")
+_HEADERS = {"vitamins and minerals", "vitamins minerals", "vitamins", "minerals", "ingredients", "contains"}
+
+# Words shorter than this are never typo-corrected (too many false positives)
+_MIN_CORRECTION_LENGTH = 5
+_MIN_STANDALONE_CORRECTION_LENGTH = 6  # For an item that is a single word
+
+_ITEM_CACHE_SIZE = 65536
+_MAX_INTERNED = 1_000_000  # Beyond this, new names are returned with ID -1 instead of being interned
+
+
+@dataclass(frozen=True)
+class NormalizedIngredients:
+    """Canonical form of an ingredient list (shared via memoization, so immutable)."""
+    ids: Tuple[int, ...]
+    names: Tuple[str, ...]
+    corrections: Tuple[Tuple[str, str], ...] = ()
+
+    @property
+    def text(self) -> str:
+        """Canonical ingredient list, comma-separated, in label order."""
+        return ", ".join(self.names)
+
+
+def _deletes(word: str) -> Iterable[str]:
+    """All strings one deletion away from word."""
+    return (word[:i] + word[i + 1:] for i in range(len(word)))
+
+
+class IngredientNormalizer:
+    """Tokenizes, corrects, canonicalizes and interns ingredient lists."""
+
+    def __init__(
+        self,
+        ingredients: Optional[Iterable[str]] = None,
+        aliases: Optional[Dict[str, str]] = None,
+        dictionary: Optional[Iterable[str]] = None,
+        cache_size: int = 65536
+    ):
+        """
+        Build the vocabulary and typo index.
+
+        Args:
+            ingredients: Canonical ingredient names (default: COMMON_INGREDIENTS
+                plus the rule lexicons)
+            aliases: Alias -> canonical name (default: INGREDIENT_ALIASES)
+            dictionary: Ordinary words that are never typo-corrected
+                (default: DICTIONARY_WORDS)
+            cache_size: Number of normalized ingredient lists to memoize
+        """
+        if ingredients is None:
+            lexicon_phrases = [
+                phrase
+                for lexicon in (ADDED_SUGARS, BAD_ADDITIVES, ALLERGENS)
+                for canonical, synonyms in lexicon.items()
+                for phrase in [canonical, *synonyms]
+            ]
+            ingredients = [*COMMON_INGREDIENTS, *lexicon_phrases]
+        self.aliases = dict(INGREDIENT_ALIASES if aliases is None else aliases)
+
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        for name in [*ingredients, *self.aliases.values()]:
+            self.intern(" ".join(_LIST_TOKEN.findall(name.lower())))
+        self._known = frozenset(self._names)
+
+        self._vocabulary = {word for name in [*self._names, *self.aliases] for word in name.split()}
+        self._vocabulary.update(_FILLER_WORDS)
+        self._dictionary = self._vocabulary | {
+            word for phrase in (DICTIONARY_WORDS if dictionary is None else dictionary)
+            for word in _LIST_TOKEN.findall(phrase.lower())
+        }
+        self._delete_index: Dict[str, set] = {}
+        for word in self._vocabulary:
+            if len(word) < _MIN_CORRECTION_LENGTH or word.isdigit():
+                continue
+            self._delete_index.setdefault(word, set()).add(word)
+            for deleted in _deletes(word):
+                self._delete_index.setdefault(deleted, set()).add(word)
+
+        self._item_cache: Dict[str, Tuple[str, Tuple[Tuple[str, str], ...]]] = {}
+        self._stats = {'items': 0, 'item_cache_hits': 0, 'corrected_words': 0, 'aliased': 0, 'overflow': 0}
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def intern(self, name: str) -> int:
+        """
+        Get the ID of a canonical name, assigning the next ID on first sight.
+
+        Returns:
+            Ingredient ID, or -1 once the table holds _MAX_INTERNED names
+        """
+        ingredient_id = self._ids.get(name)
+        if ingredient_id is not None:
+            return ingredient_id
+        with self._lock:
+            ingredient_id = self._ids.get(name)
+            if ingredient_id is None:
+                if len(self._names) >= _MAX_INTERNED:
+                    self._stats['overflow'] += 1
+                    return -1
+                ingredient_id = self._ids[name] = len(self._names)
+                self._names.append(name)
+            return ingredient_id
+
+    def name(self, ingredient_id: int) -> str:
+        """Canonical name of an interned ingredient."""
+        return self._names[ingredient_id]
+
+    def canonical(self, item: str) -> Tuple[str, ...]:
+        """
+        Canonical names of a single ingredient item (no list splitting).
+
+        Args:
+            item: One ingredient, e.g. "Coconute Sugar"
+
+        Returns:
+            Canonical names, e.g. ("coconut sugar",); empty for pure filler,
+            two names for a run-on item such as "Riboflavin Niacinamide"
+        """
+        return self._canonical_item(_LIST_TOKEN.findall(item.lower()))[0]
+
+    def stats(self) -> dict:
+        """
+        Get normalization statistics.
+
+        Returns:
+            Dictionary with interned names, vocabulary size, items
+            normalized, cache hits, corrections and alias resolutions
+        """
+        lists = self.normalize.cache_info()
+        stats = dict(self._stats)
+        stats.update({
+            'interned': len(self._names),
+            'vocabulary_words': len(self._vocabulary),
+            'cached_items': len(self._item_cache),
+            'list_cache_hits': lists.hits,
+            'list_cache_misses': lists.misses,
+        })
+        return stats
+
+    def _normalize(self, text: str) -> NormalizedIngredients:
+        """
+        Normalize an ingredient list.
+
+        Args:
+            text: Free-text ingredient list
+
+        Returns:
+            NormalizedIngredients with canonical IDs and names in label order
+        """
+        ids, names, corrections = [], [], {}
+        for words in self._split_items(text):
+            item_names, item_corrections = self._canonical_item(words)
+            for name in item_names:
+                ids.append(self.intern(name))
+                names.append(name)
+            corrections.update(item_corrections)
+        return NormalizedIngredients(
+            ids=tuple(ids),
+            names=tuple(names),
+            corrections=tuple(sorted(corrections.items()))
+        )
+
+    def _is_annotation(self, owner: Optional[List[str]], inner: List[List[str]]) -> bool:
+        """Whether a parenthesis holding `inner` only annotates the item `owner` before it."""
+        if owner is None or len(inner) != 1 or " ".join(owner) in _HEADERS:
+            return False
+        phrase = _SUFFIX_FILLER.sub("", _PREFIX_FILLER.sub("", " ".join(inner[0])))
+        if all(word.isdigit() for word in phrase.split()):
+            return True  # Filler or a percentage
+        return self._canonical_item(inner[0])[0] == self._canonical_item(owner)[0]
+
+    def _split_items(self, text: str) -> List[List[str]]:
+        """Word lists of the items in an ingredient list, with annotations dropped."""
+        groups: List[List[List[str]]] = [[]]  # Items per open bracket level
+        owners: List[Optional[List[str]]] = []  # Item each open bracket follows
+        current: List[str] = []
+
+        def flush():
+            if current:
+                groups[-1].append(list(current))
+                current.clear()
+
+        for token in _LIST_TOKEN.findall(text.lower()):
+            if token in _OPEN:
+                flush()
+                owners.append(groups[-1][-1] if groups[-1] else None)
+                groups.append([])
+            elif token in _CLOSE:
+                flush()
+                if len(groups) > 1:
+                    inner = groups.pop()
+                    owner = owners.pop()
+                    if not self._is_annotation(owner, inner):
+                        groups[-1].extend(inner)
+            elif not token[0].isalnum():
+                flush()
+            else:
+                current.append(token)
+        flush()
+        while len(groups) > 1:  # Unclosed brackets
+            groups[-2].extend(groups.pop())
+        return groups[0]
+
+    def _canonical_item(self, words: List[str]) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]]:
+        """Canonical names of one item's words and the word corrections applied."""
+        raw = " ".join(words)
+        cached = self._item_cache.get(raw)
+        self._stats['items'] += 1
+        if cached is not None:
+            self._stats['item_cache_hits'] += 1
+            return cached
+
+        phrase = _SUFFIX_FILLER.sub("", _PREFIX_FILLER.sub("", raw))
+        qualifier = _QUALIFIER.match(phrase)
+        qualifier = qualifier.group() if qualifier else ""
+        words = phrase[len(qualifier):].split()
+        min_length = _MIN_CORRECTION_LENGTH if len(words) > 1 else _MIN_STANDALONE_CORRECTION_LENGTH
+        corrected = [self._correct_word(word, min_length) for word in words]
+        if corrected != words and not all(
+            self._is_known(_COLOR.sub(r"\1 \2\3", part)) for part in self._split_run_on(corrected)
+        ):
+            corrected = words  # Only corrections that yield known ingredients
+        corrections = [(word, fixed) for word, fixed in zip(words, corrected) if fixed != word]
+        self._stats['corrected_words'] += len(corrections)
+        name = " ".join(corrected)
+        if not name or name in _HEADERS:
+            names = ()
+        else:
+            names = tuple(qualifier + self._resolve(part) for part in self._split_run_on(corrected))
+
+        result = (names, tuple(corrections))
+        if len(self._item_cache) >= _ITEM_CACHE_SIZE:
+            self._item_cache.clear()
+        self._item_cache[raw] = result
+        return result
+
+    def _resolve(self, name: str) -> str:
+        name = _COLOR.sub(r"\1 \2\3", name)
+        alias = self.aliases.get(name)
+        if alias is None:
+            return name
+        self._stats['aliased'] += 1
+        return alias
+
+    def _is_known(self, name: str) -> bool:
+        return name in self._known or name in self.aliases
+
+    def _split_run_on(self, words: List[str]) -> List[str]:
+        """An unknown item as two known ingredients if it splits cleanly, else unchanged."""
+        name = " ".join(words)
+        if len(words) > 1 and not self._is_known(name):
+            for i in range(1, len(words)):
+                head, tail = " ".join(words[:i]), " ".join(words[i:])
+                if self._is_known(head) and self._is_known(tail):
+                    return [head, tail]
+        return [name]
+
+    def _correct_word(self, word: str, min_length: int = _MIN_CORRECTION_LENGTH) -> str:
+        """Resolve a word outside the dictionary to a known ingredient word within one edit, if unambiguous."""
+        if word in self._dictionary or len(word) < min_length or word.isdigit():
+            return word
+        candidates = set(self._delete_index.get(word, ()))
+        for deleted in _deletes(word):
+            candidates.update(self._delete_index.get(deleted, ()))
+        candidates = {c for c in candidates if abs(len(c) - len(word)) <= 1}
+        if len(candidates) == 1:
+            return candidates.pop()
+        return word
+
+
+_default_normalizer: Optional[IngredientNormalizer] = None
+
+
+def get_normalizer() -> IngredientNormalizer:
+    """Get the process-wide ingredient normalizer, building it on first use."""
+    global _default_normalizer
+    if _default_normalizer is None:
+        _default_normalizer = IngredientNormalizer()
+    return _default_normalizer
+
+
+def normalize_ingredients(text: str) -> NormalizedIngredients:
+    """
+    Normalize an ingredient list with the default normalizer.
+
+    Args:
+        text: Free-text ingredient list
+
+    Returns:
+        NormalizedIngredients with canonical IDs and names in label order
+    """
+    return get_normalizer().normalize(text)
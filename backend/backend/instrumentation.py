@@ -0,0 +1,246 @@
+"""
+Per-stage latency, token and cost instrumentation for the RAG pipeline.
+
+Code under measurement opens a span:
+
+    with span("retrieve") as s:
+        docs = retriever.invoke(query)
+        s.set(documents=len(docs))
+
+Spans are recorded into the current request trace (when a caller asked
+for one with capture()) and into process-wide aggregates (when
+INSTRUMENTATION_ENABLED). With neither active, span() returns a shared
+no-op object, so disabled instrumentation costs one ContextVar lookup.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from backend.config import INSTRUMENTATION_ENABLED, MODEL_PRICING_PER_1M_TOKENS
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("pipeline_trace", default=None)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int = 0) -> float:
+    """
+    Estimate the USD cost of a model call.
+
+    Args:
+        model: Model name (see MODEL_PRICING_PER_1M_TOKENS)
+        input_tokens: Prompt tokens
+        output_tokens: Completion tokens
+
+    Returns:
+        Estimated cost in USD (0.0 for unknown models)
+    """
+    pricing = MODEL_PRICING_PER_1M_TOKENS.get(model)
+    if pricing is None:
+        return 0.0
+    return (input_tokens * pricing['input'] + output_tokens * pricing['output']) / 1_000_000
+
+
+class RequestTrace:
+    """Spans recorded while serving a single request."""
+
+    def __init__(self):
+        self.spans: List[dict] = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, record: dict):
+        with self._lock:
+            self.spans.append(record)
+
+    def summary(self) -> dict:
+        """
+        Summarize the trace for an API response.
+
+        Returns:
+            Dictionary with total time, spans, token totals and estimated cost
+        """
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'spans': spans,
+            'prompt_tokens': sum(s.get('prompt_tokens', 0) for s in spans),
+            'completion_tokens': sum(s.get('completion_tokens', 0) for s in spans),
+            'estimated_cost_usd': round(sum(s.get('cost_usd', 0.0) for s in spans), 6),
+        }
+
+
+class PipelineStats:
+    """Process-wide aggregates per span name."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages: Dict[str, dict] = {}
+
+    def record(self, record: dict):
+        with self._lock:
+            stage = self._stages.get(record['name'])
+            if stage is None:
+                stage = self._stages[record['name']] = {
+                    'count': 0,
+                    'errors': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'documents': 0,
+                    'prompt_tokens': 0,
+                    'cached_prompt_tokens': 0,
+                    'completion_tokens': 0,
+                    'cost_usd': 0.0,
+                }
+            stage['count'] += 1
+            stage['total_ms'] += record['duration_ms']
+            stage['max_ms'] = max(stage['max_ms'], record['duration_ms'])
+            if record.get('error'):
+                stage['errors'] += 1
+            for field in ('documents', 'prompt_tokens', 'cached_prompt_tokens', 'completion_tokens', 'cost_usd'):
+                stage[field] += record.get(field, 0)
+
+    def snapshot(self) -> dict:
+        """
+        Get aggregated statistics per stage.
+
+        Returns:
+            Dictionary of stage name -> counts, latency and token totals
+        """
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+        for stage in stages.values():
+            stage['avg_ms'] = round(stage['total_ms'] / stage['count'], 2) if stage['count'] else 0.0
+            stage['total_ms'] = round(stage['total_ms'], 2)
+            stage['max_ms'] = round(stage['max_ms'], 2)
+            stage['cost_usd'] = round(stage['cost_usd'], 6)
+        return stages
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+pipeline_stats = PipelineStats(enabled=INSTRUMENTATION_ENABLED)
+
+# Callables notified with every finished span record (e.g. metrics histograms)
+_span_observers: List[Callable[[dict], None]] = []
+
+
+def add_span_observer(observer: Callable[[dict], None]):
+    """
+    Register a callable that receives every finished span record.
+
+    Observers only run while spans are recorded, i.e. when a trace is
+    being captured or aggregation is enabled.
+
+    Args:
+        observer: Function taking the span record dictionary
+    """
+    _span_observers.append(observer)
+
+
+class _Span:
+    """An active timing span."""
+
+    __slots__ = ('name', 'trace', 'fields', '_start')
+
+    def __init__(self, name: str, trace: Optional[RequestTrace]):
+        self.name = name
+        self.trace = trace
+        self.fields = {}
+
+    def set(self, **fields):
+        """Attach fields (documents, prompt_tokens, ...) to the span."""
+        self.fields.update(fields)
+
+    def record_llm_usage(self, model: str, response):
+        """Attach token usage and estimated cost from a chat model response."""
+        usage = getattr(response, 'usage_metadata', None) or {}
+        prompt_tokens = usage.get('input_tokens', 0)
+        completion_tokens = usage.get('output_tokens', 0)
+        cached_tokens = (usage.get('input_token_details') or {}).get('cache_read', 0)
+        self.fields.update(
+            model=model,
+            prompt_tokens=prompt_tokens,
+            cached_prompt_tokens=cached_tokens,
+            completion_tokens=completion_tokens,
+            cost_usd=estimate_cost(model, prompt_tokens, completion_tokens),
+        )
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record = {
+            'name': self.name,
+            'duration_ms': round((time.perf_counter() - self._start) * 1000, 2),
+            **self.fields,
+        }
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        if self.trace is not None:
+            record['start_ms'] = round((self._start - self.trace.started) * 1000, 2)
+            self.trace.add(record)
+        if pipeline_stats.enabled:
+            pipeline_stats.record(record)
+        for observer in _span_observers:
+            observer(record)
+        return False
+
+
+class _NoopSpan:
+    """Span used when instrumentation is off."""
+
+    __slots__ = ()
+
+    def set(self, **fields):
+        pass
+
+    def record_llm_usage(self, model: str, response):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str):
+    """
+    Open a timing span for a pipeline stage.
+
+    Args:
+        name: Stage name, e.g. "retrieve" or "retriever.bm25"
+
+    Returns:
+        Context manager yielding the span
+    """
+    trace = _current_trace.get()
+    if trace is None and not pipeline_stats.enabled:
+        return _NOOP_SPAN
+    return _Span(name, trace)
+
+
+@contextmanager
+def capture():
+    """
+    Record every span opened in this context into a new RequestTrace.
+
+    Yields:
+        RequestTrace for the current request
+    """
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
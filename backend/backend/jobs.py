@@ -0,0 +1,376 @@
+"""
+Asynchronous job queue for long-running analyses.
+
+/api/jobs accepts an analysis (or a batch of them) and returns a job ID
+immediately; a pool of worker threads executes queued jobs and clients
+poll or long-poll for the result. Jobs are stored in SQLite, so queued
+work survives a restart (jobs that were running are re-queued).
+
+Several server processes can share one queue file: a job is claimed
+with a conditional UPDATE, so exactly one process runs it, and
+long-polls re-read the job periodically to see work finished elsewhere.
+
+Jobs run in priority order (higher first, then oldest first). A failed
+attempt is retried with exponential backoff up to max_attempts. A worker
+that finds the queue file locked by another process ("database is
+locked") backs off and retries instead of exiting.
+
+A job submitted for a tenant can only be read back by that tenant: get()
+and wait() report a job of another tenant (or of the operator) as unknown.
+Threads rather than processes are used because the work is dominated by
+network calls to the model providers, and the pipeline (index, caches,
+clients) is shared in-process.
+"""
+
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+# Backoff while the queue file is locked by another process
+_LOCKED_RETRY_SECONDS = 0.05
+_LOCKED_RETRY_MAX_SECONDS = 2.0
+
+
+class JobQueue:
+    """SQLite-backed priority job queue with a worker thread pool."""
+
+    def __init__(
+        self,
+        run_job: Callable[[str, dict, Callable[[dict], None]], Any],
+        db_path: str = ":memory:",
+        workers: int = 4,
+        max_attempts: int = 3,
+        retry_backoff: float = 2.0,
+        retention_seconds: float = 86400,
+        requeue_running: bool = True,
+        poll_interval: float = 1.0
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            run_job: Function (kind, payload, report_progress) -> JSON-serializable result
+            db_path: SQLite file holding the queue (":memory:" for no persistence)
+            workers: Maximum number of jobs executed concurrently
+            max_attempts: Attempts per job before it is marked failed
+            retry_backoff: Base delay in seconds before a retry (doubles per attempt)
+            retention_seconds: Finished jobs older than this are purged
+            requeue_running: Re-queue jobs left running by a previous process.
+                Disable when other processes share the queue file; their
+                running jobs are not interrupted.
+            poll_interval: Seconds between re-reads of the queue while waiting,
+                for jobs submitted or finished by other processes
+        """
+        self.run_job = run_job
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.retention_seconds = retention_seconds
+        self.poll_interval = poll_interval
+        self.db_path = str(db_path)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._running = 0
+        self._claimed: Set[str] = set()  # Jobs this process is running
+
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL, "
+            "progress TEXT, result TEXT, error TEXT, created_at REAL NOT NULL, "
+            "available_at REAL NOT NULL, started_at REAL, finished_at REAL, tenant_id TEXT)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if 'tenant_id' not in columns:  # Queue file from before tenant-owned jobs
+            self._db.execute("ALTER TABLE jobs ADD COLUMN tenant_id TEXT")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created_at)"
+        )
+        if requeue_running:
+            requeue_interrupted_jobs(self._db)
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            self._stopping = False
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._worker, name=f"job-worker-{len(self._threads)}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def stop(self, requeue: bool = False):
+        """
+        Ask the workers to exit after their current job.
+
+        Args:
+            requeue: Also put the jobs this process is running back in the
+                queue, for a process that exits without finishing them
+        """
+        with self._changed:
+            self._stopping = True
+            if requeue and self._claimed:
+                self._db.executemany(
+                    "UPDATE jobs SET status = ? WHERE id = ? AND status = ?",
+                    [(QUEUED, job_id, RUNNING) for job_id in self._claimed]
+                )
+                self._db.commit()
+                print(f"Re-queued {len(self._claimed)} interrupted job(s)")
+                self._claimed.clear()
+            self._changed.notify_all()
+
+    def reopen(self):
+        """Open a new SQLite connection (in a forked child; the parent's must not be shared)."""
+        with self._lock:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def submit(self, kind: str, payload: dict, priority: int = 0, tenant_id: Optional[str] = None) -> str:
+        """
+        Queue a job.
+
+        Args:
+            kind: Job type understood by run_job, e.g. "analysis" or "batch"
+            payload: JSON-serializable job input
+            priority: Higher runs first
+            tenant_id: Tenant that owns the job (None for the operator)
+
+        Returns:
+            Job ID
+        """
+        job_id = secrets.token_urlsafe(12)
+        now = time.time()
+        with self._changed:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, payload, priority, status, attempts, created_at, available_at, "
+                "tenant_id) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), priority, QUEUED, now, now, tenant_id)
+            )
+            self._db.commit()
+            self._changed.notify_all()
+        return job_id
+
+    def get(self, job_id: str, include_result: bool = True, tenant_id: Optional[str] = None) -> Optional[dict]:
+        """
+        Get a job's status.
+
+        Args:
+            job_id: Job ID from submit()
+            include_result: Include the result payload
+            tenant_id: Tenant asking (None for the operator)
+
+        Returns:
+            Job dictionary or None if unknown or owned by someone else
+        """
+        with self._lock:
+            return self._get_locked(job_id, include_result, tenant_id)
+
+    def wait(
+        self,
+        job_id: str,
+        timeout: float,
+        include_result: bool = True,
+        tenant_id: Optional[str] = None
+    ) -> Optional[dict]:
+        """
+        Long-poll: block until the job finishes or the timeout expires.
+
+        Args:
+            job_id: Job ID from submit()
+            timeout: Maximum seconds to wait
+            include_result: Include the result payload
+            tenant_id: Tenant asking (None for the operator)
+
+        Returns:
+            Job dictionary (possibly still queued/running) or None if unknown
+            or owned by someone else
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self._get_locked(job_id, include_result, tenant_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job['status'] in FINISHED_STATES or remaining <= 0:
+                    return job
+                self._changed.wait(min(remaining, self.poll_interval))
+
+    def stats(self) -> dict:
+        """
+        Get queue statistics.
+
+        Returns:
+            Dictionary with job counts by status and worker counts
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            counts = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+            counts.update(dict(rows))
+            return {
+                'jobs': counts,
+                'workers': self.workers,
+                'busy_workers': self._running,
+                'max_attempts': self.max_attempts,
+            }
+
+    def _get_locked(self, job_id: str, include_result: bool, tenant_id: Optional[str]) -> Optional[dict]:
+        row = self._db.execute(
+            "SELECT id, kind, priority, status, attempts, progress, result, error, "
+            "created_at, started_at, finished_at, tenant_id FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None or row[11] != tenant_id:
+            return None  # Another tenant's job looks like an unknown one
+        job = {
+            'job_id': row[0],
+            'kind': row[1],
+            'priority': row[2],
+            'status': row[3],
+            'attempts': row[4],
+            'progress': json.loads(row[5]) if row[5] else None,
+            'error': row[7],
+            'created_at': row[8],
+            'started_at': row[9],
+            'finished_at': row[10],
+        }
+        if include_result and row[3] == SUCCEEDED:
+            job['result'] = json.loads(row[6])
+        return job
+
+    def _claim_locked(self) -> Optional[tuple]:
+        """Mark the next ready job as running. Returns (id, kind, payload, attempts) or None."""
+        while True:
+            row = self._db.execute(
+                "SELECT id, kind, payload, attempts FROM jobs WHERE status = ? AND available_at <= ? "
+                "ORDER BY priority DESC, created_at LIMIT 1",
+                (QUEUED, time.time())
+            ).fetchone()
+            if row is None:
+                return None
+            # Only succeeds if no other process claimed the job since the SELECT
+            claimed = self._db.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), row[0], QUEUED)
+            ).rowcount
+            self._db.commit()
+            if claimed:
+                self._claimed.add(row[0])
+                return row[0], row[1], json.loads(row[2]), row[3] + 1
+
+    def _next_ready_in_locked(self) -> float:
+        """Seconds until the earliest delayed retry becomes ready (capped)."""
+        row = self._db.execute(
+            "SELECT MIN(available_at) FROM jobs WHERE status = ?", (QUEUED,)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return 5.0
+        return min(max(row[0] - time.time(), 0.05), self.poll_interval)
+
+    def _worker(self):
+        while True:
+            with self._changed:
+                job = None
+                backoff = _LOCKED_RETRY_SECONDS
+                while not self._stopping:
+                    try:
+                        job = self._claim_locked()
+                        if job is not None:
+                            break
+                        ready_in = self._next_ready_in_locked()
+                    except sqlite3.OperationalError as e:
+                        # Another process holds the queue file; back off rather than exit
+                        print(f"Warning: could not claim a job ({e}), retrying in {backoff:.2f}s")
+                        self._db.rollback()
+                        self._changed.wait(backoff)
+                        backoff = min(backoff * 2, _LOCKED_RETRY_MAX_SECONDS)
+                        continue
+                    backoff = _LOCKED_RETRY_SECONDS
+                    self._changed.wait(ready_in)
+                if job is None:
+                    return
+                self._running += 1
+                self._changed.notify_all()
+            job_id, kind, payload, attempts = job
+
+            def report_progress(progress: dict, job_id=job_id):
+                with self._changed:
+                    try:
+                        self._db.execute(
+                            "UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id)
+                        )
+                        self._db.commit()
+                    except sqlite3.OperationalError as e:
+                        # Progress is advisory: the next report or the result catches up
+                        print(f"Warning: could not record progress of job {job_id}: {e}")
+                        self._db.rollback()
+
+            try:
+                result = self.run_job(kind, payload, report_progress)
+                update = ("UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ? WHERE id = ?",
+                          (SUCCEEDED, json.dumps(result), time.time(), job_id))
+            except Exception as e:
+                print(f"Job {job_id} attempt {attempts} failed: {e}")
+                if attempts < self.max_attempts:
+                    delay = self.retry_backoff * (2 ** (attempts - 1))
+                    update = ("UPDATE jobs SET status = ?, error = ?, available_at = ? WHERE id = ?",
+                              (QUEUED, str(e), time.time() + delay, job_id))
+                else:
+                    update = ("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                              (FAILED, str(e), time.time(), job_id))
+
+            backoff = _LOCKED_RETRY_SECONDS
+            while True:
+                with self._changed:
+                    try:
+                        self._db.execute(*update)
+                        self._db.execute(
+                            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                            (time.time() - self.retention_seconds,)
+                        )
+                        self._db.commit()
+                    except sqlite3.OperationalError as e:
+                        # Keep the outcome and retry: the job stays claimed until it is recorded
+                        print(f"Warning: could not record job {job_id} ({e}), retrying in {backoff:.2f}s")
+                        self._db.rollback()
+                    else:
+                        self._claimed.discard(job_id)
+                        self._running -= 1
+                        self._changed.notify_all()
+                        break
+                time.sleep(backoff)
+                backoff = min(backoff * 2, _LOCKED_RETRY_MAX_SECONDS)
+
+
+def requeue_interrupted_jobs(db) -> int:
+    """
+    Re-queue jobs that were running when their process stopped.
+
+    Call once per queue file at startup, before any process runs jobs.
+
+    Args:
+        db: SQLite connection or path of the queue file
+
+    Returns:
+        Number of jobs re-queued
+    """
+    connection = db if isinstance(db, sqlite3.Connection) else sqlite3.connect(str(db))
+    try:
+        count = connection.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING)).rowcount
+        connection.commit()
+    except sqlite3.OperationalError:  # Queue file not created yet
+        count = 0
+    finally:
+        if connection is not db:
+            connection.close()
+    return count
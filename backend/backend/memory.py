@@ -0,0 +1,161 @@
+"""
+Memory accounting for the indexes, caches and chunk stores.
+
+deep_sizeof() walks an object graph with gc.get_referents() and adds up
+sys.getsizeof() of every object it reaches (classes, modules, functions
+and code are not followed). NumPy arrays count their data buffers.
+
+A MemoryReport measures components in order and charges each object to
+the first component that reaches it: the chunk store held by the vector
+store manager is also referenced by the retrieval manager and the BM25
+index, so those report only what they add on top. Memory-mapped buffers
+are not in the heap and are not counted. Measure the
+component whose per-entry size matters first.
+
+Results of bounded functools.lru_cache caches are held in C structures
+the walker cannot see; for those caches only the keys are counted.
+"""
+
+import gc
+import os
+import sys
+import time
+from types import BuiltinFunctionType, CodeType, FrameType, FunctionType, MethodType, ModuleType
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+SKIP_TYPES = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType, CodeType, FrameType)
+
+
+def deep_sizeof(roots: Iterable[Any], seen: Optional[Set[int]] = None) -> int:
+    """
+    Approximate bytes held by objects reachable from `roots`.
+
+    Args:
+        roots: Objects to start from
+        seen: IDs of objects already counted (updated in place); objects
+            in it are neither counted nor followed
+
+    Returns:
+        Sum of sys.getsizeof() over newly reached objects
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, SKIP_TYPES):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if type(obj).__module__ == 'numpy' and getattr(obj, 'base', None) is not None:
+            stack.append(obj.base)  # A view: the buffer belongs to its base
+        stack.extend(gc.get_referents(obj))
+    return total
+
+
+def qdrant_collection_memory(vectorstore) -> Optional[dict]:
+    """
+    Roots and sizes of a LangChain Qdrant store's collection.
+
+    Only in-process (":memory:" or local path) collections hold their
+    points in this process; for a Qdrant server only the point count is
+    reported.
+
+    Returns:
+        Dictionary with 'points', 'vector_bytes' and 'roots' (None for a
+        server collection), or None if the store has no client
+    """
+    client = getattr(vectorstore, 'client', None)
+    if client is None:
+        return None
+    collections = getattr(getattr(client, '_client', None), 'collections', None)
+    if collections is None:
+        return {
+            'points': client.count(vectorstore.collection_name, exact=True).count,
+            'vector_bytes': None,
+            'roots': None,
+        }
+    collection = collections[vectorstore.collection_name]
+    return {
+        'points': len(collection.ids),
+        'vector_bytes': sum(vectors.nbytes for vectors in collection.vectors.values()),
+        'roots': [collection.vectors, collection.payload, collection.ids, collection.ids_inv,
+                  collection.deleted, collection.sparse_vectors, collection.multivectors],
+    }
+
+
+def live_instances(type_names: Iterable[str]) -> Dict[str, int]:
+    """
+    Count live objects whose class has one of the given names.
+
+    Scans every object tracked by the garbage collector, so it costs
+    time proportional to the heap. More pipeline objects than published
+    versions still in use point at a leak across reconfigurations.
+    Objects frozen with gc.freeze() (the production server's preloaded
+    state) are not visible to gc.get_objects() and are not counted.
+    """
+    counts = dict.fromkeys(type_names, 0)
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in counts:
+            counts[name] += 1
+    return counts
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """Resident and peak resident set size of this process in bytes (Linux; None elsewhere)."""
+    fields = {'VmRSS': None, 'VmHWM': None}
+    try:
+        with open(f"/proc/{os.getpid()}/status") as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in fields:
+                    fields[name] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return {'rss_bytes': fields['VmRSS'], 'peak_rss_bytes': fields['VmHWM']}
+
+
+class MemoryReport:
+    """Per-component memory, each object charged to the first component reaching it."""
+
+    def __init__(self):
+        self.components: Dict[str, dict] = {}
+        self._seen: Set[int] = set()
+        self._start = time.perf_counter()
+
+    def measure(self, name: str, roots: List[Any], entries: Optional[int] = None,
+                entry_name: str = 'entry', **extra) -> int:
+        """
+        Measure a component.
+
+        Args:
+            name: Component name in the report
+            roots: Objects holding the component's data
+            entries: Number of entries (chunks, points, cached analyses, ...)
+            entry_name: What an entry is, for the per-entry field name
+            **extra: Additional fields for the report
+
+        Returns:
+            Bytes charged to the component
+        """
+        size = deep_sizeof(roots, self._seen)
+        component = {'bytes': size, **extra}
+        if entries is not None:
+            component['entries'] = entries
+            component[f'bytes_per_{entry_name}'] = round(size / entries) if entries else None
+        self.components[name] = component
+        return size
+
+    def add(self, name: str, **fields):
+        """Report a component that is not measured (e.g. held outside this process)."""
+        self.components[name] = fields
+
+    def to_dict(self) -> dict:
+        accounted = sum(c.get('bytes') or 0 for c in self.components.values())
+        return {
+            'components': self.components,
+            'accounted_bytes': accounted,
+            'process': process_memory(),
+            'measure_ms': round((time.perf_counter() - self._start) * 1000, 1),
+        }
@@ -0,0 +1,269 @@
+"""
+Prometheus-style metrics for the KidSafe Food Analyzer.
+
+Counters and histograms are sharded per thread: each thread updates its
+own dictionary without taking a lock, and the shards are only summed when
+/metrics is scraped. Shards of finished threads are folded into a retired
+total so thread-per-request servers do not grow the shard list forever.
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from cache reads to slow LLM generations
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _ThreadShards:
+    """Per-thread dictionaries of label tuple -> value, merged on collection."""
+
+    def __init__(self, merge: Callable, copy: Callable):
+        self._merge = merge
+        self._copy = copy
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+
+    def shard(self) -> dict:
+        """Get the calling thread's shard, creating it on first use."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            self._local.values = values
+            with self._lock:
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def collect(self) -> dict:
+        """Sum all shards, retiring those of threads that have exited."""
+        with self._lock:
+            live = []
+            for thread, values in self._shards:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    for key, value in values.copy().items():
+                        self._retired[key] = self._merge(self._retired.get(key), value)
+            self._shards = live
+            total = {key: self._copy(value) for key, value in self._retired.items()}
+            shards = [values.copy() for _, values in live]
+        for values in shards:
+            for key, value in values.items():
+                total[key] = self._merge(total.get(key), value)
+        return total
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = _ThreadShards(
+            merge=lambda total, value: (total or 0) + value,
+            copy=lambda value: value
+        )
+
+    def inc(self, *labels: str, amount: float = 1):
+        """Increment the counter for the given label values."""
+        values = self._shards.shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def collect(self) -> Dict[tuple, float]:
+        return self._shards.collect()
+
+    def expose(self) -> Iterable[str]:
+        for labels, value in sorted(self.collect().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class UpDownGauge(Counter):
+    """Gauge that is incremented and decremented in place (e.g. in-flight requests)."""
+
+    type_name = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        """Decrement the gauge for the given label values."""
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    """Histogram with cumulative buckets, a sum and a count per label set."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., +Inf count, sum]
+        self._shards = _ThreadShards(merge=self._merge, copy=list)
+
+    @staticmethod
+    def _merge(total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def observe(self, value: float, *labels: str):
+        """Record an observation for the given label values."""
+        values = self._shards.shard()
+        state = values.get(labels)
+        if state is None:
+            state = values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def collect(self) -> Dict[tuple, list]:
+        return self._shards.collect()
+
+    def expose(self) -> Iterable[str]:
+        for labels, state in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += count
+                le = 'le="{}"'.format(_format_value(float(bound)))
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(state[-1])}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class CallbackGauge:
+    """Gauge whose values are read from a callback at scrape time."""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Dict[tuple, float]],
+        labelnames: Sequence[str] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def expose(self) -> Iterable[str]:
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"Metrics: gauge {self.name} failed: {e}")
+            return
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(float(value))}"
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+    def up_down_gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> UpDownGauge:
+        return self.register(UpDownGauge(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Dict[tuple, float]],
+        labelnames: Sequence[str] = ()
+    ) -> CallbackGauge:
+        return self.register(CallbackGauge(name, documentation, callback, labelnames))
+
+    def expose(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            Exposition text
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "kidsafe_http_requests_total",
+    "HTTP requests by endpoint, method and status code.",
+    ("endpoint", "method", "status")
+)
+http_errors = registry.counter(
+    "kidsafe_http_errors_total",
+    "HTTP requests that ended in a 5xx response or an unhandled exception.",
+    ("endpoint",)
+)
+http_in_flight = registry.up_down_gauge(
+    "kidsafe_http_in_flight_requests",
+    "HTTP requests currently being served.",
+    ("endpoint",)
+)
+http_latency = registry.histogram(
+    "kidsafe_http_request_duration_seconds",
+    "HTTP request latency by endpoint.",
+    ("endpoint",)
+)
+stage_latency = registry.histogram(
+    "kidsafe_stage_duration_seconds",
+    "Pipeline stage latency (embed, vector_search, retriever.bm25, rerank, analyze, ...).",
+    ("stage",)
+)
@@ -0,0 +1,205 @@
+"""
+Immutable pipeline snapshots with atomic swap and background builds.
+
+A PipelineSnapshot bundles everything built by /api/configure (vector
+store, retrieval manager, analyzer, chat summarizer, keys, strategy).
+Requests take the current snapshot once with acquire() and use it for
+their whole lifetime, so a reconfiguration never mixes components from
+two configurations. New snapshots are built on a background thread and
+published with a single reference swap; the previous snapshot is
+released (its index memory freed) once its in-flight requests drain.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional
+
+
+@dataclass(frozen=True)
+class PipelineSnapshot:
+    """One configuration of the RAG pipeline. Never mutated after publishing."""
+    version: int
+    api_keys: Mapping[str, str]
+    retrieval_strategy: str
+    vector_store_manager: Any
+    advanced_retrieval_manager: Any
+    ingredient_analyzer: Any
+    chat_summarizer: Any
+    created_at: float = field(default_factory=time.time)
+
+    def release(self):
+        """Free the index held by this snapshot."""
+        close = getattr(self.vector_store_manager, 'close', None)
+        if close is not None:
+            close()
+
+
+class BuildInProgressError(RuntimeError):
+    """Raised when a build is requested while another one is running."""
+
+
+class PipelineHolder:
+    """Holds the current snapshot, counts in-flight requests and runs builds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current: Optional[PipelineSnapshot] = None
+        self._in_flight: Dict[int, int] = {}
+        self._retired: Dict[int, PipelineSnapshot] = {}
+        self._versions = 0
+        self._released = 0
+        self._build: dict = {'state': 'idle'}
+        self._build_thread: Optional[threading.Thread] = None
+
+    def current(self) -> Optional[PipelineSnapshot]:
+        """The published snapshot (None before the first configuration)."""
+        return self._current
+
+    @contextmanager
+    def acquire(self):
+        """
+        Pin the current snapshot for the duration of a request.
+
+        Yields:
+            The current PipelineSnapshot, or None if none is published
+        """
+        with self._lock:
+            snapshot = self._current
+            if snapshot is not None:
+                self._in_flight[snapshot.version] = self._in_flight.get(snapshot.version, 0) + 1
+        try:
+            yield snapshot
+        finally:
+            if snapshot is not None:
+                self._unpin(snapshot)
+
+    def publish(self, snapshot: PipelineSnapshot):
+        """
+        Atomically make a snapshot current.
+
+        The previous snapshot is released immediately if idle, otherwise
+        when its last in-flight request finishes.
+
+        Args:
+            snapshot: Snapshot to publish
+        """
+        with self._lock:
+            previous = self._current
+            self._current = snapshot
+            release = None
+            if previous is not None:
+                if self._in_flight.get(previous.version, 0):
+                    self._retired[previous.version] = previous
+                else:
+                    release = previous
+        if release is not None:
+            self._release(release)
+
+    def start_build(self, build: Callable[[int, Callable[[str, float], None]], PipelineSnapshot],
+                    on_published: Optional[Callable[[PipelineSnapshot], None]] = None) -> int:
+        """
+        Build a new snapshot on a background thread and publish it when done.
+
+        Args:
+            build: Function (version, report_progress(stage, fraction)) -> PipelineSnapshot
+            on_published: Called with the snapshot after it is published
+
+        Returns:
+            Version number of the snapshot being built
+
+        Raises:
+            BuildInProgressError: If another build is running
+        """
+        with self._lock:
+            if self._build.get('state') == 'building':
+                raise BuildInProgressError(f"Configuration {self._build['version']} is still being built")
+            self._versions += 1
+            version = self._versions
+            self._build = {
+                'state': 'building',
+                'version': version,
+                'stage': 'starting',
+                'progress': 0.0,
+                'error': None,
+                'started_at': time.time(),
+                'finished_at': None,
+            }
+
+        def report_progress(stage: str, fraction: float):
+            with self._lock:
+                self._build.update(stage=stage, progress=round(fraction, 3))
+
+        def run():
+            try:
+                snapshot = build(version, report_progress)
+                self.publish(snapshot)
+                with self._lock:
+                    self._build.update(state='ready', stage='ready', progress=1.0, finished_at=time.time())
+                print(f"Pipeline version {version} published")
+                if on_published is not None:
+                    on_published(snapshot)
+            except Exception as e:
+                import traceback
+                traceback.print_exc()
+                with self._lock:
+                    self._build.update(state='failed', error=str(e), finished_at=time.time())
+
+        self._build_thread = threading.Thread(target=run, name=f"pipeline-build-{version}", daemon=True)
+        self._build_thread.start()
+        return version
+
+    def wait_for_build(self, timeout: Optional[float] = None) -> dict:
+        """Block until the running build (if any) finishes; returns the build status."""
+        thread = self._build_thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.status()['build']
+
+    def status(self) -> dict:
+        """
+        Get snapshot and build status.
+
+        Returns:
+            Dictionary with the current version, in-flight requests per
+            version, snapshots waiting to drain and the build progress
+        """
+        with self._lock:
+            current = self._current
+            return {
+                'version': current.version if current else None,
+                'retrieval_strategy': current.retrieval_strategy if current else None,
+                'published_at': current.created_at if current else None,
+                'in_flight': dict(self._in_flight),
+                'draining_versions': sorted(self._retired),
+                'released_snapshots': self._released,
+                'build': dict(self._build),
+            }
+
+    def _unpin(self, snapshot: PipelineSnapshot):
+        release = None
+        with self._lock:
+            remaining = self._in_flight.get(snapshot.version, 0) - 1
+            if remaining > 0:
+                self._in_flight[snapshot.version] = remaining
+            else:
+                self._in_flight.pop(snapshot.version, None)
+                release = self._retired.pop(snapshot.version, None)
+        if release is not None:
+            self._release(release)
+
+    def _release(self, snapshot: PipelineSnapshot):
+        try:
+            snapshot.release()
+        except Exception as e:
+            print(f"Warning: releasing pipeline version {snapshot.version} failed: {e}")
+        with self._lock:
+            self._released += 1
+        print(f"Pipeline version {snapshot.version} drained and released")
+
+
+def freeze_keys(api_keys: dict) -> Mapping[str, str]:
+    """Read-only copy of an API key dictionary for a snapshot."""
+    return MappingProxyType(dict(api_keys))
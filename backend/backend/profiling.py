@@ -0,0 +1,353 @@
+"""
+Sampling profilers: one for a single request, one always on at a low rate.
+
+A sampler thread reads Python stacks with sys._current_frames() every
+interval and counts identical stacks. Profiles are exported in the
+collapsed-stack format (one "frame;frame;frame count" line per distinct
+stack) that flamegraph.pl, speedscope and inferno read directly.
+
+RequestProfile samples the thread serving one request, plus the model
+call pool threads while they run that request's calls (resilience.py
+wraps its attempts with follow_profile()). BackgroundSampler samples
+every busy thread in the process; threads parked in threading, queue or
+selectors waits are skipped, so idle workers do not drown the hot paths.
+ProfileStore keeps finished request profiles on disk for download.
+
+Native code (tokenizers, numpy, sockets) is attributed to the Python
+function that called it.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Leaf frames in these stdlib modules (or functions) mean the thread is waiting for work
+IDLE_MODULES = ('threading.py', 'queue.py', 'selectors.py', 'socketserver.py')
+IDLE_FUNCTIONS = (('thread.py', '_worker'),)  # concurrent.futures pool thread blocked on its queue
+
+PROFILE_ID_PATTERN = re.compile(r"[0-9a-f]{12}")
+
+_active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+
+@lru_cache(maxsize=65536)
+def _frame_label(code) -> str:
+    """Flame graph label of a code object: "qualname (path:line)"."""
+    path = code.co_filename
+    if path.startswith(BACKEND_DIR):
+        path = os.path.relpath(path, BACKEND_DIR)
+    elif 'site-packages' + os.sep in path:
+        path = path.split('site-packages' + os.sep, 1)[1]
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_qualname} ({path}:{code.co_firstlineno})".replace(';', ',')
+
+
+def _is_idle(code) -> bool:
+    """Whether a thread whose innermost frame runs `code` is waiting for work."""
+    module = os.path.basename(code.co_filename)
+    return module in IDLE_MODULES or (module, code.co_name) in IDLE_FUNCTIONS
+
+
+def collapse(frame) -> str:
+    """A stack as "outermost;...;innermost" frame labels."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def _top_functions(stacks: Counter, top: int) -> Dict[str, List[dict]]:
+    """Functions with the most samples, by self time (leaf) and inclusive time."""
+    own, inclusive = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for label in set(frames):
+            inclusive[label] += count
+    total = sum(stacks.values()) or 1
+    return {
+        'self': [{'function': label, 'samples': n, 'percent': round(100 * n / total, 1)}
+                 for label, n in own.most_common(top)],
+        'inclusive': [{'function': label, 'samples': n, 'percent': round(100 * n / total, 1)}
+                      for label, n in inclusive.most_common(top)],
+    }
+
+
+def _folded(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class RequestProfile:
+    """Stack samples of the threads working on one request."""
+
+    def __init__(self, interval: float = 0.005, name: str = ''):
+        """
+        Initialize the profile.
+
+        Args:
+            interval: Seconds between samples
+            name: What is profiled, e.g. "POST /api/analyze"
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.interval = interval
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._token = None
+        self._start = 0.0
+
+    def add_thread(self, ident: int, role: str):
+        with self._lock:
+            self._threads[ident] = role
+
+    def remove_thread(self, ident: int):
+        with self._lock:
+            self._threads.pop(ident, None)
+
+    def start(self):
+        """Profile the calling thread (and the model calls it makes) until stop()."""
+        self.add_thread(threading.get_ident(), 'request')
+        self._token = _active_profile.set(self)
+        self._start = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name=f"profile-{self.id}", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """Stop sampling. Must be called in the context that called start()."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._sampler.join()
+        _active_profile.reset(self._token)
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 1)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self._threads.items())
+            for ident, role in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[f"{role};{collapse(frame)}"] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """The profile in collapsed-stack format, for flame graph tools."""
+        return _folded(self.stacks)
+
+    def summary(self, top: int = 10) -> dict:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'started_at': self.started_at,
+            'duration_ms': self.duration_ms,
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'top': _top_functions(self.stacks, top),
+        }
+
+
+def follow_profile(fn: Callable) -> Callable:
+    """
+    Make `fn` part of the current request's profile when it runs on another thread.
+
+    Returns `fn` itself when no profile is active, so unprofiled calls
+    pay one ContextVar lookup.
+    """
+    profile = _active_profile.get()
+    if profile is None:
+        return fn
+
+    def profiled(*args, **kwargs):
+        ident = threading.get_ident()
+        profile.add_thread(ident, 'model call')
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.remove_thread(ident)
+
+    return profiled
+
+
+class ProfileStore:
+    """
+    Request profiles saved as collapsed-stack files (<id>.folded).
+
+    Files are shared by every server worker, so a profile can be
+    downloaded from whichever worker answers. The most recent
+    `max_entries` are kept.
+    """
+
+    def __init__(self, directory, max_entries: int = 20):
+        self.directory = str(directory)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def save(self, profile: RequestProfile) -> str:
+        """
+        Write a finished profile and drop the oldest ones beyond max_entries.
+
+        Returns:
+            Path of the profile file
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{profile.id}.folded")
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(profile.folded())
+        os.replace(path + ".tmp", path)
+        with self._lock:
+            for old in self._files()[self.max_entries:]:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass  # Pruned by another worker
+        return path
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """Path of a saved profile, or None if it does not exist (or was pruned)."""
+        if not PROFILE_ID_PATTERN.fullmatch(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.folded")
+        return path if os.path.exists(path) else None
+
+    def list(self) -> List[dict]:
+        """Saved profiles, newest first."""
+        profiles = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            profiles.append({
+                'id': os.path.basename(path)[:-len(".folded")],
+                'saved_at': stat.st_mtime,
+                'bytes': stat.st_size,
+            })
+        return profiles
+
+    def _files(self) -> List[str]:
+        """Profile files, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.endswith(".folded")]
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except FileNotFoundError:
+                pass
+        return sorted(mtimes, key=mtimes.get, reverse=True)
+
+
+class BackgroundSampler:
+    """Low-rate sampling of every busy thread, aggregated since start (or reset)."""
+
+    def __init__(self, interval: float = 0.1, max_stacks: int = 5000):
+        """
+        Initialize the sampler.
+
+        Args:
+            interval: Seconds between samples
+            max_stacks: Distinct stacks kept; samples of further stacks
+                are counted under "(other)"
+        """
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sample_seconds = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._since = time.time()
+
+    def start(self):
+        """Start sampling (again after a fork, where the thread does not survive)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="background-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            start = time.perf_counter()
+            # This sampler and request profile samplers are not part of the workload
+            samplers = {thread.ident for thread in threading.enumerate()
+                        if thread.name == "background-sampler" or thread.name.startswith("profile-")}
+            busy = []
+            for ident, frame in sys._current_frames().items():
+                if ident not in samplers and not _is_idle(frame.f_code):
+                    busy.append(collapse(frame))
+            with self._lock:
+                for stack in busy:
+                    if stack in self.stacks or len(self.stacks) < self.max_stacks:
+                        self.stacks[stack] += 1
+                    else:
+                        self.stacks['(other)'] += 1
+                self.samples += 1
+                self.sample_seconds += time.perf_counter() - start
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+            self.sample_seconds = 0.0
+            self._since = time.time()
+
+    def folded(self) -> str:
+        """Aggregated stacks in collapsed-stack format."""
+        with self._lock:
+            stacks = Counter(self.stacks)
+        return _folded(stacks)
+
+    def stats(self, top: int = 0) -> dict:
+        """
+        Sampler state, and the hottest functions if `top` > 0.
+
+        Returns:
+            Dictionary with samples taken, sampling cost and (optionally)
+            top functions by self and inclusive samples
+        """
+        with self._lock:
+            stacks = Counter(self.stacks) if top else None
+            stats = {
+                'running': self.running,
+                'interval_ms': self.interval * 1000,
+                'since': self._since,
+                'samples': self.samples,
+                'distinct_stacks': len(self.stacks),
+                'avg_sample_ms': round(self.sample_seconds / self.samples * 1000, 3) if self.samples else 0.0,
+            }
+        if top:
+            stats['top'] = _top_functions(stacks, top)
+        return stats
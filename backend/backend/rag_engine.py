@@ -5,25 +5,39 @@ LangGraph-based RAG engine for ingredient analysis.
 from typing import List, TypedDict
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from langgraph.graph import START, StateGraph
 
-from backend.config import CHAT_MODEL
+from backend.clients import client_registry
+from backend.config import CHAT_MODEL, CONTEXT_TOKEN_BUDGET
+from backend.context_packing import ContextPacker
+from backend.instrumentation import span
+from backend.resilience import model_calls
+from backend.ingredients import normalize_ingredients
+from backend.rules import classify_ingredients
 
 
 class IngredientAnalysisState(TypedDict):
     """State for the ingredient analysis workflow."""
     cereal_name: str
     ingredients: str
+    canonical_ingredients: str
     question: str
     context: List[Document]
+    rule_verdict: str
     analysis: str
+    packing: dict
 
 
 class IngredientAnalyzer:
     """LangGraph-based ingredient analyzer using RAG."""
     
-    def __init__(self, retriever, openai_api_key: str, retrieval_strategy: str = "naive"):
+    def __init__(
+        self,
+        retriever,
+        openai_api_key: str,
+        retrieval_strategy: str = "naive",
+        context_token_budget: int = CONTEXT_TOKEN_BUDGET
+    ):
         """
         Initialize the ingredient analyzer.
         
@@ -31,12 +45,14 @@ class IngredientAnalyzer:
             retriever: Vector store retriever
             openai_api_key: OpenAI API key
             retrieval_strategy: Name of the retrieval strategy being used
+            context_token_budget: Maximum tokens of retrieved context in the prompt
         """
         self.retriever = retriever
         self.retrieval_strategy = retrieval_strategy
-        self.llm = ChatOpenAI(
-            model=CHAT_MODEL,
+        self.context_packer = ContextPacker(token_budget=context_token_budget)
+        self.llm = client_registry.chat_model(
             api_key=openai_api_key,
+            model=CHAT_MODEL,
             temperature=0.3  # Slightly lower for more consistent analysis
         )
         
@@ -54,6 +70,9 @@ Question: {question}
 Relevant Guidelines and Information:
 {context}
 
+Deterministic Rule Check (computed from the ingredient list with the classification rules below; your VERDICT must match it):
+{rule_verdict}
+
 IMPORTANT: Structure your response in the following format:
 
 ## VERDICT: [GOOD ✅ or MODERATE ⚠️ or BAD ❌]
@@ -120,7 +139,9 @@ Remember: Start with the clear VERDICT (GOOD ✅, MODERATE ⚠️, or BAD ❌) a
         Returns:
             Updated state with retrieved context
         """
-        retrieved_docs = self.retriever.invoke(state["question"])
+        with span("retrieve") as s:
+            retrieved_docs = self.retriever.invoke(state["question"])
+            s.set(documents=len(retrieved_docs))
         return {"context": retrieved_docs}
     
     def _generate_analysis(self, state: IngredientAnalysisState) -> dict:
@@ -133,22 +154,32 @@ Remember: Start with the clear VERDICT (GOOD ✅, MODERATE ⚠️, or BAD ❌) a
         Returns:
             Updated state with analysis
         """
-        # Format context from retrieved documents
-        context_text = "\n\n".join([
-            f"Source {i+1}:\n{doc.page_content}"
-            for i, doc in enumerate(state["context"])
-        ])
+        # Pack retrieved documents into a deduplicated, token-budgeted context
+        with span("pack_context") as s:
+            context_text, packing = self.context_packer.pack(
+                state["context"],
+                ingredients=state["canonical_ingredients"],
+                question=state["question"]
+            )
+            s.set(documents=packing['documents'], prompt_tokens_saved=packing['tokens_saved'])
+        print(
+            f"Context packing: {packing['original_tokens']} -> {packing['packed_tokens']} tokens "
+            f"(saved {packing['tokens_saved']})"
+        )
         
         # Generate analysis
         messages = self.analysis_prompt.format_messages(
             cereal_name=state["cereal_name"],
             ingredients=state["ingredients"],
             question=state["question"],
-            context=context_text
+            context=context_text,
+            rule_verdict=state["rule_verdict"]
         )
         
-        response = self.llm.invoke(messages)
-        return {"analysis": response.content}
+        with span("analyze") as s:
+            response = model_calls.call("llm", lambda: self.llm.invoke(messages))
+            s.record_llm_usage(CHAT_MODEL, response)
+        return {"analysis": response.content, "packing": packing}
     
     def _build_graph(self) -> StateGraph:
         """
@@ -184,9 +215,13 @@ Remember: Start with the clear VERDICT (GOOD ✅, MODERATE ⚠️, or BAD ❌) a
         """
         print(f"Using retrieval strategy: {self.retrieval_strategy}")
         
+        # Retrieve and pack context for the canonical names: typos and label
+        # filler in the raw text would only add noise to the query
+        canonical = normalize_ingredients(ingredients).text
+        
         # Create the question for retrieval
         question = f"""
-        Analyze these food ingredients for a children's cereal product: {ingredients}
+        Analyze these food ingredients for a children's cereal product: {canonical}
         
         Consider:
         - Are these ingredients safe for children?
@@ -200,9 +235,12 @@ Remember: Start with the clear VERDICT (GOOD ✅, MODERATE ⚠️, or BAD ❌) a
         initial_state = {
             "cereal_name": cereal_name,
             "ingredients": ingredients,
+            "canonical_ingredients": canonical,
             "question": question,
             "context": [],
-            "analysis": ""
+            "rule_verdict": classify_ingredients(ingredients).to_prompt(),
+            "analysis": "",
+            "packing": {}
         }
         
         # Run the graph
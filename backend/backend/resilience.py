@@ -0,0 +1,439 @@
+"""
+Deadlines, hedged requests and circuit breaking for outbound model calls.
+
+A request sets a latency budget with request_deadline(); every model call
+made while handling it gets a per-call deadline of min(call timeout,
+remaining budget). Calls to a dependency whose latency history shows a
+tail are hedged: if the first attempt has not answered after the
+dependency's observed HEDGE_PERCENTILE latency, a duplicate is sent and
+the first answer wins. A circuit breaker per dependency stops calling a
+dependency that keeps failing and lets one probe through after a
+cool-down. Only provider errors and timeouts of a full call timeout count
+as breaker failures; a call cut short by the request budget says nothing
+about the dependency and is counted as budget_exhausted instead. Client
+errors (4xx responses such as a revoked key or a rejected request) are
+counted as client_errors and are not breaker failures either.
+
+Attempts of every dependency share one worker pool. A call whose attempts
+all waited in the pool's queue until the deadline never reached the
+dependency, so it is counted as queue_timeouts, not as a breaker failure.
+Latency samples are measured from when an attempt starts running.
+
+Breakers and latency windows are kept per dependency and call scope: the
+tenant whose keys make the call (set with call_scope(), None for the
+operator's keys). One tenant's failing key opens only its own breaker.
+
+Slow attempts cannot be cancelled mid-flight; they finish (or hit the
+HTTP client timeout) on the worker pool and their result is discarded.
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from backend.config import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+    HEDGE_MAX_ATTEMPTS,
+    HEDGE_MIN_DELAY_SECONDS,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_PERCENTILE,
+    HEDGED_DEPENDENCIES,
+    MODEL_CALL_TIMEOUT_SECONDS,
+    RESILIENCE_MAX_WORKERS
+)
+from backend.profiling import follow_profile
+
+T = TypeVar("T")
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+_scope: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("call_scope", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call does not finish before its deadline."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a dependency's circuit breaker is open."""
+
+
+@contextmanager
+def request_deadline(budget_seconds: Optional[float]):
+    """
+    Set the latency budget for the calls made in this context.
+
+    A nested budget can only shorten the enclosing one.
+
+    Args:
+        budget_seconds: Seconds from now until the deadline (None for no budget)
+    """
+    if budget_seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + budget_seconds
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def call_scope(scope: Optional[str]):
+    """
+    Attribute the calls made in this context to a scope with its own breakers.
+
+    Args:
+        scope: Tenant ID whose keys the calls use (None for the operator)
+    """
+    token = _scope.set(scope)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def is_client_error(error: BaseException) -> bool:
+    """Whether an exception is a 4xx response (other than timeouts and rate limits) from the provider."""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in (408, 429)
+
+
+def remaining_budget() -> Optional[float]:
+    """
+    Seconds left in the current request budget.
+
+    Returns:
+        Remaining seconds (may be negative), or None if no budget is set
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker for one dependency."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30):
+        """
+        Initialize the breaker.
+
+        Args:
+            name: Dependency name
+            failure_threshold: Consecutive failures that open the circuit
+            reset_seconds: Time the circuit stays open before a probe is allowed
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Check whether a call may go through; half-open lets one probe through."""
+        with self._lock:
+            state = self._state_locked()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self):
+        """End a call that neither succeeded nor failed, letting another probe through."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'state': self._state_locked(),
+                'consecutive_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
+
+
+class _LatencyWindow:
+    """Sliding window of recent successful call latencies."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+
+class ResilientCaller:
+    """Runs model calls with deadlines, hedging and per-dependency circuit breakers."""
+
+    def __init__(
+        self,
+        call_timeout: float = MODEL_CALL_TIMEOUT_SECONDS,
+        hedge_percentile: float = HEDGE_PERCENTILE,
+        hedge_min_delay: float = HEDGE_MIN_DELAY_SECONDS,
+        hedge_min_samples: int = HEDGE_MIN_SAMPLES,
+        max_attempts: int = HEDGE_MAX_ATTEMPTS,
+        hedged_dependencies=HEDGED_DEPENDENCIES,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+        max_workers: int = RESILIENCE_MAX_WORKERS
+    ):
+        """
+        Initialize the caller.
+
+        Args:
+            call_timeout: Default per-call deadline in seconds
+            hedge_percentile: Observed latency percentile after which a hedge is sent
+            hedge_min_delay: Lower bound on the hedge delay
+            hedge_min_samples: Latency samples needed before hedging starts
+            max_attempts: Maximum concurrent attempts per call (1 disables hedging)
+            hedged_dependencies: Dependencies that may be hedged
+            failure_threshold: Consecutive failures that open a breaker
+            reset_seconds: Breaker cool-down before a probe call
+            max_workers: Size of the worker pool running attempts
+        """
+        self.call_timeout = call_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.max_attempts = max_attempts
+        self.hedged_dependencies = set(hedged_dependencies)
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-call")
+        self._lock = threading.Lock()
+        # Breakers and latency windows per (dependency, scope); counts per dependency
+        self._breakers: Dict[Tuple[str, Optional[str]], CircuitBreaker] = {}
+        self._latency: Dict[Tuple[str, Optional[str]], _LatencyWindow] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def breaker(self, dependency: str, scope: Optional[str] = None) -> CircuitBreaker:
+        """Get (creating if needed) the circuit breaker for a dependency in a scope."""
+        key = (dependency, scope)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                name = dependency if scope is None else f"{dependency}:{scope}"
+                breaker = self._breakers[key] = CircuitBreaker(name, self.failure_threshold, self.reset_seconds)
+                self._latency[key] = _LatencyWindow()
+                self._counts.setdefault(dependency, {
+                    'calls': 0, 'hedged': 0, 'hedge_wins': 0,
+                    'failures': 0, 'client_errors': 0, 'deadline_exceeded': 0, 'budget_exhausted': 0,
+                    'queue_timeouts': 0, 'short_circuited': 0,
+                })
+            return breaker
+
+    def forget_scope(self, scope: str):
+        """Drop a scope's breakers and latency history (its tenant was removed or got new keys)."""
+        with self._lock:
+            for key in [key for key in self._breakers if key[1] == scope]:
+                del self._breakers[key]
+                del self._latency[key]
+
+    def _count(self, dependency: str, field: str):
+        with self._lock:
+            self._counts[dependency][field] += 1
+
+    def hedge_delay(self, dependency: str, scope: Optional[str] = None) -> Optional[float]:
+        """
+        Delay after which a duplicate attempt is sent.
+
+        Returns:
+            Seconds, or None if the dependency is not hedged or lacks history
+        """
+        if self.max_attempts < 2 or dependency not in self.hedged_dependencies:
+            return None
+        self.breaker(dependency, scope)
+        with self._lock:
+            window = self._latency.get((dependency, scope))
+        if window is None:
+            return None
+        if len(window) < self.hedge_min_samples:
+            return None
+        return max(window.percentile(self.hedge_percentile), self.hedge_min_delay)
+
+    def call(self, dependency: str, fn: Callable[[], T], timeout: Optional[float] = None) -> T:
+        """
+        Call a dependency with a deadline, hedging and circuit breaking.
+
+        Args:
+            dependency: Dependency name, e.g. "llm", "embedding", "rerank"
+            fn: Zero-argument function making the call
+            timeout: Per-call deadline (defaults to call_timeout), capped by the request budget.
+                A timeout counts as a breaker failure only if it was not capped
+                and an attempt got a worker before the deadline.
+
+        Returns:
+            The first successful attempt's result
+
+        Raises:
+            CircuitOpenError: The dependency's breaker is open for the current call scope
+            DeadlineExceeded: No attempt finished before the deadline
+            Exception: The error of the last failed attempt
+        """
+        scope = _scope.get()
+        breaker = self.breaker(dependency, scope)
+        with self._lock:
+            window = self._latency[(dependency, scope)]
+        budget = self.call_timeout if timeout is None else timeout
+        remaining = remaining_budget()
+        capped = remaining is not None and remaining < budget
+        if capped:
+            budget = remaining
+        if budget <= 0:
+            self._count(dependency, 'budget_exhausted')
+            raise DeadlineExceeded(f"{dependency}: request budget exhausted")
+        if not breaker.allow():
+            self._count(dependency, 'short_circuited')
+            raise CircuitOpenError(f"{breaker.name} circuit is open")
+        self._count(dependency, 'calls')
+
+        deadline = time.monotonic() + budget
+        hedge_delay = self.hedge_delay(dependency, scope)
+
+        # Attempts run on the pool with the caller's context (trace, deadline, profile)
+        context = contextvars.copy_context()
+        fn = follow_profile(fn)
+        attempts = []
+        started = {}  # Attempt -> time it was submitted
+        running = {}  # Attempt index -> time it got a worker (written by the worker)
+
+        def launch():
+            index = len(attempts)
+
+            def attempt():
+                running[index] = time.monotonic()
+                return fn()
+
+            future = self._executor.submit(context.copy().run, attempt)
+            started[future] = time.monotonic()
+            attempts.append(future)
+            return future
+
+        pending = {launch()}
+        error: Optional[BaseException] = None
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wait_for = deadline - now
+            can_hedge = hedge_delay is not None and len(attempts) < self.max_attempts
+            if can_hedge:
+                wait_for = min(wait_for, max(started[attempts[-1]] + hedge_delay - now, 0))
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    window.add(time.monotonic() - running.get(attempts.index(future), started[future]))
+                    breaker.record_success()
+                    if future is not attempts[0]:
+                        self._count(dependency, 'hedge_wins')
+                    return future.result()
+                error = future.exception()
+            if not done and can_hedge and time.monotonic() < deadline:
+                # The latest attempt is past the dependency's tail latency: send a duplicate
+                pending.add(launch())
+                self._count(dependency, 'hedged')
+
+        if not pending and error is not None:
+            if is_client_error(error):
+                # The provider answered: the request or key is at fault, not the dependency
+                breaker.release_probe()
+                self._count(dependency, 'client_errors')
+            else:
+                breaker.record_failure()
+                self._count(dependency, 'failures')
+            raise error
+        if capped:
+            # The request ran out of budget, not the dependency out of time
+            breaker.release_probe()
+            self._count(dependency, 'budget_exhausted')
+        elif not running:
+            # Every attempt was still queued behind other calls: the pool is saturated
+            breaker.release_probe()
+            self._count(dependency, 'queue_timeouts')
+        else:
+            breaker.record_failure()
+            self._count(dependency, 'deadline_exceeded')
+        raise DeadlineExceeded(f"{dependency}: no response within {budget:.2f}s")
+
+    def stats(self) -> dict:
+        """
+        Get per-dependency call, hedge and breaker statistics.
+
+        Counts cover every scope. `breaker` and `hedge_delay_ms` are the
+        operator's; `open_scopes` counts tenant scopes whose breaker is open.
+
+        Returns:
+            Dictionary keyed by dependency name
+        """
+        with self._lock:
+            counts = {name: dict(values) for name, values in self._counts.items()}
+            breakers = dict(self._breakers)
+        for name in counts:
+            counts[name]['breaker'] = self.breaker(name).stats()
+            counts[name]['open_scopes'] = sum(
+                1 for (dependency, scope), breaker in breakers.items()
+                if dependency == name and scope is not None and breaker.state == "open"
+            )
+            delay = self.hedge_delay(name)
+            counts[name]['hedge_delay_ms'] = round(delay * 1000, 2) if delay is not None else None
+        return counts
+
+
+model_calls = ResilientCaller()
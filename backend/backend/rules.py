@@ -0,0 +1,351 @@
+"""
+Deterministic rule-based verdicts for ingredient lists.
+
+Encodes the verdict classification rules from the analysis prompt:
+- BAD: artificial colors, artificial flavors, BHA/BHT/TBHQ or hydrogenated oils
+- MODERATE: any form of added sugar
+- GOOD: neither of the above
+
+The sugar, additive and allergen lexicons are compiled into a word-level
+Aho-Corasick automaton, so an ingredient list is classified in a single
+pass over its tokens. The list is first normalized by the ingredient
+normalizer (backend/ingredients.py): items are split, filler is stripped,
+colors are canonicalized ("FD&C Red No. 40" -> "red 40") and typos are
+corrected ("Coconute Sugar"), exactly as for analysis cache keys.
+Matches report the canonical ingredient name.
+
+Negated mentions are not matches: a term after "no" or "without" in the
+same item ("No Sugar Added", "Without Artificial Colors"), or followed by
+"free" ("Sugar Free Syrup", "sugar-free sweetener").
+
+Throughput is about 13k unique lists per second on one core, most of it
+normalization (benchmarks/bench_rules.py), well short of the 100k lists/s
+target; repeated lists are memoized and run well above it.
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from backend.ingredients import IngredientNormalizer
+
+VERDICT_GOOD = "GOOD"
+VERDICT_MODERATE = "MODERATE"
+VERDICT_BAD = "BAD"
+
+VERDICT_LABELS = {
+    VERDICT_GOOD: "GOOD ✅",
+    VERDICT_MODERATE: "MODERATE ⚠️",
+    VERDICT_BAD: "BAD ❌",
+}
+
+CATEGORY_ADDED_SUGAR = "added_sugar"
+CATEGORY_BAD_ADDITIVE = "bad_additive"
+CATEGORY_ALLERGEN = "allergen"
+
+# canonical name -> aliases (the canonical name is always matched as well)
+ADDED_SUGARS: Dict[str, List[str]] = {
+    "sugar": ["sugars", "cane sugar", "brown sugar", "raw sugar", "invert sugar",
+              "powdered sugar", "beet sugar", "turbinado", "demerara"],
+    "coconut sugar": ["coconut palm sugar"],
+    "corn syrup": ["corn syrup solids", "glucose syrup"],
+    "high fructose corn syrup": ["hfcs"],
+    "honey": [],
+    "molasses": [],
+    "cane juice": ["evaporated cane juice", "dried cane syrup", "cane syrup"],
+    "maple syrup": [],
+    "rice syrup": ["brown rice syrup"],
+    "malt syrup": ["barley malt syrup"],
+    "agave": ["agave syrup", "agave nectar"],
+    "dextrose": [],
+    "fructose": ["crystalline fructose"],
+    "glucose": [],
+    "sucrose": [],
+    "maltose": [],
+    "fruit juice concentrate": ["apple juice concentrate", "grape juice concentrate",
+                                "pear juice concentrate"],
+    "date sugar": [],
+}
+
+BAD_ADDITIVES: Dict[str, List[str]] = {
+    "artificial color": ["artificial colors", "artificial colour", "artificial colours",
+                         "artificial coloring", "artificial colorings"],
+    "artificial flavor": ["artificial flavors", "artificial flavour", "artificial flavours",
+                          "artificial flavoring", "artificial flavorings"],
+    "red 40": ["red no 40", "red dye 40", "fd c red 40", "allura red"],
+    "red 3": ["red no 3", "fd c red 3", "erythrosine"],
+    "yellow 5": ["yellow no 5", "fd c yellow 5", "tartrazine"],
+    "yellow 6": ["yellow no 6", "fd c yellow 6", "sunset yellow"],
+    "blue 1": ["blue no 1", "fd c blue 1", "brilliant blue"],
+    "blue 2": ["blue no 2", "fd c blue 2", "indigo carmine"],
+    "bht": ["butylated hydroxytoluene"],
+    "bha": ["butylated hydroxyanisole"],
+    "tbhq": ["tertiary butylhydroquinone", "tert butylhydroquinone"],
+    "hydrogenated oil": ["hydrogenated oils", "partially hydrogenated oil",
+                         "partially hydrogenated oils", "hydrogenated vegetable oil",
+                         "hydrogenated soybean oil", "hydrogenated cottonseed oil"],
+}
+
+ALLERGENS: Dict[str, List[str]] = {
+    "wheat": ["whole wheat", "whole grain wheat", "wheat flour"],
+    "milk": ["whey", "casein", "nonfat milk", "skim milk", "milk powder", "lactose", "butter"],
+    "soy": ["soybean", "soybeans", "soy lecithin", "soy protein"],
+    "egg": ["eggs", "egg whites", "egg yolks"],
+    "peanut": ["peanuts", "peanut butter"],
+    "tree nut": ["almond", "almonds", "cashew", "cashews", "pecan", "pecans",
+                 "walnut", "walnuts", "hazelnut", "hazelnuts", "pistachio",
+                 "pistachios", "coconut"],
+    "sesame": ["sesame seeds", "sesame oil", "tahini"],
+    "fish": [],
+    "shellfish": [],
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# A term after one of these in its item, or followed by "free", is negated
+_NEGATIONS = {"no", "without"}
+_NEGATION_SUFFIX = "free"
+
+
+@dataclass(frozen=True)
+class RuleMatch:
+    """A lexicon hit inside one ingredient item."""
+    category: str
+    term: str
+    ingredient: str
+
+
+@dataclass(frozen=True)
+class RuleVerdict:
+    """Structured result of the deterministic rule check (shared via memoization, so immutable)."""
+    verdict: str
+    added_sugars: Tuple[RuleMatch, ...] = ()
+    bad_additives: Tuple[RuleMatch, ...] = ()
+    allergens: Tuple[RuleMatch, ...] = ()
+    corrections: Tuple[Tuple[str, str], ...] = ()
+
+    @property
+    def label(self) -> str:
+        """Verdict label in the format used by the analysis prompt."""
+        return VERDICT_LABELS[self.verdict]
+
+    @property
+    def triggers(self) -> Tuple[RuleMatch, ...]:
+        """Matches that determined the verdict."""
+        if self.verdict == VERDICT_BAD:
+            return self.bad_additives
+        if self.verdict == VERDICT_MODERATE:
+            return self.added_sugars
+        return ()
+
+    def to_dict(self) -> dict:
+        """Serialize for JSON responses."""
+        def matches(items):
+            return [{'term': m.term, 'ingredient': m.ingredient} for m in items]
+        return {
+            'verdict': self.verdict,
+            'label': self.label,
+            'triggering_ingredients': sorted({m.ingredient for m in self.triggers}),
+            'added_sugars': matches(self.added_sugars),
+            'bad_additives': matches(self.bad_additives),
+            'allergens': matches(self.allergens),
+            'corrections': dict(self.corrections),
+        }
+
+    def to_prompt(self) -> str:
+        """Render the verdict as context for the LLM prompt."""
+        lines = [f"Rule-based verdict: {self.label}"]
+        if self.bad_additives:
+            lines.append("Problematic additives found: " + ", ".join(
+                sorted({m.ingredient for m in self.bad_additives})))
+        if self.added_sugars:
+            lines.append("Added sugars found: " + ", ".join(
+                sorted({m.ingredient for m in self.added_sugars})))
+        if self.allergens:
+            lines.append("Common allergens found: " + ", ".join(
+                sorted({m.term for m in self.allergens})))
+        if not self.bad_additives and not self.added_sugars:
+            lines.append("No added sugars or flagged additives were detected.")
+        return "\n".join(lines)
+
+
+def normalize_words(text: str) -> List[str]:
+    """Lowercase a phrase and split it into alphanumeric words."""
+    return _WORD.findall(text.lower())
+
+
+class IngredientRuleEngine:
+    """Word-level Aho-Corasick matcher over the sugar, additive and allergen lexicons."""
+
+    def __init__(
+        self,
+        added_sugars: Optional[Dict[str, List[str]]] = None,
+        bad_additives: Optional[Dict[str, List[str]]] = None,
+        allergens: Optional[Dict[str, List[str]]] = None,
+        normalizer: Optional["IngredientNormalizer"] = None,
+        cache_size: int = 65536
+    ):
+        """
+        Compile the lexicons into a matching automaton.
+
+        Args:
+            added_sugars: Canonical added sugar -> aliases
+            bad_additives: Canonical additive -> aliases
+            allergens: Canonical allergen -> aliases
+            normalizer: Normalizer applied to ingredient lists before
+                matching (default: the process-wide normalizer)
+            cache_size: Number of classified ingredient lists to memoize
+        """
+        lexicons = {
+            CATEGORY_ADDED_SUGAR: added_sugars if added_sugars is not None else ADDED_SUGARS,
+            CATEGORY_BAD_ADDITIVE: bad_additives if bad_additives is not None else BAD_ADDITIVES,
+            CATEGORY_ALLERGEN: allergens if allergens is not None else ALLERGENS,
+        }
+
+        # Automaton: goto transitions, failure links and outputs per state.
+        # Outputs are (pattern length, category, canonical term).
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str, str]]] = [[]]
+
+        for category, terms in lexicons.items():
+            for canonical, aliases in terms.items():
+                for phrase in [canonical, *aliases]:
+                    words = normalize_words(phrase)
+                    if words:
+                        self._add_pattern(words, category, canonical)
+        self._build_failure_links()
+
+        if normalizer is None:
+            from backend.ingredients import get_normalizer  # It imports the lexicons above
+            normalizer = get_normalizer()
+        self._normalizer = normalizer
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _add_pattern(self, words: List[str], category: str, canonical: str):
+        state = 0
+        for word in words:
+            next_state = self._goto[state].get(word)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][word] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(words), category, canonical))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(word, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def _classify(self, ingredients: str) -> RuleVerdict:
+        """
+        Classify an ingredient list.
+
+        Args:
+            ingredients: Comma-separated list of ingredients
+
+        Returns:
+            RuleVerdict with the verdict and the triggering ingredients
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        normalized = self._normalizer.normalize(ingredients)
+        items = normalized.names
+        hits = []
+        negated_from = {}  # item -> position of its first negation word
+        suffixes = {}  # position of a "free" -> its item
+
+        # Single pass over the normalized items. The automaton is reset
+        # per item, so patterns never span two ingredient items.
+        position = 0
+        for item, name in enumerate(items):
+            state = 0
+            for word in name.split():
+                if word in _NEGATIONS:
+                    negated_from.setdefault(item, position)
+                elif word == _NEGATION_SUFFIX:
+                    suffixes[position] = item
+                elif word.isdigit() and negated_from.get(item) == position - 1:
+                    del negated_from[item]  # "Red No 40 and Yellow 5"
+                while state and word not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(word, 0)
+                if out[state]:
+                    for length, category, term in out[state]:
+                        hits.append((item, position - length + 1, position + 1, category, term))
+                position += 1
+
+        found = {
+            CATEGORY_ADDED_SUGAR: {},
+            CATEGORY_BAD_ADDITIVE: {},
+            CATEGORY_ALLERGEN: {},
+        }
+        if hits:
+            # Within a category keep only the longest match over a span
+            # ("brown sugar" rather than "sugar")
+            hits.sort(key=lambda hit: hit[1] - hit[2])
+            taken = {}
+            for index, start, end, category, term in hits:
+                spans = taken.setdefault(category, [])
+                if any(s <= start and end <= e for s, e in spans):
+                    continue
+                spans.append((start, end))
+                if negated_from.get(index, end) < start or suffixes.get(end) == index:
+                    continue
+                ingredient = items[index]
+                found[category].setdefault((term, ingredient), RuleMatch(category, term, ingredient))
+
+        added_sugars = tuple(found[CATEGORY_ADDED_SUGAR].values())
+        bad_additives = tuple(found[CATEGORY_BAD_ADDITIVE].values())
+        if bad_additives:
+            verdict = VERDICT_BAD
+        elif added_sugars:
+            verdict = VERDICT_MODERATE
+        else:
+            verdict = VERDICT_GOOD
+
+        return RuleVerdict(
+            verdict=verdict,
+            added_sugars=added_sugars,
+            bad_additives=bad_additives,
+            allergens=tuple(found[CATEGORY_ALLERGEN].values()),
+            corrections=normalized.corrections,
+        )
+
+
+_default_engine: Optional[IngredientRuleEngine] = None
+
+
+def get_rule_engine() -> IngredientRuleEngine:
+    """Get the process-wide rule engine, compiling it on first use."""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = IngredientRuleEngine()
+    return _default_engine
+
+
+def classify_ingredients(ingredients: str) -> RuleVerdict:
+    """
+    Classify an ingredient list with the default rule engine.
+
+    Args:
+        ingredients: Comma-separated list of ingredients
+
+    Returns:
+        RuleVerdict with the verdict and the triggering ingredients
+    """
+    return get_rule_engine().classify(ingredients)
@@ -0,0 +1,106 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight
+computation: the first caller (the leader) runs it, the others wait for
+its result. If the computation raises, every waiter receives the same
+exception. If the leader is cancelled (its thread is interrupted by a
+BaseException such as SystemExit or GeneratorExit), waiters are released
+and one of them takes over as the new leader.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    """One in-flight computation."""
+
+    __slots__ = ('done', 'result', 'error', 'cancelled')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[Exception] = None
+        self.cancelled = False
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Run fn for key, or wait for the in-flight run with the same key.
+
+        Args:
+            key: Identity of the computation (e.g. the analysis cache key)
+            fn: Computation to run if no call for key is in flight
+            timeout: Maximum seconds a waiter blocks before giving up
+
+        Returns:
+            Tuple of (result, shared) where shared is True for coalesced waiters
+
+        Raises:
+            TimeoutError: If a waiter's timeout expires (the leader keeps running)
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    self.executions += 1
+                    leader = True
+                else:
+                    self.coalesced += 1
+                    leader = False
+
+            if leader:
+                return self._lead(key, call, fn), False
+
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight computation of {key}")
+            if call.cancelled:
+                continue  # Leader was cancelled; retry and possibly lead
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+    def _lead(self, key: str, call: _Call, fn: Callable[[], Any]):
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.cancelled = True
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> dict:
+        """
+        Get coalescing statistics.
+
+        Returns:
+            Dictionary with executions, coalesced waiters and in-flight keys
+        """
+        with self._lock:
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+            }
@@ -0,0 +1,176 @@
+"""
+Startup timing, explicit warm-up and the startup profile report.
+
+Heavy dependencies are imported where they are first needed: the
+pipeline modules (Qdrant, LangGraph, OpenAI clients) when a pipeline is
+built, and each retrieval strategy's LangChain and Cohere classes when
+its retrievers are created (STRATEGY_MODULES in advanced_retrieval.py).
+Importing the app stays cheap, so a new worker answers catalog, search
+and verdict requests right away.
+
+Warm-up (POST /api/warmup, and the production server's master before it
+forks) imports what a strategy needs and loads the in-process indexes
+ahead of the first request; StartupTimings records each step.
+`python main.py --startup-profile` runs the import and warm-up in a fresh
+interpreter under `-X importtime` and reports both breakdowns.
+"""
+
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Imported by every pipeline build, whatever the strategy
+PIPELINE_MODULES = (
+    'langchain_openai',
+    'backend.vector_store',
+    'backend.advanced_retrieval',
+    'backend.rag_engine',
+)
+
+PROFILE_MARKER = "STARTUP_PROFILE "
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StartupTimings:
+    """Durations of startup steps, each measured on its first (cold) run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._steps: Dict[str, float] = {}
+
+    @contextmanager
+    def step(self, name: str):
+        """Time the block as step `name` (kept only if the step has not run before)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+            with self._lock:
+                self._steps.setdefault(name, elapsed_ms)
+
+    def import_module(self, name: str):
+        """Import a module, recorded as step "import <name>" unless it was already loaded."""
+        if name in sys.modules:
+            return sys.modules[name]
+        with self.step(f"import {name}"):
+            return importlib.import_module(name)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Step name -> milliseconds, in the order the steps ran."""
+        with self._lock:
+            return dict(self._steps)
+
+
+startup_timings = StartupTimings()
+
+
+def pipeline_modules(retrieval_strategy: str, rerank: bool = False) -> List[str]:
+    """
+    Modules a pipeline with this strategy imports while it is built.
+
+    Args:
+        retrieval_strategy: Retrieval strategy (unknown ones build an ensemble)
+        rerank: A Cohere key is configured, so ensembles rerank
+
+    Returns:
+        Module names, in import order
+    """
+    STRATEGY_MODULES = startup_timings.import_module('backend.advanced_retrieval').STRATEGY_MODULES
+
+    modules = list(PIPELINE_MODULES)
+    modules += STRATEGY_MODULES.get(retrieval_strategy, STRATEGY_MODULES['ensemble'])
+    if retrieval_strategy == 'compression' or rerank:
+        modules += STRATEGY_MODULES['rerank']
+    return list(dict.fromkeys(modules))
+
+
+def parse_importtime(stderr: str, boundary: str = 'main') -> Tuple[Counter, Counter]:
+    """
+    Split `python -X importtime` output at the import of a module.
+
+    Args:
+        stderr: Interpreter stderr with "import time:" lines
+        boundary: Top-level module whose import ends the first phase
+
+    Returns:
+        Tuple of (self microseconds by top-level package before and
+        including the boundary import, the same for imports after it)
+    """
+    before, after = Counter(), Counter()
+    phase = before
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # Header line
+        name = parts[2].strip()
+        phase[name.split('.')[0]] += int(parts[0])
+        if parts[2] == " " + boundary:  # Top level, not a submodule import
+            phase = after
+    return before, after
+
+
+def _format_packages(title: str, packages: Counter, top: int) -> List[str]:
+    lines = [f"{title}: {sum(packages.values()) / 1000:.0f} ms"]
+    for package, micros in packages.most_common(top):
+        lines.append(f"  {package:<32} {micros / 1000:8.1f} ms")
+    rest = sum(micros for _, micros in packages.most_common()[top:])
+    if rest:
+        lines.append(f"  {'(other)':<32} {rest / 1000:8.1f} ms")
+    return lines
+
+
+def profile_startup(retrieval_strategy: str = 'ensemble', rerank: bool = False, top: int = 12) -> str:
+    """
+    Import the app and warm it up in a fresh interpreter and report where the time goes.
+
+    Args:
+        retrieval_strategy: Strategy whose dependencies the warm-up imports
+        rerank: Also import the Cohere reranker
+        top: Packages listed per import phase
+
+    Returns:
+        Report text: import time by package for the app import and for
+        the warm-up, then every warm-up step
+
+    Raises:
+        RuntimeError: If the profiled interpreter fails
+    """
+    code = (
+        "import json, main\n"
+        "from backend.startup import PROFILE_MARKER, startup_timings\n"
+        f"main.warm_up({retrieval_strategy!r}, rerank={rerank!r})\n"
+        "print(PROFILE_MARKER + json.dumps(startup_timings.snapshot()))\n"
+    )
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Profiled startup failed:\n{result.stderr[-2000:]}")
+    steps = next(
+        json.loads(line[len(PROFILE_MARKER):]) for line in result.stdout.splitlines()
+        if line.startswith(PROFILE_MARKER)
+    )
+    app_imports, warmup_imports = parse_importtime(result.stderr)
+
+    lines = [f"Startup profile (strategy {retrieval_strategy}, rerank {'on' if rerank else 'off'}), "
+             f"{wall:.2f} s wall clock including interpreter start", ""]
+    lines += _format_packages("Import main", app_imports, top) + [""]
+    lines += _format_packages("Warm-up imports", warmup_imports, top) + [""]
+    lines.append(f"Warm-up steps: {sum(ms for name, ms in steps.items() if not name.startswith('import ')):.0f} ms "
+                 f"initialization, {sum(ms for name, ms in steps.items() if name.startswith('import ')):.0f} ms imports")
+    for name, ms in steps.items():
+        lines.append(f"  {name:<48} {ms:8.1f} ms")
+    return "\n".join(lines)
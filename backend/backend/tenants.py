@@ -0,0 +1,261 @@
+"""
+Multi-tenant mode: one shared index, per-tenant model clients and caches.
+
+The PDF is embedded once by /api/configure; the resulting vector store,
+chunks and BM25 index are shared read-only by every tenant. A tenant
+registers only its own API keys (a few hundred bytes). On its first
+request a TenantRuntime is built on top of the shared index: an analyzer,
+retrievers and a chat summarizer whose model clients use the tenant's
+keys, plus a small in-memory analysis cache. At most max_active runtimes
+are kept; the least recently used one is evicted together with its
+clients and cache, and rebuilt cheaply when the tenant returns.
+
+Runtimes are tied to the pipeline version they were built on, so a
+reconfiguration (a new shared index) rebuilds them on next use.
+
+Tenant IDs and tokens are generated here. A request acts as a tenant
+only with both; the registry keeps just a SHA-256 digest of the token.
+"""
+
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """A registered tenant: its keys and preferred retrieval strategy."""
+    tenant_id: str
+    api_keys: Mapping[str, str]
+    retrieval_strategy: str
+    token_digest: str
+    created_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class TenantRuntime:
+    """Components serving one tenant (or the operator, tenant_id None) on one pipeline version."""
+    tenant_id: Optional[str]
+    version: int
+    api_keys: Mapping[str, str]
+    retrieval_strategy: str
+    ingredient_analyzer: Any
+    chat_summarizer: Any
+    analysis_cache: Any
+
+
+class UnknownTenantError(KeyError):
+    """Raised when a request names a tenant that is not registered."""
+
+
+class TenantLimitError(RuntimeError):
+    """Raised when registering more than max_registered tenants."""
+
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class TenantRegistry:
+    """Registered tenants plus an LRU of their live runtimes."""
+
+    def __init__(
+        self,
+        build_runtime: Callable[[Tenant, Any], TenantRuntime],
+        max_registered: int = 1000,
+        max_active: int = 32,
+        release_keys: Optional[Callable[[Iterable[str]], None]] = None
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            build_runtime: Function (tenant, pipeline snapshot) -> TenantRuntime
+            max_registered: Maximum number of registered tenants
+            max_active: Maximum number of runtimes kept alive
+            release_keys: Called with the API keys of an evicted runtime
+                that no other live runtime uses, to drop their clients
+        """
+        self.build_runtime = build_runtime
+        self.max_registered = max_registered
+        self.max_active = max_active
+        self.release_keys = release_keys
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, Tenant] = {}
+        self._runtimes: "OrderedDict[str, TenantRuntime]" = OrderedDict()
+        self._stats = {'runtime_hits': 0, 'runtime_builds': 0, 'evictions': 0}
+
+    def register(self, api_keys: dict, retrieval_strategy: str = "ensemble") -> Tuple[Tenant, str]:
+        """
+        Register a new tenant under a generated ID.
+
+        Args:
+            api_keys: Tenant's API keys (openai_api_key required)
+            retrieval_strategy: Retrieval strategy for this tenant
+
+        Returns:
+            Tuple of (the registered Tenant, its secret token); the token
+            is not stored and cannot be retrieved later
+
+        Raises:
+            TenantLimitError: If max_registered tenants already exist
+        """
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            if len(self._tenants) >= self.max_registered:
+                raise TenantLimitError(f"At most {self.max_registered} tenants can be registered")
+            tenant_id = secrets.token_urlsafe(12)
+            while tenant_id in self._tenants:
+                tenant_id = secrets.token_urlsafe(12)
+            tenant = Tenant(
+                tenant_id=tenant_id,
+                api_keys=MappingProxyType(dict(api_keys)),
+                retrieval_strategy=retrieval_strategy,
+                token_digest=_token_digest(token)
+            )
+            self._tenants[tenant_id] = tenant
+        return tenant, token
+
+    def update(self, tenant_id: str, api_keys: Optional[dict] = None,
+               retrieval_strategy: Optional[str] = None) -> Tenant:
+        """
+        Replace a registered tenant's keys and/or retrieval strategy (its token is kept).
+
+        Args:
+            tenant_id: Registered tenant identifier
+            api_keys: New API keys, or None to keep the current ones
+            retrieval_strategy: New retrieval strategy, or None to keep it
+
+        Returns:
+            The updated Tenant
+
+        Raises:
+            UnknownTenantError: If the tenant is not registered
+        """
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is None:
+                raise UnknownTenantError(tenant_id)
+            tenant = replace(
+                tenant,
+                api_keys=tenant.api_keys if api_keys is None else MappingProxyType(dict(api_keys)),
+                retrieval_strategy=retrieval_strategy or tenant.retrieval_strategy
+            )
+            self._tenants[tenant_id] = tenant
+            stale = self._runtimes.pop(tenant_id, None)
+        if stale is not None:
+            self._release(stale)
+        return tenant
+
+    def remove(self, tenant_id: str) -> bool:
+        """
+        Unregister a tenant and drop its runtime.
+
+        Returns:
+            True if the tenant existed
+        """
+        with self._lock:
+            existed = self._tenants.pop(tenant_id, None) is not None
+            runtime = self._runtimes.pop(tenant_id, None)
+        if runtime is not None:
+            self._release(runtime)
+        return existed
+
+    def get(self, tenant_id: str) -> Optional[Tenant]:
+        """The registered tenant, or None."""
+        return self._tenants.get(tenant_id)
+
+    def authenticate(self, tenant_id: str, token: str) -> Optional[Tenant]:
+        """The registered tenant if `token` is its token, else None."""
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None or not token:
+            return None
+        if not secrets.compare_digest(_token_digest(token), tenant.token_digest):
+            return None
+        return tenant
+
+    def runtime(self, tenant_id: str, snapshot) -> TenantRuntime:
+        """
+        Get (building if needed) a tenant's runtime on a pipeline snapshot.
+
+        Args:
+            tenant_id: Registered tenant identifier
+            snapshot: Pinned PipelineSnapshot holding the shared index
+
+        Returns:
+            TenantRuntime for the snapshot's version
+
+        Raises:
+            UnknownTenantError: If the tenant is not registered
+        """
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is None:
+                raise UnknownTenantError(tenant_id)
+            runtime = self._runtimes.get(tenant_id)
+            if runtime is not None and runtime.version == snapshot.version:
+                self._runtimes.move_to_end(tenant_id)
+                self._stats['runtime_hits'] += 1
+                return runtime
+
+        built = self.build_runtime(tenant, snapshot)
+        evicted = []
+        with self._lock:
+            runtime = self._runtimes.get(tenant_id)
+            if runtime is not None and runtime.version == snapshot.version:
+                # Another request built it meanwhile; keep the first
+                self._runtimes.move_to_end(tenant_id)
+                return runtime
+            if self._tenants.get(tenant_id) is not tenant:
+                # Re-registered or removed while building: serve this request only
+                return built
+            if runtime is not None:
+                evicted.append(runtime)
+            self._runtimes[tenant_id] = built
+            self._stats['runtime_builds'] += 1
+            while len(self._runtimes) > self.max_active:
+                _, oldest = self._runtimes.popitem(last=False)
+                evicted.append(oldest)
+                self._stats['evictions'] += 1
+        for runtime in evicted:
+            self._release(runtime)
+        return built
+
+    def memory_roots(self) -> list:
+        """Registered tenants and the active runtimes' analysis caches, for memory accounting."""
+        with self._lock:
+            runtimes = list(self._runtimes.values())
+            roots = [self._tenants]
+        for runtime in runtimes:
+            roots.extend(runtime.analysis_cache.memory_roots())
+        return roots
+
+    def stats(self) -> dict:
+        """
+        Get tenant counts and runtime cache statistics.
+
+        Returns:
+            Dictionary with registered and active tenants, runtime
+            hits/builds/evictions and cached analyses per active tenant
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['registered'] = len(self._tenants)
+            stats['active'] = len(self._runtimes)
+            stats['max_active'] = self.max_active
+            stats['cached_analyses'] = sum(len(runtime.analysis_cache) for runtime in self._runtimes.values())
+        return stats
+
+    def _release(self, runtime: TenantRuntime):
+        if self.release_keys is None:
+            return
+        with self._lock:
+            in_use = {key for live in self._runtimes.values() for key in live.api_keys.values()}
+        unused = [key for key in runtime.api_keys.values() if key and key not in in_use]
+        if unused:
+            self.release_keys(unused)
@@ -0,0 +1,335 @@
+"""
+Sampled request tracing with asynchronous export.
+
+Every traced request (analysis and chat) records its spans in memory
+(instrumentation.capture()). When the request finishes, the tracer keeps
+the trace if any of these holds:
+
+    error  the request failed (status >= 500)       tail sampling
+    slow   it took at least slow_ms                  tail sampling
+    head   it was picked at random when it started   head sampling
+
+Kept traces go to a bounded queue, and a background thread exports them
+in batches to the configured sinks (a local JSON Lines file, LangSmith).
+When the queue is full, new traces are dropped and counted, so a slow or
+unreachable sink never adds latency to requests. Unsampled requests pay
+for span recording only.
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from backend.instrumentation import RequestTrace
+
+SAMPLE_REASONS = ('error', 'slow', 'head')
+
+
+class TraceSampler:
+    """Head and tail sampling decisions."""
+
+    def __init__(self, head_rate: float, slow_ms: float, rng: Optional[random.Random] = None):
+        """
+        Initialize the sampler.
+
+        Args:
+            head_rate: Fraction of requests kept whatever their outcome (0 to 1)
+            slow_ms: Requests at least this slow are always kept
+            rng: Random source (for reproducible sampling)
+        """
+        self.head_rate = head_rate
+        self.slow_ms = slow_ms
+        self._random = (rng or random.Random()).random
+
+    def head(self) -> bool:
+        """Decide, as a request starts, whether it is traced regardless of outcome."""
+        return self.head_rate > 0 and self._random() < self.head_rate
+
+    def reason(self, head_sampled: bool, duration_ms: float, error: bool) -> Optional[str]:
+        """
+        Decide, as a request finishes, whether its trace is kept.
+
+        Returns:
+            "error", "slow" or "head", or None to drop the trace
+        """
+        if error:
+            return 'error'
+        if duration_ms >= self.slow_ms:
+            return 'slow'
+        if head_sampled:
+            return 'head'
+        return None
+
+
+class FileSink:
+    """Appends traces to a JSON Lines file (one trace per line), for offline use."""
+
+    def __init__(self, path):
+        self.path = str(path)
+
+    def export(self, traces: List[dict]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(trace, default=str) + "\n" for trace in traces))
+
+
+class LangSmithSink:
+    """Uploads traces to LangSmith as a root run with one child run per span."""
+
+    def __init__(self, api_key: str, project: str):
+        from langsmith import Client
+
+        self.project = project
+        self.client = Client(api_key=api_key)
+
+    def export(self, traces: List[dict]):
+        runs = []
+        for trace in traces:
+            runs.extend(self._runs(trace))
+        self.client.batch_ingest_runs(create=runs)
+
+    def _runs(self, trace: dict) -> List[dict]:
+        started = datetime.fromtimestamp(trace['started_at'], tz=timezone.utc)
+        root_id = uuid.UUID(trace['trace_id'])
+        root_order = f"{started:%Y%m%dT%H%M%S%fZ}{root_id}"
+        root = {
+            'id': root_id,
+            'trace_id': root_id,
+            'dotted_order': root_order,
+            'name': trace['name'],
+            'run_type': 'chain',
+            'start_time': started,
+            'end_time': started + timedelta(milliseconds=trace['duration_ms']),
+            'inputs': trace.get('inputs', {}),
+            'outputs': {'status': trace['status']},
+            'error': trace.get('error'),
+            'extra': {'metadata': {
+                'sampled': trace['sampled'],
+                'pid': trace['pid'],
+                'prompt_tokens': trace['prompt_tokens'],
+                'completion_tokens': trace['completion_tokens'],
+                'estimated_cost_usd': trace['estimated_cost_usd'],
+            }},
+            'session_name': self.project,
+        }
+        runs = [root]
+        for record in trace['spans']:
+            record = dict(record)
+            span_id = uuid.uuid4()
+            span_start = started + timedelta(milliseconds=record.pop('start_ms', 0.0))
+            name = record.pop('name')
+            duration_ms = record.pop('duration_ms')
+            error = record.pop('error', None)
+            runs.append({
+                'id': span_id,
+                'trace_id': root_id,
+                'parent_run_id': root_id,
+                'dotted_order': f"{root_order}.{span_start:%Y%m%dT%H%M%S%fZ}{span_id}",
+                'name': name,
+                'run_type': 'llm' if 'model' in record else 'retriever' if name.startswith('retriev') else 'chain',
+                'start_time': span_start,
+                'end_time': span_start + timedelta(milliseconds=duration_ms),
+                'inputs': {},
+                'outputs': record,
+                'error': error,
+                'session_name': self.project,
+            })
+        return runs
+
+
+class TraceExporter:
+    """Bounded queue of traces drained in batches by a background thread."""
+
+    def __init__(self, max_queue: int = 1000, batch_size: int = 50, flush_interval: float = 2.0):
+        """
+        Initialize the exporter.
+
+        Args:
+            max_queue: Traces waiting for export; further ones are dropped
+            batch_size: Most traces handed to a sink at once
+            flush_interval: Seconds a partial batch waits for more traces
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sinks: Dict[str, object] = {}
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'submitted': 0, 'exported': 0, 'dropped': 0, 'export_errors': 0}
+
+    def set_sink(self, name: str, sink):
+        """Add or replace a sink (None removes it)."""
+        with self._lock:
+            if sink is None:
+                self.sinks.pop(name, None)
+            else:
+                self.sinks[name] = sink
+
+    def submit(self, trace: dict) -> bool:
+        """
+        Queue a trace for export without blocking.
+
+        Returns:
+            False if the queue is full and the trace was dropped
+        """
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            return False
+        with self._lock:
+            self._stats['submitted'] += 1
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued trace has been exported (or failed).
+
+        Args:
+            timeout: Seconds to wait at most (None waits indefinitely)
+
+        Returns:
+            False if traces were still queued when the timeout expired
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _ensure_thread(self):
+        # Started lazily, and again in a forked worker (threads do not survive fork)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._export(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _export(self, batch: List[dict]):
+        with self._lock:
+            sinks = list(self.sinks.items())
+        exported = True
+        for name, sink in sinks:
+            try:
+                sink.export(batch)
+            except Exception as e:
+                exported = False
+                with self._lock:
+                    self._stats['export_errors'] += 1
+                print(f"Warning: trace export to {name} failed: {e}")
+        if exported:
+            with self._lock:
+                self._stats['exported'] += len(batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                'queued': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'sinks': sorted(self.sinks),
+            }
+
+
+class Tracer:
+    """Samples finished request traces and hands the kept ones to the exporter."""
+
+    def __init__(self, sampler: TraceSampler, exporter: TraceExporter, enabled: bool = True):
+        self.sampler = sampler
+        self.exporter = exporter
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counts = {'requests': 0, 'unsampled': 0, **{reason: 0 for reason in SAMPLE_REASONS}}
+
+    def head_sample(self) -> bool:
+        """Head sampling decision for a starting request."""
+        return self.enabled and self.sampler.head()
+
+    def finish(self, name: str, trace: RequestTrace, duration_ms: float, status: int,
+               head_sampled: bool = False, error: Optional[str] = None,
+               inputs: Optional[dict] = None) -> Optional[str]:
+        """
+        Apply tail sampling to a finished request and queue its trace if kept.
+
+        Args:
+            name: Request name, e.g. "POST /api/analyze"
+            trace: Spans recorded while serving the request
+            duration_ms: Request latency
+            status: HTTP status code
+            head_sampled: Result of head_sample() when the request started
+            error: Exception or error message, if the request failed
+            inputs: Small request attributes to attach (e.g. the product name)
+
+        Returns:
+            Sampling reason, or None if the trace was dropped
+        """
+        if not self.enabled:
+            return None
+        reason = self.sampler.reason(head_sampled, duration_ms, error is not None or status >= 500)
+        with self._lock:
+            self._counts['requests'] += 1
+            self._counts[reason or 'unsampled'] += 1
+        if reason is None or not self.exporter.sinks:
+            return reason
+        summary = trace.summary()
+        self.exporter.submit({
+            'trace_id': uuid.uuid4().hex,
+            'name': name,
+            'started_at': time.time() - duration_ms / 1000,
+            'duration_ms': round(duration_ms, 2),
+            'status': status,
+            'error': error,
+            'sampled': reason,
+            'pid': os.getpid(),
+            'inputs': inputs or {},
+            'spans': summary['spans'],
+            'prompt_tokens': summary['prompt_tokens'],
+            'completion_tokens': summary['completion_tokens'],
+            'estimated_cost_usd': summary['estimated_cost_usd'],
+        })
+        return reason
+
+    def configure_langsmith(self, api_key: str, project: str):
+        """Export kept traces to a LangSmith project (an empty key removes the sink)."""
+        self.exporter.set_sink('langsmith', LangSmithSink(api_key, project) if api_key else None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            'enabled': self.enabled,
+            'head_sample_rate': self.sampler.head_rate,
+            'slow_request_ms': self.sampler.slow_ms,
+            **counts,
+            'export': self.exporter.stats(),
+        }
@@ -5,12 +5,14 @@ Vector store setup and management using Qdrant.
 from typing import Optional
 from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Distance, VectorParams
 
+from backend.chunk_store import ChunkStore
+from backend.clients import client_registry
 from backend.config import (
+    CHUNK_STORE_PATH,
     FOOD_LABELING_PDF,
     QDRANT_COLLECTION_NAME,
     QDRANT_LOCATION,
@@ -31,13 +33,13 @@ class VectorStoreManager:
             openai_api_key: OpenAI API key for embeddings
         """
         self.openai_api_key = openai_api_key
-        self.embeddings = OpenAIEmbeddings(
-            model=EMBEDDING_MODEL,
-            api_key=openai_api_key
+        self.embeddings = client_registry.embeddings(
+            api_key=openai_api_key,
+            model=EMBEDDING_MODEL
         )
         self.vectorstore: Optional[QdrantVectorStore] = None
         self.client: Optional[QdrantClient] = None
-        self.chunks = []  # Store chunks for advanced retrieval
+        self.chunks = ChunkStore.from_documents([])  # Chunks for advanced retrieval
         
     def load_and_index_documents(self) -> QdrantVectorStore:
         """
@@ -59,8 +61,9 @@ class VectorStoreManager:
             length_function=len,
             is_separator_regex=False,
         )
-        self.chunks = text_splitter.split_documents(documents)
-        print(f"Split into {len(self.chunks)} chunks")
+        split_documents = text_splitter.split_documents(documents)
+        print(f"Split into {len(split_documents)} chunks")
+        self.chunks = self._store_chunks(split_documents)
         
         # Create Qdrant client
         self.client = QdrantClient(location=QDRANT_LOCATION)
@@ -68,7 +71,7 @@ class VectorStoreManager:
         # Create vector store
         print("Creating vector store and generating embeddings...")
         self.vectorstore = QdrantVectorStore.from_documents(
-            self.chunks,
+            split_documents,
             self.embeddings,
             location=QDRANT_LOCATION,
             collection_name=QDRANT_COLLECTION_NAME,
@@ -77,12 +80,29 @@ class VectorStoreManager:
         
         return self.vectorstore
     
-    def get_chunks(self):
+    def _store_chunks(self, documents) -> ChunkStore:
+        """
+        Keep the chunks in a compact store, memory-mapped from CHUNK_STORE_PATH if set.
+        
+        Args:
+            documents: Chunk Documents from the splitter
+            
+        Returns:
+            ChunkStore instance
+        """
+        store = ChunkStore.from_documents(documents)
+        if CHUNK_STORE_PATH is None:
+            return store
+        store = ChunkStore.load(store.save(CHUNK_STORE_PATH))
+        print(f"Chunk store mapped from {CHUNK_STORE_PATH} ({store.stats()['text_bytes']:,} text bytes)")
+        return store
+    
+    def get_chunks(self) -> ChunkStore:
         """
         Get the document chunks for advanced retrieval strategies.
         
         Returns:
-            List of document chunks
+            ChunkStore of the chunks (indexing yields Documents)
         """
         return self.chunks
     
@@ -101,3 +121,17 @@ class VectorStoreManager:
         
         return self.vectorstore.as_retriever(search_kwargs={"k": k})
 
+    def close(self):
+        """
+        Release the index once no request uses this manager any more.
+
+        Called when a reconfiguration has replaced this pipeline and its
+        in-flight requests have drained.
+        """
+        for client in (getattr(self.vectorstore, 'client', None), self.client):
+            if client is not None:
+                client.close()
+        self.vectorstore = None
+        self.client = None
+        self.chunks = ChunkStore.from_documents([])
+
@@ -0,0 +1,241 @@
+"""
+Background catalog warm-up for the KidSafe Food Analyzer.
+
+Walks every product in the catalog and fills the analysis cache at low
+priority, so the first click on a catalog item is a cache read. The
+worker pauses whenever interactive requests are in flight. Progress is
+resumable because already-cached products are skipped.
+When several server processes share the cache, ProcessLock picks the
+one that runs the warm-up.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows, where only the single-process dev server runs
+    fcntl = None
+
+
+class InteractiveTraffic:
+    """Counts in-flight interactive requests so background work can yield."""
+
+    def __init__(self):
+        self._active = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def track(self):
+        """Mark an interactive request as in flight for the duration of the block."""
+        with self._condition:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                if self._active == 0:
+                    self._condition.notify_all()
+
+    @property
+    def active(self) -> int:
+        """Number of interactive requests currently in flight."""
+        return self._active
+
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until no interactive request is in flight.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if traffic is idle, False on timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._active == 0, timeout=timeout)
+
+
+class ProcessLock:
+    """Exclusive lock on a file, held by one process until it exits."""
+
+    def __init__(self, path):
+        """
+        Initialize the lock (nothing is locked until acquire()).
+
+        Args:
+            path: Lock file, created if missing
+        """
+        self.path = str(path)
+        self._file = None
+
+    def acquire(self) -> bool:
+        """
+        Take the lock without waiting.
+
+        Returns:
+            True if this process holds the lock, False if another one does
+        """
+        if self._file is not None or fcntl is None:
+            return True
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+
+class CatalogWarmupWorker:
+    """Background thread that precomputes analyses for every catalog product."""
+
+    def __init__(
+        self,
+        load_catalog: Callable[[], List[dict]],
+        analyze: Callable[[str, str], str],
+        is_cached: Callable[[str, str], bool],
+        traffic: InteractiveTraffic,
+        interval_seconds: Optional[float] = None,
+        item_delay: float = 0.5
+    ):
+        """
+        Initialize the warm-up worker.
+
+        Args:
+            load_catalog: Returns the catalog as a list of {'brand', 'ingredients'} dicts
+            analyze: Runs (and caches) an analysis for a product
+            is_cached: Checks whether a product already has a cached analysis
+            traffic: Interactive traffic tracker to yield to
+            interval_seconds: Re-walk the catalog on this schedule (None runs on demand only)
+            item_delay: Pause between products to keep the worker low priority
+        """
+        self.load_catalog = load_catalog
+        self.analyze = analyze
+        self.is_cached = is_cached
+        self.traffic = traffic
+        self.interval_seconds = interval_seconds
+        self.item_delay = item_delay
+
+        self._thread: Optional[threading.Thread] = None
+        self._trigger = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._progress = {
+            'state': 'idle',
+            'passes': 0,
+            'total': 0,
+            'completed': 0,
+            'skipped': 0,
+            'failed': 0,
+            'current': None,
+            'last_error': None,
+            'started_at': None,
+            'finished_at': None,
+        }
+
+    def start(self):
+        """Start the worker thread, or request a new pass if it is already running."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="catalog-warmup", daemon=True
+                )
+                self._thread.start()
+        self._trigger.set()
+
+    def stop(self):
+        """Ask the worker to stop after the current product."""
+        self._stop.set()
+        self._trigger.set()
+
+    def progress(self) -> dict:
+        """
+        Get a snapshot of warm-up progress.
+
+        Returns:
+            Dictionary with state, counts and the product being analyzed
+        """
+        with self._lock:
+            progress = dict(self._progress)
+        done = progress['completed'] + progress['skipped'] + progress['failed']
+        progress['remaining'] = max(progress['total'] - done, 0)
+        return progress
+
+    def _update(self, **fields):
+        with self._lock:
+            self._progress.update(fields)
+
+    def _increment(self, field: str):
+        with self._lock:
+            self._progress[field] += 1
+
+    def _run(self):
+        """Thread body: run a pass per trigger or per scheduled interval."""
+        while not self._stop.is_set():
+            self._trigger.wait(timeout=self.interval_seconds)
+            self._trigger.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self._run_pass()
+            except Exception as e:
+                print(f"Catalog warm-up pass failed: {e}")
+                self._update(state='error', last_error=str(e))
+        self._update(state='stopped', current=None)
+
+    def _run_pass(self):
+        """Walk the catalog once, analyzing every product not yet cached."""
+        catalog = self.load_catalog()
+        self._update(
+            state='running',
+            total=len(catalog),
+            completed=0,
+            skipped=0,
+            failed=0,
+            current=None,
+            started_at=time.time(),
+            finished_at=None,
+        )
+        print(f"Catalog warm-up: {len(catalog)} products")
+
+        for product in catalog:
+            if self._stop.is_set():
+                return
+            brand = product['brand']
+            ingredients = product.get('ingredients', '')
+            if not ingredients or self.is_cached(brand, ingredients):
+                self._increment('skipped')
+                continue
+
+            # Yield to interactive traffic before each expensive analysis
+            if self.traffic.active:
+                self._update(state='paused')
+            while not self.traffic.wait_until_idle(timeout=1.0):
+                if self._stop.is_set():
+                    return
+            self._update(state='running', current=brand)
+
+            try:
+                self.analyze(brand, ingredients)
+                self._increment('completed')
+            except Exception as e:
+                print(f"Catalog warm-up failed for {brand}: {e}")
+                self._increment('failed')
+                self._update(last_error=str(e))
+
+            self._stop.wait(self.item_delay)
+
+        with self._lock:
+            self._progress['passes'] += 1
+        self._update(state='finished', current=None, finished_at=time.time())
+        print("Catalog warm-up finished")
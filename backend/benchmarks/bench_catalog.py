@@ -0,0 +1,119 @@
+"""
+Benchmark for the in-memory product catalog as the catalog grows.
+
+For catalogs of 10 to 1M products, compares the old per-request path
+(open and parse cereal.csv, serialize to JSON) with the catalog service:
+the one-time load (parse, serialize, compress), a request served from
+the precomputed body (streamed from the columnar store above
+CATALOG_FULL_LIST_MAX_PRODUCTS), a change check that stat()s the file,
+and a revalidation answered with 304. Also reports response sizes per
+content-encoding.
+
+Usage:
+    python benchmarks/bench_catalog.py [--max-rows 1000000]
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend.catalog import ProductCatalog, choose_encoding, stream_catalog_json  # noqa: E402
+
+INGREDIENTS = [
+    "Whole Grain Oats", "Sugar", "Corn Starch", "Salt", "Honey", "Almonds", "Rice Flour",
+    "Tripotassium Phosphate", "Vitamin E", "Red 40", "Yellow 6", "BHT", "Cane Sugar", "Wheat Flour",
+]
+
+
+def write_catalog(path: str, rows: int, seed: int = 7):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(['Brand_Name', 'Ingredients'])
+        for i in range(rows):
+            writer.writerow([f"Cereal {i}", ", ".join(rng.sample(INGREDIENTS, rng.randint(3, 8)))])
+
+
+def timed(fn, repeat: int) -> float:
+    """Mean seconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def legacy_request(path: str) -> bytes:
+    """What /api/cereals did before: re-read, re-parse and re-serialize per request."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        products = [
+            {'brand': row['Brand_Name'], 'ingredients': row.get('Ingredients') or ''}
+            for row in csv.DictReader(f)
+            if row.get('Brand_Name')
+        ]
+    return json.dumps(products, separators=(',', ':')).encode('utf-8')
+
+
+def fmt(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:8.2f} s "
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds * 1e6:8.2f} us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--max-rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'legacy/request':>14}  {'cold load':>11}  {'cached/request':>14}  "
+          f"{'change check':>12}  {'304':>11}  {'identity':>10}  {'gzip':>10}  {'br':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = 10
+        while rows <= args.max_rows:
+            path = os.path.join(tmp, f"catalog_{rows}.csv")
+            write_catalog(path, rows)
+            repeat = max(1, min(1000, 200_000 // rows))
+
+            legacy = timed(lambda: legacy_request(path), repeat)
+
+            start = time.perf_counter()
+            catalog = ProductCatalog(path, check_interval=3600)
+            snapshot = catalog.snapshot()
+            cold = time.perf_counter() - start
+
+            def cached_request():
+                current = catalog.snapshot()
+                if not current.bodies:
+                    return b''.join(stream_catalog_json(current.store))
+                return current.bodies[choose_encoding("gzip, deflate, br", current.bodies)]
+
+            def revalidate():
+                current = catalog.snapshot()
+                return current.etag == snapshot.etag
+
+            cached = timed(cached_request, 10_000 if snapshot.bodies else repeat)
+            not_modified = timed(revalidate, 10_000)
+            checking = ProductCatalog(path, check_interval=0)
+            checking.snapshot()
+            change_check = timed(checking.snapshot, 1000)
+
+            sizes = {encoding or 'identity': len(body) for encoding, body in snapshot.bodies.items()}
+            if not snapshot.bodies:
+                sizes['identity'] = f"{len(cached_request())} (streamed)"
+            print(f"{rows:>9}  {fmt(legacy):>14}  {fmt(cold):>11}  {fmt(cached):>14}  "
+                  f"{fmt(change_check):>12}  {fmt(not_modified):>11}  {sizes['identity']:>10}  "
+                  f"{sizes.get('gzip', '-'):>10}  {sizes.get('br', '-'):>10}")
+            os.remove(path)
+            rows *= 10
+
+
+if __name__ == '__main__':
+    main()
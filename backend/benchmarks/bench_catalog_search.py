@@ -0,0 +1,111 @@
+"""
+Benchmark for /api/cereals/search indexes on a large synthetic catalog.
+
+Builds a catalog of realistic brand names (maker + flavor + product
+words) and ingredient lists, builds the CatalogSearchIndex, and reports
+build time, memory and per-query latency percentiles for prefix,
+paginated prefix, fuzzy (one typo) and ingredient-contains searches.
+
+Usage:
+    python benchmarks/bench_catalog_search.py [--products 1000000] [--queries 2000]
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend.catalog_search import CatalogSearchIndex  # noqa: E402
+from backend.catalog_store import build_store  # noqa: E402
+
+MAKERS = ["Kellogg's", "Post", "General Mills", "Nature's Path", "Kashi", "Quaker", "Barbara's", "Cascadian Farm",
+          "Annie's", "Seven Sundays", "Bob's Red Mill", "Three Wishes", "Magic Spoon", "Love Grown", "Purely Elizabeth",
+          "Mom's Best", "Malt-O-Meal", "Weetabix", "Alpen", "Familia"]
+FLAVORS = ["Honey", "Cinnamon", "Chocolate", "Maple", "Berry", "Strawberry", "Vanilla", "Peanut Butter", "Apple",
+           "Banana", "Blueberry", "Coconut", "Almond", "Pumpkin", "Frosted", "Original", "Toasted", "Crunchy",
+           "Ancient Grain", "Multigrain", "Organic", "Protein", "Oat", "Raisin", "Cocoa", "Caramel", "Lemon"]
+PRODUCTS = ["Cheerios", "Flakes", "Crunch", "Clusters", "Granola", "Puffs", "Squares", "O's", "Bites", "Loops",
+            "Muesli", "Bran", "Crisp", "Shreds", "Nuggets", "Pops", "Rings", "Oatmeal", "Krispies", "Chex"]
+SIZES = ["", "Family Size", "Mini", "Big Bag", "Value Pack", "Single Serve"]
+INGREDIENTS = (
+    ["Whole Grain Oats", "Whole Grain Wheat", "Corn Meal", "Rice Flour", "Sorghum", "Quinoa", "Amaranth", "Barley",
+     "Sugar", "Cane Sugar", "Brown Sugar", "Honey", "Corn Syrup", "High Fructose Corn Syrup", "Molasses", "Salt",
+     "Sea Salt", "Almonds", "Pecans", "Raisins", "Cranberries", "Dried Apples", "Cocoa", "Cinnamon", "Vanilla Extract",
+     "Natural Flavor", "Artificial Flavor", "Red 40", "Yellow 5", "Yellow 6", "Blue 1", "BHT", "TBHQ",
+     "Tocopherols", "Soy Lecithin", "Canola Oil", "Palm Oil", "Hydrogenated Soybean Oil", "Tripotassium Phosphate",
+     "Calcium Carbonate", "Reduced Iron", "Zinc Oxide", "Vitamin E", "Vitamin C", "Vitamin D3", "Vitamin B12",
+     "Niacinamide", "Folic Acid", "Riboflavin", "Thiamin Mononitrate", "Malt Flavor", "Pea Protein", "Chicory Root Fiber"]
+    + [f"Spice Blend {i}" for i in range(200)]
+)
+
+
+def make_catalog(products: int, seed: int = 7):
+    rng = random.Random(seed)
+    brands, ingredients = [], []
+    for i in range(products):
+        brand = " ".join(filter(None, [rng.choice(MAKERS), rng.choice(FLAVORS), rng.choice(FLAVORS) if i % 3 == 0 else "",
+                                       rng.choice(PRODUCTS), rng.choice(SIZES)]))
+        brands.append(brand)
+        ingredients.append(", ".join(rng.sample(INGREDIENTS, rng.randint(4, 12))))
+    return brands, ingredients
+
+
+def typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:]  # drop one letter
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1e6
+    return f"p50 {pick(0.5):8.1f} us   p99 {pick(0.99):8.1f} us   max {ordered[-1] * 1e6:8.1f} us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    brands, ingredients = make_catalog(args.products)
+    store = build_store(zip(brands, ingredients))
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    index = CatalogSearchIndex(store, version="bench")
+    build = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{args.products} products: index built in {build:.1f} s, "
+          f"peak RSS +{(rss_after - rss_before) / 1024:.0f} MB, {index.stats()}")
+
+    rng = random.Random(11)
+    lowered = [b.lower() for b in MAKERS]
+    long_words = [w.lower() for w in PRODUCTS + FLAVORS if len(w) >= 5 and w.isalpha()]
+    workloads = {
+        "prefix": lambda: index.search(rng.choice(lowered)[:rng.randint(1, 6)], limit=args.limit),
+        "prefix page 2": lambda: index.search(
+            rng.choice(lowered)[:3], limit=args.limit,
+            cursor=index.search(rng.choice(lowered)[:3], limit=args.limit)[1]),
+        "fuzzy (1 typo)": lambda: index.search(typo(rng.choice(long_words), rng), fuzzy=True, limit=args.limit),
+        "fuzzy (2 words)": lambda: index.search(f"{rng.choice(MAKERS).split()[0]} {typo(rng.choice(long_words), rng)}",
+                                                fuzzy=True, limit=args.limit),
+        "ingredient": lambda: index.search(ingredients=[rng.choice(INGREDIENTS[:50])], limit=args.limit),
+        "ingredient+exclude": lambda: index.search(ingredients=["oats"], exclude=[rng.choice(["sugar", "red 40", "bht"])],
+                                                   limit=args.limit),
+        "prefix+ingredient": lambda: index.search(rng.choice(lowered)[:4], ingredients=["honey"], limit=args.limit),
+    }
+    for name, run in workloads.items():
+        samples = []
+        for _ in range(args.queries):
+            start = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - start)
+        print(f"{name:<20} {percentiles(samples)}")
+
+
+if __name__ == '__main__':
+    main()
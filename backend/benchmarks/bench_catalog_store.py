@@ -0,0 +1,120 @@
+"""
+Benchmark for columnar catalog ingestion and memory.
+
+Writes a synthetic catalog as CSV, JSON Lines and (if pyarrow is
+installed) Parquet, then reports for each format the streaming load time
+into a CatalogStore and its traced memory, next to the list of dicts the
+catalog used to be. Also reports the latency of a lookup by product ID,
+the path /api/analyze takes for {"product_id": ...}.
+
+Usage:
+    python benchmarks/bench_catalog_store.py [--products 1000000]
+"""
+
+import argparse
+import csv
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend.catalog_store import iter_csv, load_catalog_store, parquet_module  # noqa: E402
+
+MAKERS = ["Kellogg's", "Post", "General Mills", "Nature's Path", "Kashi", "Quaker", "Barbara's", "Annie's"]
+PRODUCTS = ["Cheerios", "Flakes", "Crunch", "Clusters", "Granola", "Puffs", "Squares", "Bites", "Loops", "Muesli"]
+INGREDIENTS = (
+    ["Whole Grain Oats", "Whole Grain Wheat", "Corn Meal", "Rice Flour", "Sugar", "Cane Sugar", "Honey",
+     "Corn Syrup", "Salt", "Almonds", "Raisins", "Cocoa", "Cinnamon", "Natural Flavor", "Red 40", "Yellow 6",
+     "BHT", "Tocopherols", "Canola Oil", "Tripotassium Phosphate", "Vitamin E", "Reduced Iron", "Folic Acid"]
+    + [f"Spice Blend {i}" for i in range(200)]
+)
+
+
+def make_rows(products: int, seed: int = 7):
+    rng = random.Random(seed)
+    for i in range(products):
+        yield (f"{rng.choice(MAKERS)} {rng.choice(PRODUCTS)} {i}",
+               ", ".join(rng.sample(INGREDIENTS, rng.randint(4, 12))))
+
+
+def write_files(directory: str, products: int) -> dict:
+    paths = {'csv': os.path.join(directory, 'catalog.csv'), 'jsonl': os.path.join(directory, 'catalog.jsonl')}
+    with open(paths['csv'], 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(['Brand_Name', 'Ingredients'])
+        writer.writerows(make_rows(products))
+    with open(paths['jsonl'], 'w', encoding='utf-8') as f:
+        for brand, ingredients in make_rows(products):
+            f.write(json.dumps({'brand': brand, 'ingredients': ingredients}) + '\n')
+    pq = parquet_module()
+    if pq is not None:
+        import pyarrow as pa
+        paths['parquet'] = os.path.join(directory, 'catalog.parquet')
+        writer = None
+        rows = make_rows(products)
+        while True:
+            batch = [row for _, row in zip(range(100_000), rows)]
+            if not batch:
+                break
+            table = pa.table({'brand': [b for b, _ in batch], 'ingredients': [i for _, i in batch]})
+            writer = writer or pq.ParquetWriter(paths['parquet'], table.schema)
+            writer.write_table(table)
+        writer.close()
+    return paths
+
+
+def measure(load):
+    """(result, seconds, traced bytes still held, traced peak bytes) of load(); timed without tracing."""
+    gc.collect()
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, held, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_files(tmp, args.products)
+        print(f"{args.products} products; file sizes: "
+              + ", ".join(f"{fmt} {os.path.getsize(path) / 1e6:.0f} MB" for fmt, path in paths.items()))
+        print(f"{'format':<22} {'load':>8} {'held':>10} {'peak':>10} {'per product':>12}")
+
+        dicts, elapsed, held, peak = measure(lambda: [
+            {'brand': brand, 'ingredients': ingredients} for brand, ingredients in iter_csv(paths['csv'])])
+        print(f"{'csv -> list of dicts':<22} {elapsed:7.1f}s {held / 1e6:8.0f}MB {peak / 1e6:8.0f}MB "
+              f"{held / args.products:10.0f} B")
+        del dicts
+
+        for fmt, path in paths.items():
+            store = None  # Release the previous format's store before measuring
+            store, elapsed, held, peak = measure(lambda: load_catalog_store(path))
+            print(f"{fmt + ' -> CatalogStore':<22} {elapsed:7.1f}s {held / 1e6:8.0f}MB {peak / 1e6:8.0f}MB "
+                  f"{held / args.products:10.0f} B")
+        print(f"store stats: {store.stats()}")
+
+    rng = random.Random(3)
+    ids = [rng.randrange(len(store)) for _ in range(args.lookups)]
+    start = time.perf_counter()
+    for product_id in ids:
+        store[product_id]
+    print(f"lookup by product ID: {(time.perf_counter() - start) / len(ids) * 1e6:.2f} us")
+
+
+if __name__ == '__main__':
+    main()
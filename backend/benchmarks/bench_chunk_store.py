@@ -0,0 +1,136 @@
+"""
+Benchmark for chunk memory and BM25 latency with Documents and a ChunkStore.
+
+Generates synthetic chunks with PDF loader metadata (fourteen fields per
+page, copied into each of its chunks, as the text splitter does) and
+reports the traced heap memory of:
+
+    documents           a list of Documents, the old VectorStoreManager.chunks
+    documents + BM25    the same plus the Document copies BM25Retriever made
+    ChunkStore          the compact store, in memory
+    ChunkStore, mapped  the store memory-mapped from its file (heap only;
+                        the file lives in the page cache, shared by workers)
+
+then BM25 top-k latency with LangChain's BM25Retriever over the Document
+list against ChunkBM25Retriever over the store (same vectorizer), and the
+cost of materializing one chunk as a Document.
+
+Usage:
+    python benchmarks/bench_chunk_store.py [--chunks 50000] [--queries 200]
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_core.documents import Document  # noqa: E402
+
+from backend.advanced_retrieval import ChunkBM25Retriever, bm25_tokens  # noqa: E402
+from backend.chunk_store import ChunkStore  # noqa: E402
+from bench_preload import WORDS  # noqa: E402
+
+CHUNKS_PER_PAGE = 3
+
+
+def page_metadata(page: int, pages: int) -> dict:
+    """Metadata PyMuPDFLoader attaches to a page."""
+    return {
+        'producer': 'Adobe PDF Library 15.0', 'creator': 'Adobe InDesign 16.0 (Windows)',
+        'creationdate': '2013-01-04T10:21:05-05:00', 'source': 'Data/Input/Food-Labeling-Guide-(PDF).pdf',
+        'file_path': 'Data/Input/Food-Labeling-Guide-(PDF).pdf', 'total_pages': pages, 'format': 'PDF 1.6',
+        'title': 'A Food Labeling Guide', 'author': 'FDA', 'subject': '', 'keywords': '',
+        'moddate': '2013-01-04T10:22:31-05:00', 'trapped': '', 'page': page,
+    }
+
+
+def make_documents(chunks: int, seed: int = 3):
+    rng = random.Random(seed)
+    pages = chunks // CHUNKS_PER_PAGE + 1
+    metadata = None
+    for i in range(chunks):
+        if i % CHUNKS_PER_PAGE == 0:
+            metadata = page_metadata(i // CHUNKS_PER_PAGE, pages)
+        yield Document(page_content=" ".join(rng.choice(WORDS) for _ in range(150)), metadata=dict(metadata))
+
+
+def measure(load):
+    """(result, seconds, traced bytes still held) of load(); timed without tracing."""
+    gc.collect()
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, held
+
+
+def with_bm25_copies(documents):
+    # BM25Retriever.from_documents builds a Document per chunk from the texts and metadata
+    return documents, [Document(page_content=d.page_content, metadata=d.metadata) for d in documents]
+
+
+def mean_latency(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--chunks', type=int, default=50_000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.chunks} chunks of 150 words, {CHUNKS_PER_PAGE} per page")
+    print(f"{'layout':<20} {'build':>8} {'heap':>10} {'per chunk':>10}")
+    rows = [
+        ("documents", lambda: list(make_documents(args.chunks))),
+        ("documents + BM25", lambda: with_bm25_copies(list(make_documents(args.chunks)))),
+        ("ChunkStore", lambda: ChunkStore.from_documents(make_documents(args.chunks))),
+    ]
+    for label, load in rows:
+        result, elapsed, held = measure(load)
+        print(f"{label:<20} {elapsed:7.2f}s {held / 1e6:8.1f}MB {held / args.chunks:8.0f} B")
+        del result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = ChunkStore.from_documents(make_documents(args.chunks)).save(os.path.join(tmp, 'chunks.store'))
+        mapped, elapsed, held = measure(lambda: ChunkStore.load(path))
+        print(f"{'ChunkStore, mapped':<20} {elapsed:7.2f}s {held / 1e6:8.1f}MB {held / args.chunks:8.0f} B"
+              f"   (file {os.path.getsize(path) / 1e6:.1f} MB)")
+
+        from langchain_community.retrievers import BM25Retriever
+        from rank_bm25 import BM25Okapi
+
+        documents = list(make_documents(args.chunks))
+        vectorizer = BM25Okapi([bm25_tokens(text) for text in mapped.texts()])
+        old = BM25Retriever(vectorizer=vectorizer, docs=documents, k=args.k, preprocess_func=bm25_tokens)
+        new = ChunkBM25Retriever(vectorizer=vectorizer, chunks=mapped, k=args.k)
+        rng = random.Random(5)
+        queries = [" ".join(rng.sample(WORDS, 4)) for _ in range(args.queries)]
+        assert [d.page_content for d in old.invoke(queries[0])] == [d.page_content for d in new.invoke(queries[0])]
+        print(f"BM25 top-{args.k}: Documents {mean_latency(old.invoke, queries) * 1000:.2f} ms, "
+              f"ChunkStore {mean_latency(new.invoke, queries) * 1000:.2f} ms per query")
+
+        ids = [rng.randrange(args.chunks) for _ in range(20_000)]
+        start = time.perf_counter()
+        for chunk_id in ids:
+            mapped[chunk_id]
+        print(f"materialize one chunk: {(time.perf_counter() - start) / len(ids) * 1e6:.1f} us")
+        del mapped, new
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark for ingredient normalization on large feeds.
+
+Builds a synthetic feed of ingredient lists from the known vocabulary
+with the noise real labels have: random casing, label filler and
+one-letter typos. Reports throughput for lists of never-seen items
+(nothing memoized), for unique lists whose items repeat across the feed
+(item memo only) and for repeated lists, plus how many lists with typos
+resolve to their canonical names and how much distinct raw text
+collapses into canonical IDs.
+
+Usage:
+    python benchmarks/bench_ingredients.py [--lists 200000] [--typo-rate 0.05]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend.ingredients import COMMON_INGREDIENTS, IngredientNormalizer  # noqa: E402
+
+FILLER = ["Contains 2% or less of ", "Less than 2% of: ", ""]
+
+
+def noisy(name: str, rng: random.Random, typo_rate: float):
+    """A label rendering of a canonical name, and whether a typo was injected."""
+    words = name.split()
+    typo = False
+    if rng.random() < typo_rate:
+        candidates = [i for i, w in enumerate(words) if len(w) >= 6 and w.isalpha()]
+        if candidates:
+            i = rng.choice(candidates)
+            word = words[i]
+            position = rng.randrange(1, len(word) - 1)
+            words[i] = word[:position] + rng.choice(string.ascii_lowercase) + word[position + 1:]
+            typo = words[i] != word
+    text = " ".join(words)
+    return rng.choice([text.title(), text.upper(), text]), typo
+
+
+def build_feed(count: int, typo_rate: float, seed: int = 7):
+    """(list text, canonical names, typos injected) per list."""
+    rng = random.Random(seed)
+    feed = []
+    for i in range(count):
+        names = rng.sample(COMMON_INGREDIENTS, rng.randint(4, 15))
+        items, typos = [], 0
+        for j, name in enumerate(names):
+            text, typo = noisy(name, rng, typo_rate)
+            typos += typo
+            if j == len(names) - 2:
+                text = rng.choice(FILLER) + text
+            items.append(text)
+        items.append(f"Lot {i}")  # Keep every list unique
+        feed.append((", ".join(items), names, typos))
+    return feed
+
+
+def timed(normalizer, lists):
+    start = time.perf_counter()
+    for text in lists:
+        normalizer.normalize(text)
+    return time.perf_counter() - start
+
+
+def report(label, count, elapsed):
+    print(f"{label:<16} {count:>8,} in {elapsed:6.2f}s -> {count / elapsed:>10,.0f} lists/s "
+          f"({elapsed / count * 1e6:.1f} us/list)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lists', type=int, default=200_000)
+    parser.add_argument('--typo-rate', type=float, default=0.05, help='Fraction of items with a one-letter typo')
+    args = parser.parse_args()
+
+    feed = build_feed(args.lists, args.typo_rate)
+    lists = [text for text, _, _ in feed]
+
+    start = time.perf_counter()
+    IngredientNormalizer()
+    print(f"Normalizer build: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # Lists whose items are all new text: the full path for every item
+    cold = IngredientNormalizer(cache_size=0)
+    unique_items = [text.replace(", ", f" {i}, ") for i, text in enumerate(lists[:20_000])]
+    report("Unique items", len(unique_items), timed(cold, unique_items))
+    report("Unique lists", len(lists), timed(IngredientNormalizer(cache_size=0), lists))
+    repeated = [lists[i % 1000] for i in range(len(lists))]
+    report("Repeated lists", len(repeated), timed(IngredientNormalizer(), repeated))
+
+    normalizer = IngredientNormalizer(cache_size=0)
+    exact = with_typos = exact_with_typos = 0
+    raw_items, canonical_ids = set(), set()
+    for text, names, typos in feed:
+        result = normalizer.normalize(text)
+        correct = list(result.names[:-1]) == names
+        exact += correct
+        if typos:
+            with_typos += 1
+            exact_with_typos += correct
+        raw_items.update(item.strip() for item in text.split(',')[:-1])
+        canonical_ids.update(result.ids[:-1])
+    print(f"Lists normalized to their canonical names: {exact / len(feed):.1%} of all, "
+          f"{exact_with_typos / max(with_typos, 1):.1%} of the {with_typos:,} lists with typos")
+    print(f"Distinct raw items: {len(raw_items):,} -> canonical ingredients: {len(canonical_ids):,}")
+
+
+if __name__ == '__main__':
+    main()
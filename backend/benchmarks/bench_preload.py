@@ -0,0 +1,225 @@
+"""
+Benchmark for per-worker memory of the multi-worker server, with and without preload.
+
+Starts serve.py's gunicorn server (in a child process) on a synthetic
+catalog and a synthetic knowledge index (fake embeddings, fake LLM, so
+no API keys are needed), sends analysis and search requests so every
+worker touches the shared state, then reads /proc/<pid>/smaps_rollup of
+the master and each worker:
+
+    RSS  resident pages, shared ones counted in full in every process
+    PSS  shared pages divided among the processes sharing them
+    USS  pages private to the process (what it costs on its own)
+
+Sum of PSS over master and workers is the server's real footprint.
+Linux only.
+
+Usage:
+    python benchmarks/bench_preload.py [--workers 4] [--products 200000] [--chunks 20000]
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+WORDS = ["sugar", "honey", "oats", "wheat", "corn", "syrup", "almonds", "cocoa", "salt", "bht",
+         "tocopherols", "label", "allergen", "declared", "fda", "additive", "color", "flavor"]
+INGREDIENTS = ["Whole Grain Oats", "Sugar", "Corn Syrup", "Honey", "Salt", "Almonds", "Cocoa",
+               "Red 40", "Yellow 6", "BHT", "Natural Flavor", "Canola Oil", "Reduced Iron"]
+
+
+def write_catalog(path: str, products: int, seed: int = 7):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Brand_Name', 'Ingredients'])
+        for i in range(products):
+            writer.writerow([f"Cereal {i}", ", ".join(rng.sample(INGREDIENTS, rng.randint(3, 9)))])
+
+
+def synthetic_build(chunks: int):
+    """A build_pipeline replacement over synthetic chunks, fake embeddings and a fake LLM."""
+    import main
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_qdrant import QdrantVectorStore
+    from backend.advanced_retrieval import AdvancedRetrievalManager
+    from backend.pipeline import PipelineSnapshot, freeze_keys
+    from backend.rag_engine import IngredientAnalyzer
+
+    class IndexHolder:
+        def close(self):
+            pass
+
+    def fake_llm():
+        return GenericFakeChatModel(messages=itertools.repeat(AIMessage(content="## VERDICT: MODERATE")))
+
+    def build(version, api_keys, retrieval_strategy, report_progress):
+        rng = random.Random(3)
+        documents = [
+            Document(page_content=" ".join(rng.choice(WORDS) for _ in range(150)), metadata={'page': i})
+            for i in range(chunks)
+        ]
+        vectorstore = QdrantVectorStore.from_documents(
+            documents, DeterministicFakeEmbedding(size=1536), location=":memory:", collection_name="bench"
+        )
+        manager = AdvancedRetrievalManager(vectorstore, documents, api_keys['openai_api_key'])
+        manager.llm = fake_llm()
+        retriever, strategy = main.select_retriever(manager, retrieval_strategy, '')
+        analyzer = IngredientAnalyzer(retriever, api_keys['openai_api_key'], retrieval_strategy=strategy)
+        analyzer.llm = fake_llm()
+        return PipelineSnapshot(
+            version=version,
+            api_keys=freeze_keys(api_keys),
+            retrieval_strategy=strategy,
+            vector_store_manager=IndexHolder(),
+            advanced_retrieval_manager=manager,
+            ingredient_analyzer=analyzer,
+            chat_summarizer=main.make_chat_summarizer(api_keys['openai_api_key'])
+        )
+
+    return build
+
+
+def serve(args):
+    """Child process: run the server on the synthetic catalog and index."""
+    from serve import KidSafeServer
+
+    class BenchServer(KidSafeServer):
+        def load(self):
+            import main
+            from backend.analysis_cache import AnalysisCache
+            from backend.catalog import ProductCatalog
+            main.catalog = ProductCatalog(args.catalog)
+            main.analysis_cache = AnalysisCache(max_entries=64)  # Every request runs the pipeline
+            main.build_pipeline = synthetic_build(args.chunks)
+            main.WARMUP_ON_CONFIGURE = False
+            main.apply_api_key_environment = lambda api_keys: None  # No LangSmith tracing of the fake keys
+            return main.app
+
+    os.environ.update(OPENAI_API_KEY='sk-bench', LANGSMITH_API_KEY='ls-bench')
+    BenchServer({
+        'workers': args.workers,
+        'bind': f"127.0.0.1:{args.port}",
+        'preload_app': not args.no_preload,
+        'timeout': 600,
+    }).run()
+
+
+def memory(pid: int) -> dict:
+    """RSS, PSS and USS of a process in MB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'uss': fields['Private_Clean'] + fields['Private_Dirty'],
+    }
+
+
+def worker_pids(master: int):
+    with open(f"/proc/{master}/task/{master}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def request(port: int, path: str, body: dict = None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data,
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=120) as response:
+        return json.loads(response.read())
+
+
+def measure(args, catalog: str, preload: bool) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), '--serve', '--catalog', catalog,
+               '--workers', str(args.workers), '--chunks', str(args.chunks), '--port', str(args.port)]
+    if not preload:
+        command.append('--no-preload')
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        start = time.perf_counter()
+        ready = set()
+        while len(ready) < args.workers:
+            if server.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            if time.perf_counter() - start > args.startup_timeout:
+                raise RuntimeError(f"Only {len(ready)} of {args.workers} workers ready after {args.startup_timeout}s")
+            try:
+                status = request(args.port, '/api/status')
+                if status['initialized']:
+                    ready.add(status['server']['pid'])
+            except OSError:
+                time.sleep(0.5)
+        startup = time.perf_counter() - start
+
+        rng = random.Random(5)
+
+        def exercise(i):
+            ingredients = ", ".join(rng.sample(INGREDIENTS, 5))
+            request(args.port, '/api/analyze', {'cereal_name': f"Bench {i}", 'ingredients': ingredients})
+            request(args.port, f"/api/cereals/search?q={rng.choice(INGREDIENTS).split()[0]}")
+
+        with ThreadPoolExecutor(max_workers=args.workers * 2) as pool:
+            list(pool.map(exercise, range(args.requests)))
+
+        workers = [memory(pid) for pid in worker_pids(server.pid)]
+        master = memory(server.pid)
+        return {'startup': startup, 'master': master, 'workers': workers}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--products', type=int, default=200_000)
+    parser.add_argument('--chunks', type=int, default=20_000, help='Synthetic knowledge chunks indexed')
+    parser.add_argument('--requests', type=int, default=200, help='Analyses sent before measuring')
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--startup-timeout', type=float, default=900)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--catalog', help=argparse.SUPPRESS)
+    parser.add_argument('--no-preload', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = os.path.join(tmp, 'catalog.csv')
+        write_catalog(catalog, args.products)
+        print(f"{args.workers} workers, {args.products} products, {args.chunks} chunks, "
+              f"{args.requests} analyses before measuring")
+        print(f"{'mode':<12} {'startup':>8} {'worker RSS':>11} {'worker PSS':>11} {'worker USS':>11} "
+              f"{'master RSS':>11} {'total PSS':>10}")
+        for preload in (True, False):
+            result = measure(args, catalog, preload)
+            workers = result['workers']
+            average = {key: sum(w[key] for w in workers) / len(workers) for key in ('rss', 'pss', 'uss')}
+            total_pss = result['master']['pss'] + sum(w['pss'] for w in workers)
+            print(f"{'preload' if preload else 'no preload':<12} {result['startup']:7.1f}s "
+                  f"{average['rss']:9.0f}MB {average['pss']:9.0f}MB {average['uss']:9.0f}MB "
+                  f"{result['master']['rss']:9.0f}MB {total_pss:8.0f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark for hedged model calls and circuit breaking against a fake provider.
+
+The fake provider answers most calls quickly and a small fraction very
+slowly (tail latency), like a model API under load. The benchmark runs
+the same workload without and with hedging and reports latency
+percentiles, then shows the circuit breaker short-circuiting a provider
+that keeps failing.
+
+Usage:
+    python benchmarks/bench_resilience.py [--calls 400] [--tail-rate 0.05]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend.resilience import CircuitOpenError, ResilientCaller, request_deadline  # noqa: E402
+
+
+class FakeProvider:
+    """Model provider stand-in with injected tail latency and failures."""
+
+    def __init__(self, base_ms: float, tail_ms: float, tail_rate: float, failure_rate: float = 0.0, seed: int = 7):
+        self.base_ms = base_ms
+        self.tail_ms = tail_ms
+        self.tail_rate = tail_rate
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.requests += 1
+            slow = self._rng.random() < self.tail_rate
+            failed = self._rng.random() < self.failure_rate
+            jitter = self._rng.uniform(0.8, 1.2)
+        time.sleep((self.tail_ms if slow else self.base_ms) * jitter / 1000)
+        if failed:
+            raise ConnectionError("provider error")
+        return "ok"
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def run(caller: ResilientCaller, provider: FakeProvider, calls: int, concurrency: int, budget: float):
+    latencies = []
+    errors = 0
+
+    def one():
+        start = time.perf_counter()
+        with request_deadline(budget):
+            caller.call("llm", provider)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(one) for _ in range(calls)]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    return latencies, errors
+
+
+def report(label, latencies, errors, provider, caller):
+    stats = caller.stats().get("llm", {})
+    print(f"{label:<12} p50 {percentile(latencies, 0.50) * 1000:7.1f} ms   "
+          f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms   "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms   "
+          f"errors {errors:3d}   provider requests {provider.requests:5d}   "
+          f"hedged {stats.get('hedged', 0):4d}   hedge wins {stats.get('hedge_wins', 0):4d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--base-ms', type=float, default=20)
+    parser.add_argument('--tail-ms', type=float, default=600)
+    parser.add_argument('--tail-rate', type=float, default=0.05)
+    parser.add_argument('--budget', type=float, default=2.0, help="Request budget in seconds")
+    args = parser.parse_args()
+
+    for label, attempts in (("no hedging", 1), ("hedged", 2)):
+        provider = FakeProvider(args.base_ms, args.tail_ms, args.tail_rate)
+        caller = ResilientCaller(max_attempts=attempts, hedge_percentile=0.9, hedge_min_delay=0.0, hedge_min_samples=20)
+        latencies, errors = run(caller, provider, args.calls, args.concurrency, args.budget)
+        report(label, latencies, errors, provider, caller)
+
+    # A provider that always fails: the breaker opens and later calls skip it
+    provider = FakeProvider(args.base_ms, args.tail_ms, 0.0, failure_rate=1.0)
+    caller = ResilientCaller(max_attempts=1, failure_threshold=5, reset_seconds=60)
+    short_circuited = 0
+    for _ in range(50):
+        try:
+            caller.call("llm", provider)
+        except CircuitOpenError:
+            short_circuited += 1
+        except ConnectionError:
+            pass
+    print(f"Failing provider: 50 calls -> {provider.requests} reached the provider, "
+          f"{short_circuited} short-circuited (breaker {caller.breaker('llm').state})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark for analysis request latency with tracing off, sampled and always on.
+
+Sends /api/analyze requests through the Flask test client against a
+synthetic knowledge index (fake embeddings and a fake LLM, so no API keys
+are needed), each one a cache miss. Traces go to a JSON Lines file sink
+that also waits --sink-ms per batch, like an upload would. Modes:
+
+    off            tracing disabled
+    sampled        head sampling at --rate (plus slow and failed requests)
+    all, async     every request traced, exported by the background thread
+    all, inline    every request traced and exported before responding,
+                   like always-on synchronous tracing
+
+Usage:
+    python benchmarks/bench_tracing.py [--requests 300] [--rate 0.05] [--sink-ms 50]
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import main as server  # noqa: E402
+from backend.analysis_cache import AnalysisCache  # noqa: E402
+from backend.tracing import FileSink, TraceExporter, TraceSampler, Tracer  # noqa: E402
+from bench_preload import INGREDIENTS, synthetic_build  # noqa: E402
+
+
+class UploadSink(FileSink):
+    """File sink that also waits like a network upload."""
+
+    def __init__(self, path, delay_ms: float):
+        super().__init__(path)
+        self.delay_ms = delay_ms
+
+    def export(self, traces):
+        super().export(traces)
+        time.sleep(self.delay_ms / 1000)
+
+
+class InlineExporter(TraceExporter):
+    """Exports each trace on the request thread instead of queueing it."""
+
+    def submit(self, trace):
+        self._export([trace])
+        return True
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def run(client, requests: int, offset: int):
+    latencies = []
+    with redirect_stdout(io.StringIO()):  # The app logs every analysis
+        for i in range(requests):
+            ingredients = ", ".join(INGREDIENTS[(i + j) % len(INGREDIENTS)] for j in range(5))
+            start = time.perf_counter()
+            response = client.post('/api/analyze', json={'cereal_name': f"Bench {offset + i}", 'ingredients': ingredients})
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_json()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--rate', type=float, default=0.05, help='Head sampling rate of the sampled mode')
+    parser.add_argument('--sink-ms', type=float, default=50, help='Simulated upload time per exported batch')
+    parser.add_argument('--queue', type=int, default=1000, help='Export queue capacity')
+    parser.add_argument('--chunks', type=int, default=2000, help='Synthetic knowledge chunks indexed')
+    args = parser.parse_args()
+
+    server.apply_api_key_environment = lambda api_keys: None  # No LangSmith sink or LangChain tracing
+    server.analysis_cache = AnalysisCache(max_entries=16)  # Memory only; every request is a miss
+    server.build_pipeline = synthetic_build(args.chunks)
+    server.load_shared_state(
+        {'openai_api_key': 'sk-bench', 'langsmith_api_key': '', 'cohere_api_key': '', 'tavily_api_key': ''},
+        'ensemble'
+    )
+    client = server.app.test_client()
+    run(client, 20, offset=-20)  # Warm up
+
+    print(f"{args.requests} analyses per mode, {args.chunks} chunks, sink {args.sink_ms:.0f} ms per batch")
+    print(f"{'mode':<14} {'p50':>8} {'p95':>8} {'p99':>8} {'mean':>8} {'traced':>7} {'exported':>9} {'dropped':>8}")
+    modes = (
+        ("off", False, 0.0, TraceExporter),
+        ("sampled", True, args.rate, TraceExporter),
+        ("all, async", True, 1.0, TraceExporter),
+        ("all, inline", True, 1.0, InlineExporter),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for index, (label, enabled, rate, exporter_class) in enumerate(modes):
+            exporter = exporter_class(max_queue=args.queue, batch_size=50, flush_interval=0.5)
+            exporter.set_sink('file', UploadSink(os.path.join(tmp, f"traces-{index}.jsonl"), args.sink_ms))
+            server.tracer = Tracer(TraceSampler(rate, slow_ms=60_000), exporter, enabled=enabled)
+            latencies = run(client, args.requests, offset=index * args.requests)
+            exporter.flush()
+            stats = server.tracer.stats()
+            kept = stats['head'] + stats['slow'] + stats['error']
+            print(f"{label:<14} {percentile(latencies, 0.50) * 1000:6.2f}ms {percentile(latencies, 0.95) * 1000:6.2f}ms "
+                  f"{percentile(latencies, 0.99) * 1000:6.2f}ms {sum(latencies) / len(latencies) * 1000:6.2f}ms "
+                  f"{kept:7d} {stats['export']['exported']:9d} {stats['export']['dropped']:8d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Gunicorn configuration for the KidSafe Food Analyzer backend.
+
+Used by serve.py, or directly with `gunicorn main:app` from this
+directory. Defaults come from the SERVER_* settings in backend/config.py
+and can be overridden with environment variables:
+
+    KIDSAFE_BIND, KIDSAFE_WORKERS, KIDSAFE_THREADS, KIDSAFE_PRELOAD (0/1),
+    KIDSAFE_TIMEOUT, KIDSAFE_GRACEFUL_TIMEOUT, KIDSAFE_MAX_REQUESTS,
+    KIDSAFE_MAX_REQUESTS_JITTER
+
+With preload (the default) the master imports the app and loads the
+catalog, search index and, if OPENAI_API_KEY and LANGSMITH_API_KEY are
+set, the vector index, chunks and BM25 index before forking; workers
+share those pages copy-on-write. Background threads (job workers,
+catalog warm-up) start in each worker after the fork.
+
+Graceful reload: `kill -HUP <master pid>` starts fresh workers from the
+master and lets the old ones finish their in-flight requests (up to
+graceful_timeout). The preloaded state is kept; restart the master to
+load new code or a new index.
+"""
+
+import os
+
+from backend.config import (
+    JOBS_DB_PATH,
+    SERVER_BIND,
+    SERVER_WORKERS,
+    SERVER_THREADS,
+    SERVER_PRELOAD,
+    SERVER_TIMEOUT_SECONDS,
+    SERVER_GRACEFUL_TIMEOUT_SECONDS,
+    SERVER_MAX_REQUESTS,
+    SERVER_MAX_REQUESTS_JITTER
+)
+
+# Tells main.py it runs under this server (inherited by the workers)
+os.environ['KIDSAFE_SERVER'] = '1'
+
+bind = os.environ.get('KIDSAFE_BIND', SERVER_BIND)
+workers = int(os.environ.get('KIDSAFE_WORKERS', SERVER_WORKERS))
+worker_class = 'gthread'
+threads = int(os.environ.get('KIDSAFE_THREADS', SERVER_THREADS))
+preload_app = os.environ.get('KIDSAFE_PRELOAD', '1' if SERVER_PRELOAD else '0') == '1'
+timeout = int(os.environ.get('KIDSAFE_TIMEOUT', SERVER_TIMEOUT_SECONDS))
+graceful_timeout = int(os.environ.get('KIDSAFE_GRACEFUL_TIMEOUT', SERVER_GRACEFUL_TIMEOUT_SECONDS))
+max_requests = int(os.environ.get('KIDSAFE_MAX_REQUESTS', SERVER_MAX_REQUESTS))
+max_requests_jitter = int(os.environ.get('KIDSAFE_MAX_REQUESTS_JITTER', SERVER_MAX_REQUESTS_JITTER))
+wsgi_app = 'main:app'
+
+
+def on_starting(server):
+    """Master, before any worker exists: recover jobs and load the shared state."""
+    from backend.jobs import requeue_interrupted_jobs
+
+    requeued = requeue_interrupted_jobs(JOBS_DB_PATH)
+    if requeued:
+        server.log.info("Re-queued %d job(s) interrupted by the last shutdown", requeued)
+    if server.cfg.preload_app:
+        import main
+        main.load_shared_state(
+            main.api_keys_from_environment(),
+            os.environ.get('KIDSAFE_RETRIEVAL_STRATEGY', 'ensemble')
+        )
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        import main
+        main.before_fork()
+
+
+def post_worker_init(worker):
+    """Worker, after the app is loaded: per-process setup and background threads."""
+    import main
+    main.start_worker(workers=worker.cfg.workers, preloaded=worker.cfg.preload_app)
+
+
+def worker_exit(server, worker):
+    import main
+    main.stop_worker()
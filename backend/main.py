@@ -1,33 +1,625 @@
+import argparse
+import gc
 import os
-import csv
-from flask import Flask, render_template, jsonify, request
+import secrets
+import time
+from contextlib import contextmanager
+from flask import Flask, Response, g, render_template, jsonify, request
 from flask_cors import CORS
 
+from backend.adaptive_retrieval import adaptive_stats
+from backend.analysis_cache import AnalysisCache, make_cache_key
+from backend.catalog import ProductCatalog, choose_encoding, stream_catalog_json
+from backend.catalog_search import InvalidCursorError
+from backend.instrumentation import add_span_observer, capture, pipeline_stats, span
+from backend.metrics import (
+    registry as metrics_registry,
+    http_requests,
+    http_errors,
+    http_in_flight,
+    http_latency,
+    stage_latency
+)
+from backend.chat_sessions import ChatSession, ChatSessionStore
+from backend.chat_summary import RollingChatSummarizer
+from backend.clients import client_registry
+from backend.degradation import DegradationPolicy, track_degradation
+from backend.jobs import JobQueue
+from backend.pipeline import BuildInProgressError, PipelineHolder, PipelineSnapshot, freeze_keys
+from backend.config import (
+    CHAT_MODEL,
+    CHAT_HISTORY_MESSAGES,
+    CHAT_PROMPT_TOKEN_CAP,
+    CHAT_ANALYSIS_TOKEN_LIMIT,
+    CHAT_SUMMARY_TOKEN_LIMIT,
+    CHAT_SESSION_MAX,
+    CHAT_SESSION_TTL_SECONDS,
+    CHAT_SESSION_PATH,
+    SERVER_CHAT_SESSION_PATH,
+    ANALYSIS_CACHE_MAX_ENTRIES,
+    ANALYSIS_CACHE_PATH,
+    ADAPTIVE_RETRIEVAL_ENABLED,
+    CATALOG_SEARCH_DEFAULT_LIMIT,
+    CATALOG_SEARCH_MAX_LIMIT,
+    ADAPTIVE_QUERY_EXPANSION,
+    ANALYZE_REQUEST_BUDGET_SECONDS,
+    CHAT_REQUEST_BUDGET_SECONDS,
+    DEGRADATION_ENABLED,
+    JOBS_DB_PATH,
+    JOB_WORKERS,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BACKOFF_SECONDS,
+    JOB_RETENTION_SECONDS,
+    JOB_LONG_POLL_MAX_SECONDS,
+    JOB_MAX_BATCH_ITEMS,
+    PREWARM_CONNECTIONS_ON_CONFIGURE,
+    TENANT_HEADER,
+    TENANT_TOKEN_HEADER,
+    TENANT_MAX_REGISTERED,
+    TENANT_MAX_ACTIVE,
+    TENANT_CACHE_MAX_ENTRIES,
+    WARMUP_ON_CONFIGURE,
+    WARMUP_INTERVAL_SECONDS,
+    WARMUP_ITEM_DELAY_SECONDS,
+    WARMUP_LOCK_PATH,
+    TRACING_ENABLED,
+    TRACING_HEAD_SAMPLE_RATE,
+    TRACING_SLOW_REQUEST_MS,
+    TRACING_QUEUE_SIZE,
+    TRACING_BATCH_SIZE,
+    TRACING_FLUSH_INTERVAL_SECONDS,
+    TRACING_SHUTDOWN_FLUSH_SECONDS,
+    TRACING_FILE_PATH,
+    TRACING_LANGSMITH_PROJECT,
+    TRACING_LANGCHAIN_RUNS,
+    ADMIN_TOKEN,
+    ADMIN_TOKEN_HEADER,
+    PROFILE_HEADER,
+    PROFILE_INTERVAL_SECONDS,
+    PROFILE_DIR,
+    PROFILE_MAX_STORED,
+    BACKGROUND_PROFILER_ENABLED,
+    BACKGROUND_PROFILER_INTERVAL_SECONDS,
+    BACKGROUND_PROFILER_MAX_STACKS
+)
+from backend.tenants import TenantLimitError, TenantRegistry, TenantRuntime, UnknownTenantError
+from backend.resilience import CircuitOpenError, call_scope, model_calls, remaining_budget, request_deadline
+from backend.ingredients import get_normalizer
+from backend.rules import classify_ingredients, get_rule_engine
+from backend.single_flight import SingleFlight
+from backend.startup import pipeline_modules, profile_startup, startup_timings
+from backend.memory import MemoryReport, live_instances, qdrant_collection_memory
+from backend.profiling import BackgroundSampler, ProfileStore, RequestProfile
+from backend.tracing import FileSink, TraceExporter, TraceSampler, Tracer
+from backend.context_packing import get_token_counter
+from backend.warmup import CatalogWarmupWorker, InteractiveTraffic, ProcessLock
+
 app = Flask(__name__)
 CORS(app)
 
-# Global variables for backend components
-vector_store_manager = None
-ingredient_analyzer = None
-advanced_retrieval_manager = None
-api_keys = {}
-current_retrieval_strategy = "ensemble"  # Default to ensemble
+# Set by gunicorn.conf.py: this process is the server master or one of several workers
+SERVER_MODE = os.environ.get('KIDSAFE_SERVER') == '1'
+server_state = {'workers': 1, 'preloaded': False, 'shared_state_ms': None}
+warmup_lock = ProcessLock(WARMUP_LOCK_PATH)
+
+# Backend components built by /api/configure, swapped atomically on reconfiguration
+pipeline = PipelineHolder()
+analysis_cache = AnalysisCache(
+    max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+    persist_path=ANALYSIS_CACHE_PATH
+)
+catalog = ProductCatalog()
+interactive_traffic = InteractiveTraffic()
+analysis_flight = SingleFlight()
+degradation_policy = DegradationPolicy()
+chat_sessions = ChatSessionStore(
+    max_sessions=CHAT_SESSION_MAX,
+    ttl_seconds=CHAT_SESSION_TTL_SECONDS,
+    persist_path=CHAT_SESSION_PATH or (SERVER_CHAT_SESSION_PATH if SERVER_MODE else None),
+    shared=SERVER_MODE
+)
+
+# Sampled analysis/chat traces, exported in the background (LangSmith once keys are configured)
+tracer = Tracer(
+    TraceSampler(TRACING_HEAD_SAMPLE_RATE, TRACING_SLOW_REQUEST_MS),
+    TraceExporter(
+        max_queue=TRACING_QUEUE_SIZE,
+        batch_size=TRACING_BATCH_SIZE,
+        flush_interval=TRACING_FLUSH_INTERVAL_SECONDS
+    ),
+    enabled=TRACING_ENABLED
+)
+if TRACING_FILE_PATH:
+    tracer.exporter.set_sink('file', FileSink(TRACING_FILE_PATH))
+
+# Sampling profilers: per request on an admin's demand, and always on at a low rate
+PROFILED_ENDPOINTS = ('/api/analyze', '/api/chat')
+request_profiles = ProfileStore(PROFILE_DIR, max_entries=PROFILE_MAX_STORED)
+background_sampler = BackgroundSampler(
+    interval=BACKGROUND_PROFILER_INTERVAL_SECONDS,
+    max_stacks=BACKGROUND_PROFILER_MAX_STACKS
+)
+
+# Feed pipeline stage spans into the /metrics latency histograms
+add_span_observer(lambda record: stage_latency.observe(record['duration_ms'] / 1000, record['name']))
+
+def _cache_metrics():
+    """Hit ratio and entry count per cache, for /metrics."""
+    analysis = analysis_cache.stats()
+    verdicts = get_rule_engine().classify.cache_info()
+    verdict_lookups = verdicts.hits + verdicts.misses
+    normalized = get_normalizer().normalize.cache_info()
+    normalized_lookups = normalized.hits + normalized.misses
+    return {
+        ('analysis', 'hit_ratio'): analysis['hit_ratio'],
+        ('analysis', 'entries'): analysis['entries'],
+        ('rule_verdict', 'hit_ratio'): verdicts.hits / verdict_lookups if verdict_lookups else 0.0,
+        ('rule_verdict', 'entries'): verdicts.currsize,
+        ('ingredient_lists', 'hit_ratio'): normalized.hits / normalized_lookups if normalized_lookups else 0.0,
+        ('ingredient_lists', 'entries'): normalized.currsize,
+    }
+
+def _index_metrics():
+    """Size of the knowledge indexes, for /metrics."""
+    with pipeline.acquire() as snapshot:
+        if snapshot is None:
+            return {}
+        return {
+            ('chunks',): len(snapshot.vector_store_manager.get_chunks()),
+            ('bm25_documents',): len(snapshot.advanced_retrieval_manager.documents),
+        }
+
+metrics_registry.gauge(
+    "kidsafe_cache",
+    "Cache hit ratio and entry count by cache.",
+    _cache_metrics,
+    ("cache", "stat")
+)
+metrics_registry.gauge(
+    "kidsafe_singleflight",
+    "Analysis single-flight executions, coalesced requests and in-flight keys.",
+    lambda: {(stat,): value for stat, value in analysis_flight.stats().items()},
+    ("stat",)
+)
+metrics_registry.gauge(
+    "kidsafe_http_connections",
+    "Model client HTTP requests, newly opened connections and reuse ratio.",
+    lambda: {
+        (stat,): client_registry.stats()[stat]
+        for stat in ('requests', 'new_connections', 'reused_connections', 'connection_reuse_ratio')
+    },
+    ("stat",)
+)
+def _model_call_metrics():
+    """Call, hedge and breaker counters per model dependency, for /metrics."""
+    values = {}
+    for dependency, stats in model_calls.stats().items():
+        for stat, value in stats.items():
+            if isinstance(value, int):
+                values[(dependency, stat)] = value
+        values[(dependency, 'breaker_open')] = int(stats['breaker']['state'] == 'open')
+    return values
+
+metrics_registry.gauge(
+    "kidsafe_model_calls",
+    "Outbound model calls, hedges, failures and short-circuits by dependency.",
+    _model_call_metrics,
+    ("dependency", "stat")
+)
+metrics_registry.gauge(
+    "kidsafe_degradation",
+    "Analyses run at each retrieval degradation level.",
+    lambda: {(level,): count for level, count in degradation_policy.stats().items()},
+    ("level",)
+)
+metrics_registry.gauge(
+    "kidsafe_adaptive_retrieval",
+    "Adaptive ensemble retrievals by path taken.",
+    lambda: {(path,): count for path, count in adaptive_stats.stats()['paths'].items()},
+    ("path",)
+)
+metrics_registry.gauge(
+    "kidsafe_index_size",
+    "Number of entries in each knowledge index.",
+    _index_metrics,
+    ("index",)
+)
+def _trace_metrics():
+    """Sampling outcomes and export counters of the tracer, for /metrics."""
+    stats = tracer.stats()
+    export = stats['export']
+    return {
+        **{(stat,): stats[stat] for stat in ('requests', 'unsampled', 'head', 'slow', 'error')},
+        **{(stat,): export[stat] for stat in ('exported', 'dropped', 'export_errors', 'queued')},
+    }
+
+metrics_registry.gauge(
+    "kidsafe_traces",
+    "Traced requests by sampling outcome, and exported, dropped and queued traces.",
+    _trace_metrics,
+    ("stat",)
+)
+metrics_registry.gauge(
+    "kidsafe_tenants",
+    "Registered and active tenants, runtime builds and evictions.",
+    lambda: {
+        (stat,): tenants.stats()[stat]
+        for stat in ('registered', 'active', 'runtime_builds', 'evictions')
+    },
+    ("stat",)
+)
 
 def load_cereals():
-    """Load cereal names from the cereal.csv file."""
-    cereals = []
-    data_file = os.path.join(os.path.dirname(__file__), 'Data', 'cereal.csv')
-    
-    with open(data_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row.get('Brand_Name'):
-                cereals.append({
-                    'brand': row['Brand_Name'],
-                    'ingredients': row.get('Ingredients', '')
-                })
+    """Cereal products from the in-memory catalog (reloaded when the catalog file changes)."""
+    return catalog.products()
+
+def resolve_product(data):
+    """
+    Get the product a request refers to.
+    
+    Args:
+        data: Request object with either product_id (optionally with the
+            catalog_etag it was looked up under) or cereal_name and ingredients
+    
+    Returns:
+        Tuple of (cereal_name, ingredients); either may be missing when
+        the request names neither
     
-    return cereals
+    Raises:
+        ValueError: If product_id is not an integer or the catalog changed
+            since catalog_etag
+        LookupError: If no product has this ID
+    """
+    product_id = data.get('product_id')
+    if product_id is None:
+        return data.get('cereal_name'), data.get('ingredients')
+    if isinstance(product_id, bool) or not isinstance(product_id, int):
+        raise ValueError('product_id must be an integer')
+    snapshot = catalog.snapshot()
+    etag = data.get('catalog_etag')
+    if etag and etag != snapshot.etag:
+        raise ValueError('The catalog changed since this product was looked up; search again')
+    product = snapshot.store[product_id]  # IndexError (a LookupError) for unknown IDs
+    return product['brand'], product['ingredients']
+
+def trace_request(trace, **inputs):
+    """Hand this request's spans to the tracer when it finishes (see finish_request_metrics)."""
+    g.request_trace = trace
+    g.trace_inputs = inputs
+
+def timings_requested():
+    """Check whether the caller asked for per-stage timings (?debug=timings)."""
+    return 'timings' in request.args.get('debug', '').split(',')
+
+def is_analysis_cached(cereal_name, ingredients):
+    """Check whether an analysis is cached for the current retrieval strategy."""
+    with pipeline.acquire() as snapshot:
+        if snapshot is None:
+            return False
+        key = make_cache_key(snapshot.retrieval_strategy, cereal_name, ingredients)
+    return analysis_cache.contains(key)
+
+def request_tenant_id():
+    """Tenant named by the request header, or None for the operator's configuration."""
+    return request.headers.get(TENANT_HEADER) or None
+
+def tenant_denied_response(tenant_id):
+    """401/403 response unless the request carries the named tenant's token, or None if it does."""
+    if tenant_id is None:
+        return None
+    token = request.headers.get(TENANT_TOKEN_HEADER, '')
+    if not token:
+        return jsonify({
+            'success': False,
+            'error': f'Missing {TENANT_TOKEN_HEADER} header for tenant requests'
+        }), 401
+    if tenants.authenticate(tenant_id, token) is None:
+        # Unknown tenants and wrong tokens look alike, so IDs cannot be probed
+        return jsonify({
+            'success': False,
+            'error': 'Unknown tenant or invalid tenant token'
+        }), 403
+    return None
+
+# Classes counted by the memory report to catch objects outliving a reconfiguration
+PIPELINE_OBJECT_TYPES = (
+    'PipelineSnapshot', 'VectorStoreManager', 'AdvancedRetrievalManager',
+    'QdrantClient', 'IngredientAnalyzer', 'TenantRuntime'
+)
+
+def memory_report():
+    """
+    Measure the memory held by the knowledge indexes, caches and catalog.
+    
+    Chunks are measured first, so the Qdrant payloads, BM25 index and
+    parent docstore report what they hold beyond the shared chunk store.
+    A memory-mapped chunk store lives in the page cache, not the heap; its
+    size is reported as store_bytes.
+    
+    Returns:
+        MemoryReport.to_dict() plus pipeline object counts
+    """
+    report = MemoryReport()
+    pipeline_version = None
+    with pipeline.acquire() as snapshot:
+        if snapshot is not None:
+            pipeline_version = snapshot.version
+            manager = snapshot.advanced_retrieval_manager
+            chunks = snapshot.vector_store_manager.get_chunks()
+            chunk_stats = chunks.stats()
+            report.measure('chunks', [chunks], entries=len(chunks), entry_name='chunk',
+                           mapped=chunk_stats['mapped'], store_bytes=chunk_stats['memory_bytes'])
+            collection = qdrant_collection_memory(manager.vectorstore)
+            if collection is not None and collection['roots'] is None:
+                report.add('qdrant_collection', location='server', entries=collection['points'])
+            elif collection is not None:
+                report.measure('qdrant_collection', collection['roots'], entries=collection['points'],
+                               entry_name='point', vector_bytes=collection['vector_bytes'])
+            report.measure('retrieval_documents', [manager.documents], entries=len(manager.documents),
+                           entry_name='document')
+            bm25 = manager.bm25_index
+            if bm25 is not None:
+                report.measure('bm25_index', [bm25.vectorizer, bm25.chunks], entries=len(bm25.chunks),
+                               entry_name='document')
+            if manager.parent_docstore is not None:
+                parents = manager.parent_docstore
+                report.measure('parent_docstore', [parents.chunks], entries=len(parents), entry_name='parent')
+    report.measure('analysis_cache', analysis_cache.memory_roots(), entries=len(analysis_cache),
+                   entry_name='analysis')
+    tenant_stats = tenants.stats()
+    report.measure('tenants', tenants.memory_roots(), entries=tenant_stats['registered'], entry_name='tenant',
+                   cached_analyses=tenant_stats['cached_analyses'])
+    report.measure('chat_sessions', chat_sessions.memory_roots(), entries=chat_sessions.stats()['sessions'],
+                   entry_name='session')
+    normalizer = get_normalizer()
+    report.measure('ingredient_normalizer', [normalizer], interned=normalizer.stats()['interned'],
+                   cached_lists=normalizer.normalize.cache_info().currsize)
+    rule_engine = get_rule_engine()
+    report.measure('rule_engine', [rule_engine], cached_verdicts=rule_engine.classify.cache_info().currsize)
+    catalog_roots = catalog.memory_roots()
+    if catalog_roots:
+        report.measure('catalog', catalog_roots, entries=len(catalog_roots[0].store), entry_name='product')
+    search_index = catalog.current_search_index()
+    if search_index is not None:
+        report.measure('catalog_search_index', [search_index], entries=len(search_index), entry_name='product')
+    result = report.to_dict()
+    result['pipeline_version'] = pipeline_version
+    result['live_objects'] = live_instances(PIPELINE_OBJECT_TYPES)
+    result['frozen_objects'] = gc.get_freeze_count()  # Preloaded before fork, not in live_objects
+    return result
+
+def admin_denied_response():
+    """403 response unless the request carries the admin token, or None if it does."""
+    if not ADMIN_TOKEN:
+        return jsonify({
+            'success': False,
+            'error': 'Admin access is disabled. Set KIDSAFE_ADMIN_TOKEN to enable it.'
+        }), 403
+    if not secrets.compare_digest(request.headers.get(ADMIN_TOKEN_HEADER, ''), ADMIN_TOKEN):
+        return jsonify({
+            'success': False,
+            'error': f'Missing or invalid {ADMIN_TOKEN_HEADER} header'
+        }), 403
+    return None
+
+def profile_requested():
+    """Check whether the caller asked for a request profile (X-Profile: 1 or ?profile=1)."""
+    return request.headers.get(PROFILE_HEADER) == '1' or request.args.get('profile') == '1'
+
+@contextmanager
+def acquire_runtime(tenant_id=None):
+    """
+    Pin the current pipeline snapshot and resolve the components serving a tenant.
+    
+    Pinning keeps a concurrent reconfiguration from releasing the index
+    the request is reading. Model calls made in the context use the
+    tenant's own circuit breakers.
+    
+    Yields:
+        TenantRuntime (the operator's configuration when tenant_id is None)
+    """
+    with pipeline.acquire() as snapshot, call_scope(tenant_id):
+        if snapshot is None:
+            raise RuntimeError('System not initialized. Please configure API keys first.')
+        if tenant_id is None:
+            yield TenantRuntime(
+                tenant_id=None,
+                version=snapshot.version,
+                api_keys=snapshot.api_keys,
+                retrieval_strategy=snapshot.retrieval_strategy,
+                ingredient_analyzer=snapshot.ingredient_analyzer,
+                chat_summarizer=snapshot.chat_summarizer,
+                analysis_cache=analysis_cache
+            )
+        else:
+            yield tenants.runtime(tenant_id, snapshot)
+
+def run_cached_analysis(cereal_name, ingredients, tenant_id=None):
+    """
+    Return a cached analysis, or run the analyzer and cache the result.
+    
+    Analyses produced with a degraded retrieval plan are returned but not
+    cached, so a full analysis replaces them once load subsides.
+    
+    Returns:
+        Tuple of (analysis, cached, degradation decision or None)
+    """
+    with acquire_runtime(tenant_id) as runtime:
+        return _run_cached_analysis(runtime, cereal_name, ingredients)
+
+def _run_cached_analysis(runtime, cereal_name, ingredients):
+    """Cache lookup and coalesced analysis with a pinned runtime."""
+    analyzer = runtime.ingredient_analyzer
+    cache = runtime.analysis_cache
+    key = make_cache_key(analyzer.retrieval_strategy, cereal_name, ingredients)
+    # Tenants never share in-flight computations (each pays with its own keys)
+    flight_key = key if runtime.tenant_id is None else f"{runtime.tenant_id}:{key}"
+    with span("cache_lookup") as s:
+        analysis = cache.get(key)
+        s.set(hit=analysis is not None)
+    if analysis is not None:
+        return analysis, True, None
+    
+    def compute():
+        # Re-check: a flight for this key may have finished since our lookup
+        cached_analysis = cache.peek(key)
+        if cached_analysis is not None:
+            return cached_analysis, None
+        with track_degradation() as decision:
+            result = analyzer.analyze_ingredients(cereal_name, ingredients)
+        if decision.get('level', 'full') == 'full':
+            cache.set(key, result)
+        return result, decision or None
+    
+    # Concurrent requests for the same analysis share one computation.
+    # Waiters give up when their own request budget runs out.
+    (analysis, degradation), shared = analysis_flight.do(flight_key, compute, timeout=remaining_budget())
+    if shared:
+        print(f"Coalesced analysis request for: {cereal_name}")
+    return analysis, False, degradation
+
+def analyze_product(cereal_name, ingredients, tenant_id=None):
+    """
+    Analyze a product and open a chat session for follow-up questions.
+    
+    Returns:
+        Dictionary with the analysis, rule verdict, cache flag, session ID
+        and, for fresh analyses, the retrieval degradation report
+    """
+    # Deterministic verdict from the classification rules (microseconds)
+    rule_verdict = classify_ingredients(ingredients)
+    analysis, cached, degradation = run_cached_analysis(cereal_name, ingredients, tenant_id)
+    
+    # Open a chat session so follow-up questions only send the question
+    session = chat_sessions.create(cereal_name, ingredients, analysis, tenant_id=tenant_id)
+    
+    result = {
+        'cereal_name': cereal_name,
+        'ingredients': ingredients,
+        'analysis': analysis,
+        'rule_verdict': rule_verdict.to_dict(),
+        'cached': cached,
+        'session_id': session.session_id
+    }
+    if degradation is not None:
+        # Retrieval plan and stages that ran (absent for cached analyses)
+        result['degradation'] = degradation
+    return result
+
+def run_job(kind, payload, report_progress):
+    """Execute a queued /api/jobs job on a worker thread."""
+    if pipeline.current() is None:
+        raise RuntimeError('System not initialized. Please configure API keys first.')
+    
+    # Jobs are user-requested work: the catalog warm-up yields to them
+    with interactive_traffic.track():
+        if kind == 'analysis':
+            return analyze_product(payload['cereal_name'], payload['ingredients'], payload.get('tenant_id'))
+        
+        results = []
+        items = payload['items']
+        for index, item in enumerate(items):
+            try:
+                results.append({
+                    'success': True,
+                    **analyze_product(item['cereal_name'], item['ingredients'], payload.get('tenant_id'))
+                })
+            except Exception as e:
+                results.append({'success': False, 'cereal_name': item['cereal_name'], 'error': str(e)})
+            report_progress({'completed': index + 1, 'total': len(items)})
+        return {'results': results}
+
+job_queue = JobQueue(
+    run_job=run_job,
+    db_path=JOBS_DB_PATH,
+    workers=JOB_WORKERS,
+    max_attempts=JOB_MAX_ATTEMPTS,
+    retry_backoff=JOB_RETRY_BACKOFF_SECONDS,
+    retention_seconds=JOB_RETENTION_SECONDS,
+    requeue_running=not SERVER_MODE  # The server master requeues once, before workers start
+)
+
+warmup_worker = CatalogWarmupWorker(
+    load_catalog=load_cereals,
+    analyze=lambda cereal_name, ingredients: run_cached_analysis(cereal_name, ingredients)[0],
+    is_cached=is_analysis_cached,
+    traffic=interactive_traffic,
+    interval_seconds=WARMUP_INTERVAL_SECONDS,
+    item_delay=WARMUP_ITEM_DELAY_SECONDS
+)
+
+@app.before_request
+def start_request_metrics():
+    """Record request start time and in-flight count."""
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_started = time.perf_counter()
+    g.trace_head = tracer.head_sample()
+    http_in_flight.inc(g.metrics_endpoint)
+
+@app.after_request
+def record_response_status(response):
+    """Remember the status code (and error message) for the teardown hook."""
+    g.metrics_status = response.status_code
+    if response.status_code >= 500 and g.get('request_trace') is not None:
+        g.trace_error = (response.get_json(silent=True) or {}).get('error') or response.status
+    return response
+
+@app.before_request
+def start_request_profile():
+    """Run /api/analyze or /api/chat under the sampling profiler when an admin asks."""
+    if request.url_rule is None or request.url_rule.rule not in PROFILED_ENDPOINTS or not profile_requested():
+        return None
+    denied = admin_denied_response()
+    if denied is not None:
+        return denied
+    g.profile = RequestProfile(PROFILE_INTERVAL_SECONDS, name=f"{request.method} {request.url_rule.rule}")
+    g.profile.start()
+    return None
+
+@app.after_request
+def finish_request_profile(response):
+    """Stop the request profile, save it and add its summary to the response."""
+    profile = g.get('profile')
+    if profile is None:
+        return response
+    profile.stop()
+    request_profiles.save(profile)
+    response.headers['X-Profile-Id'] = profile.id
+    if response.is_json:
+        body = response.get_json()
+        body['profile'] = {**profile.summary(top=5), 'url': f"/api/admin/profiles/{profile.id}"}
+        response.set_data(app.json.dumps(body))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    """Record request count, errors and latency, and sample the request's trace."""
+    endpoint = g.get('metrics_endpoint')
+    if endpoint is None:
+        return
+    status = g.get('metrics_status', 500)
+    elapsed = time.perf_counter() - g.metrics_started
+    http_requests.inc(endpoint, request.method, str(status))
+    if exc is not None or status >= 500:
+        http_errors.inc(endpoint)
+    http_latency.observe(elapsed, endpoint)
+    http_in_flight.dec(endpoint)
+    trace = g.get('request_trace')
+    if trace is not None:
+        tracer.finish(
+            f"{request.method} {endpoint}",
+            trace,
+            elapsed * 1000,
+            status,
+            head_sampled=g.trace_head,
+            error=repr(exc) if exc is not None else g.get('trace_error'),
+            inputs=g.trace_inputs
+        )
+
+@app.route('/metrics')
+def metrics():
+    """Expose metrics in the Prometheus text format."""
+    return Response(metrics_registry.expose(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -37,14 +629,401 @@ def index():
 
 @app.route('/api/cereals')
 def get_cereals():
-    """API endpoint to get cereal list."""
-    cereals = load_cereals()
-    return jsonify(cereals)
+    """
+    API endpoint to get cereal list.
+    
+    Serves the catalog's precomputed JSON body (gzip/brotli when accepted)
+    and answers 304 when the client's ETag is current. Catalogs above
+    CATALOG_FULL_LIST_MAX_PRODUCTS are streamed uncompressed.
+    """
+    snapshot = catalog.snapshot()
+    if request.if_none_match.contains(snapshot.etag):
+        response = Response(status=304)
+    elif not snapshot.bodies:
+        # Too large to keep serialized: stream it from the columnar store
+        response = Response(stream_catalog_json(snapshot.store), mimetype='application/json')
+    else:
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''), snapshot.bodies)
+        response = Response(snapshot.bodies[encoding], mimetype='application/json')
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/api/cereals/search')
+def search_cereals():
+    """
+    Search the catalog with cursor pagination.
+    
+    Query parameters: q (brand prefix), mode ("prefix" or "fuzzy"),
+    ingredient / exclude (repeatable), limit and cursor.
+    """
+    mode = request.args.get('mode', 'prefix')
+    if mode not in ('prefix', 'fuzzy'):
+        return jsonify({'success': False, 'error': 'mode must be "prefix" or "fuzzy"'}), 400
+    try:
+        limit = int(request.args.get('limit', CATALOG_SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, CATALOG_SEARCH_MAX_LIMIT))
+    
+    snapshot, index = catalog.search_index()
+    try:
+        with span("catalog_search") as s:
+            hits, next_cursor = index.search(
+                query=request.args.get('q', ''),
+                fuzzy=mode == 'fuzzy',
+                ingredients=request.args.getlist('ingredient'),
+                exclude=request.args.getlist('exclude'),
+                limit=limit,
+                cursor=request.args.get('cursor') or None
+            )
+            s.set(results=len(hits))
+    except InvalidCursorError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    results = []
+    for product_id, distance in hits:
+        product = snapshot.store[product_id]
+        result = {'id': product_id, 'brand': product['brand'], 'ingredients': product['ingredients']}
+        if distance is not None:
+            result['distance'] = distance
+        results.append(result)
+    return jsonify({
+        'success': True,
+        'catalog_etag': snapshot.etag,
+        'mode': mode,
+        'results': results,
+        'next_cursor': next_cursor
+    })
+
+def select_retriever(manager, retrieval_strategy, cohere_api_key):
+    """
+    Build the retriever for a strategy.
+    
+    Returns:
+        Tuple of (retriever, effective strategy name)
+    """
+    print(f"Selecting retrieval strategy: {retrieval_strategy}")
+    if retrieval_strategy == 'naive':
+        retriever = manager.get_naive_retriever(k=5)
+    elif retrieval_strategy == 'bm25':
+        retriever = manager.get_bm25_retriever(k=5)
+    elif retrieval_strategy == 'multi_query':
+        retriever = manager.get_multi_query_retriever(k=5)
+    elif retrieval_strategy == 'compression':
+        retriever = manager.get_compression_retriever(k=10, top_n=5)
+        if retriever is None:
+            # Fall back to naive if compression unavailable
+            print("Compression unavailable, falling back to naive")
+            retriever = manager.get_naive_retriever(k=5)
+            retrieval_strategy = 'naive'
+    else:
+        # Ensemble (also the default for unknown strategies)
+        retriever = manager.get_ensemble_retriever(
+            k=5,
+            use_compression=bool(cohere_api_key),
+            adaptive=ADAPTIVE_RETRIEVAL_ENABLED,
+            # The extra LLM call is only made when the degradation policy can withdraw it under load
+            use_expansion=ADAPTIVE_QUERY_EXPANSION and DEGRADATION_ENABLED
+        )
+    
+    if DEGRADATION_ENABLED:
+        # Drop expensive retrieval stages under load or a tight budget
+        retriever = manager.get_degrading_retriever(
+            retriever,
+            strategy=retrieval_strategy,
+            policy=degradation_policy,
+            queue_depth=analysis_flight.in_flight
+        )
+    return retriever, retrieval_strategy
+
+def make_chat_summarizer(openai_api_key):
+    """Rolling chat summarizer whose summaries are written with the given key."""
+    return RollingChatSummarizer(
+        llm=client_registry.chat_model(api_key=openai_api_key, model=CHAT_MODEL, temperature=0),
+        prompt_token_cap=CHAT_PROMPT_TOKEN_CAP,
+        recent_messages=CHAT_HISTORY_MESSAGES,
+        analysis_token_limit=CHAT_ANALYSIS_TOKEN_LIMIT,
+        summary_token_limit=CHAT_SUMMARY_TOKEN_LIMIT
+    )
+
+def build_pipeline(version, api_keys, retrieval_strategy, report_progress):
+    """
+    Build a complete pipeline snapshot (runs on the background build thread).
+    
+    Returns:
+        PipelineSnapshot ready to publish
+    """
+    from backend.vector_store import VectorStoreManager
+    from backend.rag_engine import IngredientAnalyzer
+    from backend.advanced_retrieval import AdvancedRetrievalManager
+    
+    # Open the provider connections while the index is being built
+    if PREWARM_CONNECTIONS_ON_CONFIGURE:
+        report_progress('prewarm', 0.02)
+        client_registry.prewarm(include_cohere=bool(api_keys['cohere_api_key']))
+    
+    report_progress('indexing', 0.05)
+    print("Initializing vector store...")
+    vector_store_manager = VectorStoreManager(api_keys['openai_api_key'])
+    vectorstore = vector_store_manager.load_and_index_documents()
+    chunks = vector_store_manager.get_chunks()
+    
+    report_progress('retrievers', 0.8)
+    print("Initializing advanced retrieval manager...")
+    advanced_retrieval_manager = AdvancedRetrievalManager(
+        vectorstore=vectorstore,
+        documents=chunks,
+        openai_api_key=api_keys['openai_api_key'],
+        cohere_api_key=api_keys['cohere_api_key'] or None
+    )
+    retriever, retrieval_strategy = select_retriever(
+        advanced_retrieval_manager, retrieval_strategy, api_keys['cohere_api_key']
+    )
+    
+    report_progress('analyzer', 0.9)
+    print("Initializing ingredient analyzer...")
+    ingredient_analyzer = IngredientAnalyzer(
+        retriever, 
+        api_keys['openai_api_key'],
+        retrieval_strategy=retrieval_strategy
+    )
+    
+    print("Initializing chat summarizer...")
+    chat_summarizer = make_chat_summarizer(api_keys['openai_api_key'])
+    
+    return PipelineSnapshot(
+        version=version,
+        api_keys=freeze_keys(api_keys),
+        retrieval_strategy=retrieval_strategy,
+        vector_store_manager=vector_store_manager,
+        advanced_retrieval_manager=advanced_retrieval_manager,
+        ingredient_analyzer=ingredient_analyzer,
+        chat_summarizer=chat_summarizer
+    )
+
+def on_pipeline_published(snapshot):
+    """Point process-wide settings at the new snapshot and resume background work."""
+    apply_api_key_environment(snapshot.api_keys)
+    start_background_work()
+
+def apply_api_key_environment(api_keys):
+    """Export the operator's keys for libraries that read them from the environment."""
+    os.environ['OPENAI_API_KEY'] = api_keys['openai_api_key']
+    os.environ['LANGCHAIN_API_KEY'] = api_keys['langsmith_api_key']
+    os.environ['LANGCHAIN_PROJECT'] = TRACING_LANGSMITH_PROJECT
+    
+    # LangChain's own tracing uploads every run of every request; by default
+    # only the tracer's sampled traces go to LangSmith, from a background thread
+    os.environ['LANGCHAIN_TRACING_V2'] = 'true' if TRACING_LANGCHAIN_RUNS else 'false'
+    tracer.configure_langsmith(api_keys['langsmith_api_key'], TRACING_LANGSMITH_PROJECT)
+    
+    if api_keys['cohere_api_key']:
+        os.environ['COHERE_API_KEY'] = api_keys['cohere_api_key']
+    
+    if api_keys['tavily_api_key']:
+        os.environ['TAVILY_API_KEY'] = api_keys['tavily_api_key']
+
+def start_background_work():
+    """Start the job workers and (in one process only) the catalog warm-up."""
+    # Run queued /api/jobs work (including jobs persisted before a restart)
+    job_queue.start()
+    
+    # Aggregate hot-path statistics for /api/admin/profile/background
+    if BACKGROUND_PROFILER_ENABLED:
+        background_sampler.start()
+    
+    # Precompute catalog analyses in the background
+    if WARMUP_ON_CONFIGURE and warmup_lock.acquire():
+        warmup_worker.start()
+
+def api_keys_from_environment():
+    """
+    Operator API keys for building the pipeline at server start.
+    
+    Returns:
+        Keys dictionary as accepted by /api/configure, or None unless
+        OPENAI_API_KEY and LANGSMITH_API_KEY are set
+    """
+    api_keys = {
+        'openai_api_key': os.environ.get('OPENAI_API_KEY', ''),
+        'langsmith_api_key': os.environ.get('LANGSMITH_API_KEY') or os.environ.get('LANGCHAIN_API_KEY', ''),
+        'cohere_api_key': os.environ.get('COHERE_API_KEY', ''),
+        'tavily_api_key': os.environ.get('TAVILY_API_KEY', '')
+    }
+    if not (api_keys['openai_api_key'] and api_keys['langsmith_api_key']):
+        return None
+    return api_keys
+
+def warm_up(retrieval_strategy='ensemble', rerank=False):
+    """
+    Load the in-process indexes and import a strategy's pipeline modules.
+    
+    Everything here otherwise happens on the first request that needs
+    it (or in the first /api/configure build). Each step is timed once,
+    on its cold run, in startup_timings.
+    
+    Args:
+        retrieval_strategy: Strategy whose dependencies are imported
+        rerank: Also import the Cohere reranker
+    """
+    with startup_timings.step('catalog'):
+        catalog.snapshot()
+    with startup_timings.step('catalog search index'):
+        catalog.search_index()
+    with startup_timings.step('ingredient normalizer'):
+        get_normalizer()
+    with startup_timings.step('rule engine'):
+        get_rule_engine()
+    with startup_timings.step('token encoding'):
+        get_token_counter()
+    for module in pipeline_modules(retrieval_strategy, rerank):
+        startup_timings.import_module(module)
+
+def load_shared_state(api_keys=None, retrieval_strategy='ensemble'):
+    """
+    Load the read-only state every request uses.
+    
+    The production server calls this in the master before forking, so
+    workers share the catalog, search index, vector index, chunks and
+    BM25 matrices copy-on-write instead of each building its own.
+    No threads are started here; see start_worker().
+    
+    Args:
+        api_keys: Operator keys to build the pipeline with (None to
+            leave it for /api/configure)
+        retrieval_strategy: Retrieval strategy of the pipeline
+    
+    Raises:
+        RuntimeError: If the pipeline build fails
+    """
+    start = time.perf_counter()
+    warm_up(retrieval_strategy, rerank=bool(api_keys and api_keys['cohere_api_key']))
+    if api_keys is not None:
+        pipeline.start_build(
+            lambda version, report_progress: build_pipeline(version, api_keys, retrieval_strategy, report_progress)
+        )
+        build = pipeline.wait_for_build()
+        if build['state'] != 'ready':
+            raise RuntimeError(f"Pipeline build failed: {build.get('error')}")
+        snapshot = pipeline.current()
+        snapshot.advanced_retrieval_manager.preload()
+        apply_api_key_environment(snapshot.api_keys)
+    # Objects that exist now live as long as the process: keep the
+    # collector from touching them (writing their headers would copy the
+    # pages a forked worker shares with the master)
+    gc.collect()
+    gc.freeze()
+    server_state['shared_state_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    print(f"Loaded shared state in {server_state['shared_state_ms']} ms")
+
+def before_fork():
+    """Called in the server master before each worker is forked."""
+    client_registry.close_connections()
+
+def start_worker(workers, preloaded):
+    """
+    Set up a server worker process once the app is loaded in it.
+    
+    Args:
+        workers: Number of worker processes the server runs
+        preloaded: The shared state was loaded in the master before fork
+    """
+    server_state.update(workers=workers, preloaded=preloaded)
+    if preloaded:
+        # SQLite connections opened by the master must not be used across fork
+        job_queue.reopen()
+        analysis_cache.reopen()
+        chat_sessions.reopen()
+    else:
+        load_shared_state(api_keys_from_environment(), os.environ.get('KIDSAFE_RETRIEVAL_STRATEGY', 'ensemble'))
+    if pipeline.current() is not None:
+        start_background_work()
+
+def stop_worker():
+    """Called when a server worker exits (shutdown, reload or recycling)."""
+    warmup_worker.stop()
+    job_queue.stop(requeue=True)
+    tracer.exporter.flush(timeout=TRACING_SHUTDOWN_FLUSH_SECONDS)
+    background_sampler.stop()
+
+def per_process_change_response(action):
+    """
+    409 response for a change that would reach only one of several workers.
+    
+    Returns:
+        Flask response tuple, or None when the server runs one process
+    """
+    if server_state['workers'] <= 1:
+        return None
+    return jsonify({
+        'success': False,
+        'error': f"{action} is unavailable with {server_state['workers']} server workers: "
+                 f"it would only change the worker handling this request. "
+                 f"Set the keys in the server environment, or run a single worker."
+    }), 409
+
+def build_tenant_runtime(tenant, snapshot):
+    """
+    Build a tenant's analyzer and chat summarizer on the shared index.
+    
+    Nothing is re-embedded: the tenant's retrievers reuse the snapshot's
+    vector store and BM25 index with model clients on the tenant's keys.
+    
+    Returns:
+        TenantRuntime for the snapshot's version
+    """
+    from backend.rag_engine import IngredientAnalyzer
+    
+    keys = tenant.api_keys
+    cohere_api_key = keys.get('cohere_api_key') or None
+    print(f"Building runtime for tenant {tenant.tenant_id} on pipeline version {snapshot.version}")
+    manager = snapshot.advanced_retrieval_manager.for_tenant(keys['openai_api_key'], cohere_api_key)
+    retriever, retrieval_strategy = select_retriever(manager, tenant.retrieval_strategy, cohere_api_key)
+    return TenantRuntime(
+        tenant_id=tenant.tenant_id,
+        version=snapshot.version,
+        api_keys=keys,
+        retrieval_strategy=retrieval_strategy,
+        ingredient_analyzer=IngredientAnalyzer(
+            retriever,
+            keys['openai_api_key'],
+            retrieval_strategy=retrieval_strategy
+        ),
+        chat_summarizer=make_chat_summarizer(keys['openai_api_key']),
+        analysis_cache=AnalysisCache(max_entries=TENANT_CACHE_MAX_ENTRIES)
+    )
+
+def release_tenant_clients(api_keys):
+    """Drop the model clients of an evicted tenant (unless the operator uses the same key)."""
+    snapshot = pipeline.current()
+    in_use = set(snapshot.api_keys.values()) if snapshot is not None else set()
+    for api_key in api_keys:
+        if api_key not in in_use:
+            client_registry.discard(api_key)
+
+tenants = TenantRegistry(
+    build_runtime=build_tenant_runtime,
+    max_registered=TENANT_MAX_REGISTERED,
+    max_active=TENANT_MAX_ACTIVE,
+    release_keys=release_tenant_clients
+)
 
 @app.route('/api/configure', methods=['POST'])
 def configure_api_keys():
-    """Configure API keys and initialize the RAG system."""
-    global vector_store_manager, ingredient_analyzer, advanced_retrieval_manager, api_keys, current_retrieval_strategy
+    """
+    Configure API keys and build the RAG system in the background.
+    
+    Returns 202 immediately; progress is reported by /api/status under
+    'pipeline'. Requests keep using the previous configuration until the
+    new one is published. Send "wait": true to block until the build ends.
+    """
+    rejected = per_process_change_response('Configuring API keys at runtime')
+    if rejected is not None:
+        return rejected
     
     try:
         data = request.get_json()
@@ -59,7 +1038,6 @@ def configure_api_keys():
                 'error': f'Missing required API keys: {", ".join(missing_keys)}'
             }), 400
         
-        # Store API keys
         api_keys = {
             'openai_api_key': data['openai_api_key'],
             'langsmith_api_key': data['langsmith_api_key'],
@@ -69,75 +1047,38 @@ def configure_api_keys():
         
         # Get retrieval strategy from request (default to ensemble)
         retrieval_strategy = data.get('retrieval_strategy', 'ensemble')
-        current_retrieval_strategy = retrieval_strategy
         
-        # Set environment variables for LangSmith tracing
-        os.environ['OPENAI_API_KEY'] = api_keys['openai_api_key']
-        os.environ['LANGCHAIN_API_KEY'] = api_keys['langsmith_api_key']
-        os.environ['LANGCHAIN_TRACING_V2'] = 'true'
-        os.environ['LANGCHAIN_PROJECT'] = 'KidSafe-Food-Analyzer'
-        
-        if api_keys['cohere_api_key']:
-            os.environ['COHERE_API_KEY'] = api_keys['cohere_api_key']
-        
-        if api_keys['tavily_api_key']:
-            os.environ['TAVILY_API_KEY'] = api_keys['tavily_api_key']
-        
-        # Initialize vector store and RAG system
-        from backend.vector_store import VectorStoreManager
-        from backend.rag_engine import IngredientAnalyzer
-        from backend.advanced_retrieval import AdvancedRetrievalManager
-        
-        print("Initializing vector store...")
-        vector_store_manager = VectorStoreManager(api_keys['openai_api_key'])
-        vectorstore = vector_store_manager.load_and_index_documents()
-        chunks = vector_store_manager.get_chunks()
-        
-        print("Initializing advanced retrieval manager...")
-        advanced_retrieval_manager = AdvancedRetrievalManager(
-            vectorstore=vectorstore,
-            documents=chunks,
-            openai_api_key=api_keys['openai_api_key'],
-            cohere_api_key=api_keys['cohere_api_key'] if api_keys['cohere_api_key'] else None
-        )
-        
-        # Select retriever based on strategy
-        print(f"Selecting retrieval strategy: {retrieval_strategy}")
-        if retrieval_strategy == 'naive':
-            retriever = advanced_retrieval_manager.get_naive_retriever(k=5)
-        elif retrieval_strategy == 'bm25':
-            retriever = advanced_retrieval_manager.get_bm25_retriever(k=5)
-        elif retrieval_strategy == 'multi_query':
-            retriever = advanced_retrieval_manager.get_multi_query_retriever(k=5)
-        elif retrieval_strategy == 'compression':
-            retriever = advanced_retrieval_manager.get_compression_retriever(k=10, top_n=5)
-            if retriever is None:
-                # Fall back to naive if compression unavailable
-                print("Compression unavailable, falling back to naive")
-                retriever = advanced_retrieval_manager.get_naive_retriever(k=5)
-                retrieval_strategy = 'naive'
-        elif retrieval_strategy == 'ensemble':
-            use_compression = bool(api_keys['cohere_api_key'])
-            retriever = advanced_retrieval_manager.get_ensemble_retriever(k=5, use_compression=use_compression)
-        else:
-            # Default to ensemble
-            use_compression = bool(api_keys['cohere_api_key'])
-            retriever = advanced_retrieval_manager.get_ensemble_retriever(k=5, use_compression=use_compression)
-        
-        print("Initializing ingredient analyzer...")
-        ingredient_analyzer = IngredientAnalyzer(
-            retriever, 
-            api_keys['openai_api_key'],
-            retrieval_strategy=retrieval_strategy
-        )
+        try:
+            version = pipeline.start_build(
+                lambda version, report_progress: build_pipeline(version, api_keys, retrieval_strategy, report_progress),
+                on_published=on_pipeline_published
+            )
+        except BuildInProgressError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'pipeline': pipeline.status()
+            }), 409
         
-        message = f'API keys configured and RAG system initialized with {retrieval_strategy} retrieval!'
+        if data.get('wait'):
+            build = pipeline.wait_for_build()
+            if build['state'] != 'ready':
+                return jsonify({'success': False, 'error': build.get('error'), 'pipeline': pipeline.status()}), 500
+            snapshot = pipeline.current()
+            return jsonify({
+                'success': True,
+                'message': f'API keys configured and RAG system initialized with {snapshot.retrieval_strategy} retrieval!',
+                'retrieval_strategy': snapshot.retrieval_strategy,
+                'version': snapshot.version
+            })
         
         return jsonify({
             'success': True,
-            'message': message,
-            'retrieval_strategy': retrieval_strategy
-        })
+            'message': f'Building RAG system with {retrieval_strategy} retrieval...',
+            'retrieval_strategy': retrieval_strategy,
+            'version': version,
+            'status_url': '/api/status'
+        }), 202
         
     except Exception as e:
         import traceback
@@ -150,71 +1091,431 @@ def configure_api_keys():
 @app.route('/api/analyze', methods=['POST'])
 def analyze_ingredients():
     """Analyze ingredients for a cereal product."""
-    global ingredient_analyzer
-    
     try:
         # Check if system is initialized
-        if ingredient_analyzer is None:
+        if pipeline.current() is None:
             return jsonify({
                 'success': False,
                 'error': 'System not initialized. Please configure API keys first.'
             }), 400
         
         data = request.get_json()
-        cereal_name = data.get('cereal_name')
-        ingredients = data.get('ingredients')
+        try:
+            cereal_name, ingredients = resolve_product(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except LookupError as e:
+            return jsonify({'success': False, 'error': str(e)}), 404
         
         if not cereal_name or not ingredients:
             return jsonify({
                 'success': False,
-                'error': 'Missing cereal_name or ingredients'
+                'error': 'Missing product_id, or cereal_name and ingredients'
             }), 400
         
+        tenant_id = request_tenant_id()
+        denied = tenant_denied_response(tenant_id)
+        if denied is not None:
+            return denied
+        
         print(f"Analyzing ingredients for: {cereal_name}")
         
-        # Perform analysis
-        analysis = ingredient_analyzer.analyze_ingredients(cereal_name, ingredients)
+        # Perform analysis (served from cache when available)
+        with interactive_traffic.track(), capture() as trace, request_deadline(ANALYZE_REQUEST_BUDGET_SECONDS):
+            trace_request(trace, cereal_name=cereal_name, tenant_id=tenant_id)
+            result = analyze_product(cereal_name, ingredients, tenant_id)
         
-        return jsonify({
-            'success': True,
-            'cereal_name': cereal_name,
-            'ingredients': ingredients,
-            'analysis': analysis
-        })
+        response = {'success': True, **result}
+        if timings_requested():
+            response['timings'] = trace.summary()
+        return jsonify(response)
         
+    except TimeoutError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Analysis timed out: {e}'
+        }), 504
+    except CircuitOpenError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Model provider unavailable: {e}'
+        }), 503
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/verdict', methods=['POST'])
+def rule_verdict():
+    """Return the rule-based verdict for an ingredient list without calling the LLM."""
+    data = request.get_json()
+    ingredients = data.get('ingredients') if data else None
+    
+    if not ingredients:
+        return jsonify({
+            'success': False,
+            'error': 'Missing ingredients'
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'cereal_name': data.get('cereal_name'),
+        'rule_verdict': classify_ingredients(ingredients).to_dict()
+    })
+
 @app.route('/api/status')
 def get_status():
     """Check if the RAG system is initialized."""
+    snapshot = pipeline.current()
+    status = {
+        'initialized': snapshot is not None,
+        'has_api_keys': snapshot is not None and bool(snapshot.api_keys),
+        'pipeline': pipeline.status()
+    }
+    if snapshot is not None:
+        status['context_packing'] = snapshot.ingredient_analyzer.context_packer.stats()
+        status['chat_summary'] = snapshot.chat_summarizer.stats()
+    status['http_clients'] = client_registry.stats()
+    status['model_calls'] = model_calls.stats()
+    status['degradation'] = degradation_policy.stats()
+    status['adaptive_retrieval'] = adaptive_stats.stats()
+    status['jobs'] = job_queue.stats()
+    status['tenants'] = tenants.stats()
+    status['catalog'] = catalog.stats()
+    status['ingredients'] = get_normalizer().stats()
+    status['tracing'] = tracer.stats()
+    status['profiling'] = background_sampler.stats()
+    status['server'] = {'pid': os.getpid(), 'warmup_owner': warmup_lock.held, **server_state}
+    return jsonify(status)
+
+@app.route('/api/timings')
+def get_timings():
+    """Report per-stage latency, token and cost aggregates since startup."""
+    return jsonify({
+        'enabled': pipeline_stats.enabled,
+        'stages': pipeline_stats.snapshot()
+    })
+
+@app.route('/api/admin/profiles')
+def list_request_profiles():
+    """List saved request profiles, newest first."""
+    denied = admin_denied_response()
+    if denied is not None:
+        return denied
+    return jsonify({'success': True, 'profiles': request_profiles.list()})
+
+@app.route('/api/admin/profiles/<profile_id>')
+def get_request_profile(profile_id):
+    """Download a request profile in collapsed-stack format (flamegraph.pl, speedscope)."""
+    denied = admin_denied_response()
+    if denied is not None:
+        return denied
+    path = request_profiles.path(profile_id)
+    if path is None:
+        return jsonify({'success': False, 'error': f'Profile not found: {profile_id}'}), 404
+    with open(path, encoding='utf-8') as f:
+        folded = f.read()
+    return Response(folded, mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename="{profile_id}.folded"'
+    })
+
+@app.route('/api/admin/profile/background', methods=['GET', 'DELETE'])
+def background_profile():
+    """
+    Hot-path statistics from the background sampler of the answering process.
+    
+    GET returns the hottest functions (?top=N), or every stack in
+    collapsed-stack format with ?format=folded. DELETE starts a new
+    aggregation period.
+    """
+    denied = admin_denied_response()
+    if denied is not None:
+        return denied
+    if request.method == 'DELETE':
+        background_sampler.reset()
+        return jsonify({'success': True, **background_sampler.stats()})
+    if request.args.get('format') == 'folded':
+        return Response(background_sampler.folded(), mimetype='text/plain')
+    try:
+        top = max(1, int(request.args.get('top', 20)))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'top must be an integer'}), 400
+    return jsonify({'success': True, **background_sampler.stats(top=top)})
+
+@app.route('/api/admin/memory')
+def get_memory_report():
+    """Report memory held by each index, cache and chunk store in the answering process."""
+    denied = admin_denied_response()
+    if denied is not None:
+        return denied
+    if request.args.get('gc') == '1':
+        gc.collect()  # Count only objects that are still reachable
+    return jsonify({'success': True, 'pid': os.getpid(), **memory_report()})
+
+@app.route('/api/catalog/warmup', methods=['GET', 'POST'])
+def catalog_warmup():
+    """Start the catalog warm-up (POST) or report its progress (GET)."""
+    if request.method == 'POST':
+        if pipeline.current() is None:
+            return jsonify({
+                'success': False,
+                'error': 'System not initialized. Please configure API keys first.'
+            }), 400
+        warmup_worker.start()
+    
+    return jsonify({
+        'success': True,
+        'progress': warmup_worker.progress(),
+        'cache': analysis_cache.stats(),
+        'coalescing': analysis_flight.stats()
+    })
+
+@app.route('/api/warmup', methods=['GET', 'POST'])
+def warmup():
+    """
+    Import a strategy's dependencies and load the in-process indexes (POST),
+    or report the startup step timings (GET).
+    
+    POST takes optional "retrieval_strategy" and "rerank"; both default to
+    the current configuration (ensemble without rerank before one exists).
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        snapshot = pipeline.current()
+        retrieval_strategy = data.get('retrieval_strategy') or (
+            snapshot.retrieval_strategy if snapshot is not None else 'ensemble'
+        )
+        rerank = data.get('rerank')
+        if rerank is None:
+            rerank = snapshot is not None and bool(snapshot.api_keys['cohere_api_key'])
+        start = time.perf_counter()
+        try:
+            warm_up(retrieval_strategy, rerank=bool(rerank))
+        except ImportError as e:
+            return jsonify({'success': False, 'error': f'Missing dependency: {e}'}), 500
+        return jsonify({
+            'success': True,
+            'retrieval_strategy': retrieval_strategy,
+            'rerank': bool(rerank),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+            'steps': startup_timings.snapshot()
+        })
+    
+    return jsonify({'success': True, 'steps': startup_timings.snapshot()})
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue an analysis (or a batch of analyses) and return a job ID."""
+    if pipeline.current() is None:
+        return jsonify({
+            'success': False,
+            'error': 'System not initialized. Please configure API keys first.'
+        }), 400
+    
+    tenant_id = request_tenant_id()
+    denied = tenant_denied_response(tenant_id)
+    if denied is not None:
+        return denied
+    
+    data = request.get_json() or {}
+    try:
+        priority = int(data.get('priority', 0))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'priority must be an integer'}), 400
+    
+    if 'items' in data:
+        items = data.get('items') or []
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'error': 'items must be a non-empty list'}), 400
+        if len(items) > JOB_MAX_BATCH_ITEMS:
+            return jsonify({
+                'success': False,
+                'error': f'A batch can hold at most {JOB_MAX_BATCH_ITEMS} items'
+            }), 400
+        if not all(isinstance(item, dict) for item in items):
+            return jsonify({'success': False, 'error': 'Every item must be an object'}), 400
+        try:
+            # Resolve product IDs now: jobs outlive catalog reloads
+            products = [resolve_product(item) for item in items]
+        except (ValueError, LookupError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if not all(name and ingredients for name, ingredients in products):
+            return jsonify({
+                'success': False,
+                'error': 'Every item needs product_id, or cereal_name and ingredients'
+            }), 400
+        kind = 'batch'
+        payload = {'items': [{'cereal_name': name, 'ingredients': ingredients} for name, ingredients in products]}
+    else:
+        try:
+            cereal_name, ingredients = resolve_product(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except LookupError as e:
+            return jsonify({'success': False, 'error': str(e)}), 404
+        if not cereal_name or not ingredients:
+            return jsonify({'success': False, 'error': 'Missing product_id, or cereal_name and ingredients'}), 400
+        kind = 'analysis'
+        payload = {'cereal_name': cereal_name, 'ingredients': ingredients}
+    
+    if tenant_id is not None:
+        payload['tenant_id'] = tenant_id
+    job_id = job_queue.submit(kind, payload, priority=priority, tenant_id=tenant_id)
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}',
+        'result_url': f'/api/jobs/{job_id}/result'
+    }), 202
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Report a job's status; ?wait=N long-polls up to N seconds for completion."""
+    try:
+        wait = min(float(request.args.get('wait', 0)), JOB_LONG_POLL_MAX_SECONDS)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'wait must be a number of seconds'}), 400
+    
+    tenant_id = request_tenant_id()
+    denied = tenant_denied_response(tenant_id)
+    if denied is not None:
+        return denied
+    
+    # Jobs of other tenants are reported as not found
+    if wait > 0:
+        job = job_queue.wait(job_id, wait, include_result=False, tenant_id=tenant_id)
+    else:
+        job = job_queue.get(job_id, include_result=False, tenant_id=tenant_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, **job})
+
+@app.route('/api/jobs/<job_id>/result')
+def get_job_result(job_id):
+    """Return a finished job's result (202 while it is still queued or running)."""
+    tenant_id = request_tenant_id()
+    denied = tenant_denied_response(tenant_id)
+    if denied is not None:
+        return denied
+    
+    job = job_queue.get(job_id, tenant_id=tenant_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if job['status'] == 'succeeded':
+        return jsonify({'success': True, 'job_id': job_id, 'result': job['result']})
+    if job['status'] == 'failed':
+        return jsonify({'success': False, 'job_id': job_id, 'status': 'failed', 'error': job['error']}), 500
+    return jsonify({'success': True, 'job_id': job_id, 'status': job['status']}), 202
+
+@app.route('/api/tenants', methods=['GET', 'POST'])
+def tenant_registry():
+    """Register a tenant's API keys (POST, admin) or report tenant statistics (GET)."""
+    if request.method == 'GET':
+        return jsonify({'success': True, **tenants.stats()})
+    
+    denied = admin_denied_response()
+    if denied is not None:
+        return denied
+    rejected = per_process_change_response('Registering tenants')
+    if rejected is not None:
+        return rejected
+    
+    data = request.get_json() or {}
+    if 'tenant_id' in data:
+        return jsonify({
+            'success': False,
+            'error': 'Tenant IDs are assigned by the server; use PUT /api/tenants/<tenant_id> to update a tenant'
+        }), 400
+    if not data.get('openai_api_key'):
+        return jsonify({
+            'success': False,
+            'error': 'Missing required API keys: openai_api_key'
+        }), 400
+    
+    try:
+        tenant, token = tenants.register(
+            {
+                'openai_api_key': data['openai_api_key'],
+                'cohere_api_key': data.get('cohere_api_key', '')
+            },
+            retrieval_strategy=data.get('retrieval_strategy', 'ensemble')
+        )
+    except TenantLimitError as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    
     return jsonify({
-        'initialized': ingredient_analyzer is not None,
-        'has_api_keys': bool(api_keys)
+        'success': True,
+        'tenant_id': tenant.tenant_id,
+        'tenant_token': token,
+        'retrieval_strategy': tenant.retrieval_strategy,
+        'header': TENANT_HEADER,
+        'token_header': TENANT_TOKEN_HEADER
+    }), 201
+
+@app.route('/api/tenants/<tenant_id>', methods=['PUT'])
+def update_tenant(tenant_id):
+    """Replace a tenant's API keys and/or retrieval strategy (admin)."""
+    denied = admin_denied_response()
+    if denied is not None:
+        return denied
+    rejected = per_process_change_response('Updating tenants')
+    if rejected is not None:
+        return rejected
+    
+    data = request.get_json() or {}
+    api_keys = None
+    if 'openai_api_key' in data or 'cohere_api_key' in data:
+        if not data.get('openai_api_key'):
+            return jsonify({
+                'success': False,
+                'error': 'Missing required API keys: openai_api_key'
+            }), 400
+        api_keys = {
+            'openai_api_key': data['openai_api_key'],
+            'cohere_api_key': data.get('cohere_api_key', '')
+        }
+    try:
+        tenant = tenants.update(tenant_id, api_keys, data.get('retrieval_strategy'))
+    except UnknownTenantError:
+        return jsonify({'success': False, 'error': 'Tenant not found'}), 404
+    if api_keys is not None:
+        model_calls.forget_scope(tenant_id)  # New keys start with closed breakers
+    return jsonify({
+        'success': True,
+        'tenant_id': tenant.tenant_id,
+        'retrieval_strategy': tenant.retrieval_strategy
     })
 
+@app.route('/api/tenants/<tenant_id>', methods=['DELETE'])
+def remove_tenant(tenant_id):
+    """Unregister a tenant and drop its clients and cache (admin)."""
+    denied = admin_denied_response()
+    if denied is not None:
+        return denied
+    rejected = per_process_change_response('Removing tenants')
+    if rejected is not None:
+        return rejected
+    if not tenants.remove(tenant_id):
+        return jsonify({'success': False, 'error': 'Tenant not found'}), 404
+    model_calls.forget_scope(tenant_id)
+    return jsonify({'success': True, 'tenant_id': tenant_id})
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chatbot questions about ingredients."""
-    global ingredient_analyzer
-    
     try:
         # Check if system is initialized
-        if ingredient_analyzer is None:
+        if pipeline.current() is None:
             return jsonify({
                 'success': False,
                 'error': 'System not initialized. Please configure API keys first.'
             }), 400
         
         data = request.get_json()
-        cereal_name = data.get('cereal_name')
-        ingredients = data.get('ingredients')
         question = data.get('question')
-        previous_analysis = data.get('previous_analysis', '')
-        chat_history = data.get('chat_history', [])
+        session_id = data.get('session_id')
         
         if not question:
             return jsonify({
@@ -222,68 +1523,80 @@ def chat():
                 'error': 'Missing question'
             }), 400
         
-        print(f"Chat question for {cereal_name}: {question}")
-        
-        # Import ChatOpenAI
-        from langchain_openai import ChatOpenAI
-        from langchain_core.prompts import ChatPromptTemplate
-        
-        # Create chat LLM
-        chat_llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            api_key=api_keys['openai_api_key'],
-            temperature=0.7
-        )
+        tenant_id = request_tenant_id()
+        denied = tenant_denied_response(tenant_id)
+        if denied is not None:
+            return denied
         
-        # Build conversation context
-        history_text = ""
-        if len(chat_history) > 1:  # More than just the initial greeting
-            history_text = "\n\nPrevious conversation:\n"
-            for msg in chat_history[-4:]:  # Last 4 messages for context
-                role = msg.get('role', 'user')
-                content = msg.get('content', '')
-                if role == 'user':
-                    history_text += f"User: {content}\n"
-                else:
-                    history_text += f"Assistant: {content}\n"
+        if session_id:
+            # Server-side session: the client only sends the new question
+            session = chat_sessions.get(session_id)
+            if session is not None and session.tenant_id != tenant_id:
+                session = None  # Sessions are only visible to the tenant that opened them
+            if session is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Chat session expired or not found',
+                    'session_expired': True
+                }), 404
+            chat_session = session
+        else:
+            # Stateless fallback: the client resends the analysis and history.
+            # Summaries are recomputed per request since nothing is kept.
+            session = None
+            chat_history = data.get('chat_history', [])[1:]  # Skip the initial greeting
+            chat_session = ChatSession(
+                session_id='',
+                cereal_name=data.get('cereal_name'),
+                ingredients=data.get('ingredients'),
+                analysis=data.get('previous_analysis', ''),
+                history=chat_history
+            )
         
-        # Create chat prompt
-        chat_prompt = ChatPromptTemplate.from_template("""
-You are a helpful AI assistant specializing in food ingredients and nutrition for children. 
-
-You have already analyzed this product:
-Product: {cereal_name}
-Ingredients: {ingredients}
-
-Previous Analysis:
-{previous_analysis}
-{history}
-
-User Question: {question}
-
-Provide a helpful, clear, and concise answer based on the analysis and your knowledge of food ingredients. 
-Be friendly and conversational. If the question is about something not covered in the analysis, 
-use your knowledge about food ingredients to provide accurate information.
-
-Keep your response focused and under 200 words unless more detail is specifically requested.
-""")
+        print(f"Chat question for {chat_session.cereal_name}: {question}")
         
-        # Format and invoke
-        messages = chat_prompt.format_messages(
-            cereal_name=cereal_name,
-            ingredients=ingredients,
-            previous_analysis=previous_analysis,
-            history=history_text,
-            question=question
-        )
+        with acquire_runtime(tenant_id) as runtime, interactive_traffic.track(), capture() as trace, \
+                request_deadline(CHAT_REQUEST_BUDGET_SECONDS):
+            trace_request(trace, cereal_name=chat_session.cereal_name, session=bool(session), tenant_id=tenant_id)
+            # Shared chat LLM (built once, reuses pooled connections)
+            chat_llm = client_registry.chat_model(
+                api_key=runtime.api_keys['openai_api_key'],
+                model=CHAT_MODEL,
+                temperature=0.7
+            )
+            
+            # Stable prefix, rolling summary of older turns, then recent messages,
+            # kept under CHAT_PROMPT_TOKEN_CAP
+            messages, prompt_stats = runtime.chat_summarizer.build_messages(chat_session, question)
+            with span("chat") as s:
+                response = model_calls.call("llm", lambda: chat_llm.invoke(messages))
+                s.record_llm_usage(CHAT_MODEL, response)
         
-        response = chat_llm.invoke(messages)
+        if session is not None:
+            chat_sessions.append(session, 'user', question)
+            chat_sessions.append(session, 'assistant', response.content)
         
-        return jsonify({
+        result = {
             'success': True,
-            'answer': response.content
-        })
+            'answer': response.content,
+            'prompt': prompt_stats
+        }
+        if session is not None:
+            result['session_id'] = session.session_id
+        if timings_requested():
+            result['timings'] = trace.summary()
+        return jsonify(result)
         
+    except TimeoutError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Chat timed out: {e}'
+        }), 504
+    except CircuitOpenError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Model provider unavailable: {e}'
+        }), 503
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -293,4 +1606,14 @@ Keep your response focused and under 200 words unless more detail is specificall
         }), 500
 
 if __name__ == "__main__":
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    parser = argparse.ArgumentParser(description="KidSafe backend development server")
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='Report import and warm-up time by step and package, then exit')
+    parser.add_argument('--strategy', default=os.environ.get('KIDSAFE_RETRIEVAL_STRATEGY', 'ensemble'),
+                        help='Retrieval strategy whose dependencies the profile warms up')
+    parser.add_argument('--rerank', action='store_true', help='Include the Cohere reranker in the profile')
+    args = parser.parse_args()
+    if args.startup_profile:
+        print(profile_startup(args.strategy, rerank=args.rerank))
+    else:
+        app.run(debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,72 @@
+"""
+Production launcher for the KidSafe Food Analyzer backend.
+
+Runs the Flask app under gunicorn with several worker processes, using
+gunicorn.conf.py (preloading, worker hooks) with command-line overrides.
+`python main.py` remains the single-process development server.
+
+Usage:
+    python serve.py [--workers 4] [--threads 8] [--bind 0.0.0.0:5001] [--no-preload]
+
+Send SIGHUP to the master for a graceful reload of the workers.
+"""
+
+import argparse
+import os
+
+from gunicorn.app.base import Application
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+
+class KidSafeServer(Application):
+    """Gunicorn application: gunicorn.conf.py plus explicit overrides."""
+
+    def __init__(self, overrides: dict = None):
+        """
+        Initialize the server.
+
+        Args:
+            overrides: Gunicorn settings replacing the configuration file's,
+                e.g. {'workers': 4, 'preload_app': False}
+        """
+        self.overrides = overrides or {}
+        super().__init__()
+
+    def load_config(self):
+        self.load_config_from_file(CONFIG_FILE)
+        for name, value in self.overrides.items():
+            self.cfg.set(name, value)
+
+    def load(self):
+        from main import app
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the KidSafe backend with multiple worker processes")
+    parser.add_argument('--workers', type=int, help='Worker processes')
+    parser.add_argument('--threads', type=int, help='Request threads per worker')
+    parser.add_argument('--bind', help='Address to listen on, e.g. 0.0.0.0:5001')
+    parser.add_argument('--no-preload', action='store_true',
+                        help='Load the app and index in every worker instead of once in the master')
+    parser.add_argument('--timeout', type=int, help='Seconds before a silent worker is replaced')
+    parser.add_argument('--graceful-timeout', type=int, help='Seconds in-flight requests get on reload')
+    args = parser.parse_args()
+
+    overrides = {
+        name: value for name, value in (
+            ('workers', args.workers),
+            ('threads', args.threads),
+            ('bind', args.bind),
+            ('timeout', args.timeout),
+            ('graceful_timeout', args.graceful_timeout),
+        ) if value is not None
+    }
+    if args.no_preload:
+        overrides['preload_app'] = False
+    KidSafeServer(overrides).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import hashlib
+
+from backend.analysis_cache import CACHE_KEY_VERSION, AnalysisCache, make_cache_key
+
+
+def test_key_format_is_pinned():
+    # Changing this value orphans every persisted analysis: bump CACHE_KEY_VERSION with it
+    key = make_cache_key("ensemble", "Oat Rings", "Whole Grain Oats, Sugar, Salt")
+    assert key == "v2:946bf80eb190917526dd3bf59ce06ff13d199d99715baae4a5c361ab22f93fa1"
+    assert key == f"v{CACHE_KEY_VERSION}:" + hashlib.sha256(
+        "ensemble\x1foat rings\x1fwhole grain oats, sugar, salt".encode("utf-8")
+    ).hexdigest()
+
+
+def test_label_variants_share_a_key():
+    key = make_cache_key("ensemble", "Oat Rings", "Whole Grain Oats, Sugar, Salt")
+    assert make_cache_key("ensemble", "  oat   RINGS ", "WHOLE GRIAN OATS, Sugar, Salt (for flavor)") == key
+    assert make_cache_key("bm25", "Oat Rings", "Whole Grain Oats, Sugar, Salt") != key
+
+
+def test_persisted_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    key = make_cache_key("ensemble", "Oat Rings", "Oats")
+    AnalysisCache(persist_path=path).set(key, "GOOD")
+    assert AnalysisCache(persist_path=path).get(key) == "GOOD"
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+import pytest
+
+from backend.catalog import ProductCatalog
+
+
+def write_catalog(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("Brand_Name,Ingredients\n")
+        for brand, ingredients in rows:
+            f.write(f'"{brand}","{ingredients}"\n')
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+    path = tmp_path / 'cereal.csv'
+    write_catalog(path, [("Oat Rings", "Oats, Salt"), ("Corn Puffs", "Corn, Sugar")])
+    return path
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_loads_once_and_reloads_on_change(catalog_file):
+    catalog = ProductCatalog(catalog_file, check_interval=0)
+    first = catalog.snapshot()
+    assert [p['brand'] for p in first.store] == ["Oat Rings", "Corn Puffs"]
+    assert catalog.snapshot() is first
+
+    write_catalog(catalog_file, [("Oat Rings", "Oats, Salt")])
+    bump_mtime(catalog_file)
+    second = catalog.snapshot()
+    assert second is not first and len(second.store) == 1
+    assert second.etag != first.etag
+    assert catalog.stats()['loads'] == 2
+
+
+def test_identical_rewrite_is_not_reloaded(catalog_file):
+    catalog = ProductCatalog(catalog_file, check_interval=0)
+    first = catalog.snapshot()
+    bump_mtime(catalog_file)
+    assert catalog.snapshot() is first
+    assert catalog.stats()['unchanged_rewrites'] == 1
+
+
+def test_readers_are_served_the_old_snapshot_during_a_reload(catalog_file, monkeypatch):
+    catalog = ProductCatalog(catalog_file, check_interval=0)
+    first = catalog.snapshot()
+    building = threading.Event()
+    release = threading.Event()
+    build = ProductCatalog._build
+
+    def slow_build(path, digest):
+        building.set()
+        release.wait(5)
+        return build(path, digest)
+
+    monkeypatch.setattr(catalog, '_build', slow_build)
+    write_catalog(catalog_file, [("Bran Flakes", "Wheat Bran")])
+    bump_mtime(catalog_file)
+    reloader = threading.Thread(target=catalog.snapshot)
+    reloader.start()
+    assert building.wait(5)
+
+    start = time.monotonic()
+    assert catalog.snapshot() is first
+    assert time.monotonic() - start < 1
+    release.set()
+    reloader.join()
+    assert [p['brand'] for p in catalog.snapshot().store] == ["Bran Flakes"]
+
+
+def test_failed_reload_keeps_the_previous_snapshot(catalog_file, monkeypatch):
+    catalog = ProductCatalog(catalog_file, check_interval=0)
+    first = catalog.snapshot()
+
+    def broken_build(path, digest):
+        raise ValueError("truncated file")
+
+    monkeypatch.setattr(catalog, '_build', broken_build)
+    write_catalog(catalog_file, [("Bran Flakes", "Wheat Bran")])
+    bump_mtime(catalog_file)
+    assert catalog.snapshot() is first
+    assert catalog.stats()['failed_loads'] == 1
+
+    monkeypatch.undo()
+    assert [p['brand'] for p in catalog.snapshot().store] == ["Bran Flakes"]
+
+
+def test_first_load_errors_propagate(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ProductCatalog(tmp_path / 'missing.csv').snapshot()
@@ -0,0 +1,83 @@
+import pytest
+
+from backend.catalog_search import CatalogSearchIndex, InvalidCursorError
+from backend.catalog_store import build_store
+
+PRODUCTS = [
+    ("Honey Oat Rings", "Whole Grain Oats, Honey, Salt"),
+    ("Oat Crunch", "Oats, Sugar, Salt"),
+    ("Corn Flakes", "Corn, Sugar, Salt"),
+    ("Oat Bran Flakes", "Oat Bran, Roboflavin"),
+    ("Honey Corn Puffs", "Corn, Honey"),
+    ("Oatmeal Squares", "Whole Grain Oats, Brown Sugar"),
+    ("Cocoa Oat Rings", "Oats, Cocoa, Sugar"),
+]
+
+
+@pytest.fixture(scope='module')
+def index():
+    return CatalogSearchIndex(build_store(PRODUCTS), version="v1")
+
+
+def all_pages(index, limit, **kwargs):
+    pages = []
+    cursor = None
+    while True:
+        results, cursor = index.search(limit=limit, cursor=cursor, **kwargs)
+        pages.append(results)
+        if cursor is None:
+            return pages
+
+
+def brands(results):
+    return [PRODUCTS[product_id][0] for product_id, _ in results]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'query': 'oat'},
+    {'query': 'oat rings', 'fuzzy': True},
+    {'ingredients': ['salt']},
+    {'query': 'o', 'ingredients': ['oats'], 'exclude': ['honey']},
+])
+@pytest.mark.parametrize('limit', [1, 2, 3])
+def test_pages_concatenate_to_the_unpaged_result(index, kwargs, limit):
+    unpaged, cursor = index.search(limit=100, **kwargs)
+    assert cursor is None and unpaged
+    pages = all_pages(index, limit, **kwargs)
+    assert all(len(page) == limit for page in pages[:-1])
+    assert [hit for page in pages for hit in page] == unpaged
+
+
+def test_prefix_results_are_alphabetical(index):
+    results, _ = index.search(query='oat', limit=100)
+    assert brands(results) == ["Oat Bran Flakes", "Oat Crunch", "Oatmeal Squares"]
+
+
+def test_fuzzy_search_reports_typo_distance(index):
+    results, _ = index.search(query='hony', fuzzy=True, limit=100)
+    assert brands(results) == ["Honey Oat Rings", "Honey Corn Puffs"]
+    assert {distance for _, distance in results} == {1}
+
+
+def test_ingredient_search_matches_canonical_names(index):
+    results, _ = index.search(ingredients=['riboflavin'], limit=100)
+    assert brands(results) == ["Oat Bran Flakes"]
+
+
+def test_cursor_from_another_catalog_version_is_rejected(index):
+    _, cursor = index.search(query='oat', limit=1)
+    newer = CatalogSearchIndex(build_store(PRODUCTS), version="v2")
+    with pytest.raises(InvalidCursorError):
+        newer.search(query='oat', limit=1, cursor=cursor)
+
+
+def test_cursor_from_another_ordering_is_rejected(index):
+    _, cursor = index.search(query='oat', limit=1)
+    with pytest.raises(InvalidCursorError):
+        index.search(ingredients=['salt'], limit=1, cursor=cursor)
+
+
+@pytest.mark.parametrize('cursor', ["not a cursor", "djE6YTotMQ"])  # the second is "v1:a:-1"
+def test_malformed_cursors_are_rejected(index, cursor):
+    with pytest.raises(InvalidCursorError):
+        index.search(query='oat', cursor=cursor)
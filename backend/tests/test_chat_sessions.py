@@ -0,0 +1,50 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from backend.chat_sessions import ChatSessionStore, build_chat_messages
+from backend.config import (
+    CHAT_ANALYSIS_TOKEN_LIMIT,
+    CHAT_HISTORY_MESSAGES,
+    CHAT_PROMPT_TOKEN_CAP,
+    CHAT_SUMMARY_TOKEN_LIMIT,
+)
+from backend.context_packing import count_tokens, truncate_to_tokens
+
+ANALYSIS = "Whole grain oats are the first ingredient, a good base for breakfast. " * 200
+
+
+def test_messages_start_with_the_analysis():
+    history = [{'role': 'user', 'content': 'Is it sweet?'}, {'role': 'assistant', 'content': 'Yes.'}]
+    messages = build_chat_messages("Oat Rings", "Oats, Sugar", "MODERATE", history, "Why?", summary="Earlier")
+    assert isinstance(messages[0], SystemMessage)
+    prefix = messages[0].content
+    assert prefix.index("Oat Rings") < prefix.index("MODERATE") < prefix.index("You are a helpful")
+    assert "Earlier" in messages[1].content
+    assert [type(m) for m in messages[2:]] == [HumanMessage, AIMessage, HumanMessage]
+    assert messages[-1].content == "Why?"
+
+
+def test_prefix_is_identical_across_turns():
+    first = build_chat_messages("A", "Oats", ANALYSIS, [], "Q1")
+    history = [{'role': 'user', 'content': 'Q1'}, {'role': 'assistant', 'content': 'A1'}]
+    second = build_chat_messages("A", "Oats", ANALYSIS, history, "Q2", summary="Earlier")
+    assert first[0] == second[0]
+
+
+def test_instructions_leave_the_token_cap_to_the_conversation():
+    analysis = truncate_to_tokens(ANALYSIS, CHAT_ANALYSIS_TOKEN_LIMIT, count_tokens)
+    summary = truncate_to_tokens(ANALYSIS, CHAT_SUMMARY_TOKEN_LIMIT, count_tokens)
+    history = [
+        {'role': 'user' if i % 2 == 0 else 'assistant', 'content': "How much sugar is in one serving? " * 5}
+        for i in range(CHAT_HISTORY_MESSAGES)
+    ]
+    messages = build_chat_messages("Oat Rings", "Oats, Sugar", analysis, history, "Why?", summary=summary)
+    prompt_tokens = sum(count_tokens(m.content) for m in messages)
+    assert count_tokens(analysis) <= count_tokens(messages[0].content) < count_tokens(analysis) + 200
+    assert prompt_tokens <= CHAT_PROMPT_TOKEN_CAP
+
+
+def test_sessions_remember_their_tenant():
+    store = ChatSessionStore(max_sessions=2)
+    session = store.create("Oat Rings", "Oats", "GOOD", tenant_id="acme")
+    assert store.get(session.session_id).tenant_id == "acme"
+    assert store.create("Oat Rings", "Oats", "GOOD").tenant_id is None
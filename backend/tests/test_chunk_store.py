@@ -0,0 +1,77 @@
+import os
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+from backend.chunk_store import ChunkDocstore, ChunkStore
+
+DOCUMENTS = [
+    Document(page_content="Sugar is an added sweetener.", metadata={'page': 1, 'source': 'guide.pdf'}),
+    Document(page_content="Café au lait — ünïcode text", metadata={'page': 1, 'flag': True}),
+    Document(page_content="", metadata={}),
+    Document(page_content="Red 40 is a color additive.", metadata={'page': 2, 'tags': ['color', 'dye']}),
+]
+
+
+def contents(store):
+    return [(document.page_content, document.metadata) for document in store]
+
+
+def test_from_documents_round_trips_text_and_metadata():
+    store = ChunkStore.from_documents(DOCUMENTS)
+    assert len(store) == len(DOCUMENTS)
+    assert contents(store) == [(d.page_content, d.metadata) for d in DOCUMENTS]
+
+
+def test_distinct_values_of_equal_value_but_different_type_are_kept():
+    store = ChunkStore.from_documents([
+        Document(page_content="a", metadata={'value': 1}),
+        Document(page_content="b", metadata={'value': True}),
+    ])
+    assert store.metadata(0)['value'] is not True
+    assert store.metadata(1)['value'] is True
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = ChunkStore.from_documents(DOCUMENTS).save(tmp_path / 'chunks.store')
+    loaded = ChunkStore.load(path)
+    assert loaded.mapped
+    assert contents(loaded) == [(d.page_content, d.metadata) for d in DOCUMENTS]
+    assert os.listdir(tmp_path) == ['chunks.store']
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.store'
+    path.write_bytes(b"not a chunk store")
+    with pytest.raises(ValueError):
+        ChunkStore.load(path)
+
+
+def test_concurrent_saves_leave_a_complete_file(tmp_path):
+    path = str(tmp_path / 'chunks.store')
+    stores = [ChunkStore.from_documents(DOCUMENTS[:n]) for n in range(1, len(DOCUMENTS) + 1)] * 4
+    threads = [threading.Thread(target=store.save, args=(path,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    loaded = ChunkStore.load(path)
+    assert contents(loaded) == [(d.page_content, d.metadata) for d in DOCUMENTS[:len(loaded)]]
+    assert os.listdir(tmp_path) == ['chunks.store']
+
+
+def test_out_of_range_chunk_ids_raise():
+    store = ChunkStore.from_documents(DOCUMENTS)
+    with pytest.raises(IndexError):
+        store[len(DOCUMENTS)]
+
+
+def test_docstore_sets_gets_and_deletes():
+    docstore = ChunkDocstore()
+    docstore.mset([('a', DOCUMENTS[0]), ('b', DOCUMENTS[1])])
+    docstore.mset([('c', DOCUMENTS[3])])
+    assert [d.page_content for d in docstore.mget(['c', 'a'])] == [DOCUMENTS[3].page_content, DOCUMENTS[0].page_content]
+    docstore.mdelete(['a'])
+    assert docstore.mget(['a']) == [None]
+    assert sorted(docstore.yield_keys()) == ['b', 'c']
@@ -0,0 +1,48 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.clients import ClientRegistry
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused(server_url):
+    registry = ClientRegistry()
+    for _ in range(3):
+        assert registry.http_client.get(server_url).status_code == 200
+    stats = registry.stats()
+    assert stats['requests'] == 3 and stats['new_connections'] == 1
+
+
+def test_closing_connections_keeps_the_shared_client_usable(server_url):
+    registry = ClientRegistry()
+    client = registry.http_client
+    client.get(server_url)
+    registry.close_connections()
+    assert not client.is_closed
+    assert registry.http_client is client
+    assert client.get(server_url).status_code == 200
+    assert registry.stats()['new_connections'] == 2
@@ -0,0 +1,68 @@
+import pytest
+
+from backend.ingredients import IngredientNormalizer
+
+
+@pytest.fixture(scope='module')
+def normalizer():
+    return IngredientNormalizer()
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Vegetable Oil (Partially Hydrogenated Soybean Oil)", "vegetable oil, partially hydrogenated soybean oil"),
+    ("Color (Red 40)", "color, red 40"),
+    ("Preservative (BHT)", "preservative, bht"),
+    ("Enriched Flour (Wheat Flour, Niacin, Reduced Iron)", "enriched flour, wheat flour, niacin, reduced iron"),
+    ("Vitamins and Minerals (Iron)", "iron"),
+])
+def test_parenthesized_ingredients_are_kept(normalizer, text, expected):
+    assert normalizer.normalize(text).text == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("BHT (for freshness)", "bht"),
+    ("Salt (2%)", "salt"),
+    ("Salt (less than 2%)", "salt"),
+    ("Sugar (Sugars)", "sugar"),
+])
+def test_annotations_are_dropped(normalizer, text, expected):
+    assert normalizer.normalize(text).text == expected
+
+
+def test_reformulated_additive_changes_the_normalized_text(normalizer):
+    assert normalizer.normalize("Oats, Color (Red 40)").text != normalizer.normalize("Oats, Color (Beet Juice)").text
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Coconute Sugar", "coconut sugar"),
+    ("Roboflavin", "riboflavin"),
+    ("Babana Puree", "banana puree"),
+    ("Organic Babana Puree", "organic banana puree"),
+])
+def test_typos_are_corrected_to_known_ingredients(normalizer, text, expected):
+    assert normalizer.normalize(text).text == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Money", "money"),
+    ("Sugar, Money, Salt", "sugar, money, salt"),
+    ("Honey Bunches", "honey bunches"),
+    ("Lactase", "lactase"),
+])
+def test_words_are_not_rewritten_into_other_ingredients(normalizer, text, expected):
+    result = normalizer.normalize(text)
+    assert result.text == expected
+    assert result.corrections == ()
+
+
+def test_catalog_row_with_qualifiers_and_typos(normalizer):
+    # Gerber Organic Biologique, as listed in Data/cereal.csv
+    result = normalizer.normalize(
+        "Organic Wheat Flour, Organic Whole Grain Oat, Organic Babana Puree, Organic Raspberry Puree, "
+        "Organic Rice Flour, Thiamine Mononitrate, Roboflavin Niacinamide, Ferrous Fumarate"
+    )
+    assert result.names == (
+        "organic wheat flour", "organic whole grain oats", "organic banana puree", "organic raspberry puree",
+        "organic rice flour", "thiamin mononitrate", "riboflavin", "niacinamide", "ferrous fumarate",
+    )
+    assert result.corrections == (("babana", "banana"), ("roboflavin", "riboflavin"))
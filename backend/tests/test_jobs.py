@@ -0,0 +1,91 @@
+import sqlite3
+
+import pytest
+
+from backend.jobs import FAILED, SUCCEEDED, JobQueue
+
+
+class LockedConnection:
+    """SQLite connection whose first statements containing a fragment fail as if another process held the file."""
+
+    def __init__(self, connection, failures):
+        self._connection = connection
+        self.failures = failures  # SQL fragment -> failures left
+
+    def execute(self, sql, *args):
+        for fragment, left in self.failures.items():
+            if left and fragment in sql:
+                self.failures[fragment] -= 1
+                raise sqlite3.OperationalError("database is locked")
+        return self._connection.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(run_job=lambda kind, payload, report_progress: {'echo': payload}, workers=1)
+    yield queue
+    queue.stop()
+
+
+def test_jobs_run_and_return_their_result(queue):
+    queue.start()
+    job_id = queue.submit('analysis', {'cereal_name': 'Oat Rings'})
+    job = queue.wait(job_id, timeout=5)
+    assert job['status'] == SUCCEEDED
+    assert job['result'] == {'echo': {'cereal_name': 'Oat Rings'}}
+
+
+def test_a_locked_queue_file_does_not_stop_the_worker(queue):
+    queue._db = LockedConnection(queue._db, {"attempts = attempts + 1": 2, "result = ?": 1})
+    job_id = queue.submit('analysis', {})
+    queue.start()
+    job = queue.wait(job_id, timeout=5)
+    assert job['status'] == SUCCEEDED and job['attempts'] == 1
+    assert not any(queue._db.failures.values())
+    assert all(thread.is_alive() for thread in queue._threads)
+
+
+def test_failed_jobs_are_retried_then_marked_failed():
+    def fail(kind, payload, report_progress):
+        raise RuntimeError("provider down")
+
+    queue = JobQueue(run_job=fail, workers=1, max_attempts=2, retry_backoff=0.01, poll_interval=0.01)
+    queue.start()
+    try:
+        job = queue.wait(queue.submit('analysis', {}), timeout=5)
+    finally:
+        queue.stop()
+    assert job['status'] == FAILED and job['attempts'] == 2
+    assert job['error'] == "provider down"
+
+
+def test_jobs_are_only_visible_to_their_tenant(queue):
+    job_id = queue.submit('analysis', {}, tenant_id='acme')
+    assert queue.get(job_id, tenant_id='acme')['job_id'] == job_id
+    assert queue.get(job_id, tenant_id='other') is None
+    assert queue.get(job_id) is None
+    assert queue.wait(job_id, timeout=0.01, tenant_id='other') is None
+    assert queue.get(queue.submit('analysis', {}))['status'] == 'queued'
+
+
+def test_queue_files_without_tenant_column_are_migrated(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+        "priority INTEGER NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL, "
+        "progress TEXT, result TEXT, error TEXT, created_at REAL NOT NULL, "
+        "available_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+    )
+    connection.execute("INSERT INTO jobs VALUES ('old', 'analysis', '{}', 0, 'queued', 0, "
+                       "NULL, NULL, NULL, 0, 0, NULL, NULL)")
+    connection.commit()
+    connection.close()
+
+    queue = JobQueue(run_job=lambda *args: None, db_path=path)
+    assert queue.get('old')['status'] == 'queued'
+    job_id = queue.submit('analysis', {}, tenant_id='acme')
+    assert queue.get(job_id, tenant_id='acme') is not None
@@ -0,0 +1,81 @@
+import threading
+
+from backend.metrics import MetricsRegistry
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_counter_sums_thread_shards():
+    counter = MetricsRegistry().counter("requests_total", "Requests.", ("route",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("/api/analyze")
+        counter.inc("/api/chat", amount=2)
+
+    run_threads(work, 8)
+    assert counter.collect() == {("/api/analyze",): 8000, ("/api/chat",): 16}
+
+
+def test_finished_thread_shards_are_retired_without_losing_counts():
+    counter = MetricsRegistry().counter("jobs_total", "Jobs.")
+    run_threads(lambda: counter.inc(), 50)
+    assert counter.collect() == {(): 50}
+    assert counter._shards._shards == []
+    run_threads(lambda: counter.inc(), 5)
+    counter.inc()
+    assert counter.collect() == {(): 56}
+    assert len(counter._shards._shards) == 1  # Only the live test thread
+
+
+def test_up_down_gauge():
+    gauge = MetricsRegistry().up_down_gauge("in_flight", "In flight.")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert gauge.collect() == {(): 1}
+
+
+def test_histogram_buckets_merge_across_threads():
+    histogram = MetricsRegistry().histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+
+    def work():
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(5.0)
+
+    run_threads(work, 4)
+    buckets_0_1, buckets_1, buckets_inf, total = histogram.collect()[()]
+    assert (buckets_0_1, buckets_1, buckets_inf) == (8, 0, 4)
+    assert abs(total - 4 * 5.15) < 1e-9
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests.", ("route",))
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.5,))
+    registry.gauge("queue", "Queue depth.", lambda: {("jobs",): 3}, ("name",))
+    counter.inc('say "hi"')
+    histogram.observe(0.2)
+    histogram.observe(2)
+
+    lines = registry.expose().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="say \\"hi\\""} 1' in lines
+    assert 'latency_seconds_bucket{le="0.5"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'latency_seconds_sum 2.2' in lines
+    assert 'latency_seconds_count 2' in lines
+    assert 'queue{name="jobs"} 3' in lines
+
+
+def test_failing_gauge_callback_is_skipped():
+    registry = MetricsRegistry()
+    registry.gauge("broken", "Broken.", lambda: 1 / 0)
+    assert registry.expose().splitlines() == ["# HELP broken Broken.", "# TYPE broken gauge"]
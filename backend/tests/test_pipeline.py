@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from backend.pipeline import BuildInProgressError, PipelineHolder, PipelineSnapshot, freeze_keys
+
+
+class FakeIndex:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_snapshot(version):
+    return PipelineSnapshot(
+        version=version,
+        api_keys=freeze_keys({'openai_api_key': 'sk'}),
+        retrieval_strategy='ensemble',
+        vector_store_manager=FakeIndex(),
+        advanced_retrieval_manager=None,
+        ingredient_analyzer=None,
+        chat_summarizer=None
+    )
+
+
+def test_acquire_without_a_snapshot_yields_none():
+    holder = PipelineHolder()
+    with holder.acquire() as snapshot:
+        assert snapshot is None
+    assert holder.status()['in_flight'] == {}
+
+
+def test_idle_snapshot_is_released_when_replaced():
+    holder = PipelineHolder()
+    first = make_snapshot(1)
+    holder.publish(first)
+    holder.publish(make_snapshot(2))
+    assert first.vector_store_manager.closed
+    assert holder.status()['released_snapshots'] == 1
+
+
+def test_pinned_snapshot_drains_before_release():
+    holder = PipelineHolder()
+    first = make_snapshot(1)
+    holder.publish(first)
+    with holder.acquire() as pinned:
+        with holder.acquire():
+            holder.publish(make_snapshot(2))
+            with holder.acquire() as new:
+                assert new.version == 2
+                assert holder.status()['in_flight'] == {1: 2, 2: 1}
+        assert pinned is first
+        assert not first.vector_store_manager.closed
+        assert holder.status()['draining_versions'] == [1]
+    assert first.vector_store_manager.closed
+    status = holder.status()
+    assert status['draining_versions'] == [] and status['in_flight'] == {}
+    assert holder.current().version == 2
+
+
+def test_api_keys_are_read_only():
+    with pytest.raises(TypeError):
+        make_snapshot(1).api_keys['openai_api_key'] = 'other'
+
+
+def test_background_build_publishes_and_reports_progress():
+    holder = PipelineHolder()
+    published = []
+
+    def build(version, report_progress):
+        report_progress('indexing', 0.5)
+        return make_snapshot(version)
+
+    version = holder.start_build(build, on_published=published.append)
+    build_status = holder.wait_for_build(5)
+    assert build_status['state'] == 'ready' and build_status['progress'] == 1.0
+    assert holder.current().version == version
+    assert [snapshot.version for snapshot in published] == [version]
+
+
+def test_failed_build_keeps_the_current_snapshot():
+    holder = PipelineHolder()
+    holder.publish(make_snapshot(0))
+
+    def build(version, report_progress):
+        raise RuntimeError("embedding quota exceeded")
+
+    holder.start_build(build)
+    build_status = holder.wait_for_build(5)
+    assert build_status['state'] == 'failed'
+    assert build_status['error'] == "embedding quota exceeded"
+    assert holder.current().version == 0
+
+
+def test_only_one_build_runs_at_a_time():
+    holder = PipelineHolder()
+    release = threading.Event()
+
+    def build(version, report_progress):
+        release.wait(5)
+        return make_snapshot(version)
+
+    holder.start_build(build)
+    with pytest.raises(BuildInProgressError):
+        holder.start_build(build)
+    release.set()
+    assert holder.wait_for_build(5)['state'] == 'ready'
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from backend.resilience import CircuitOpenError, DeadlineExceeded, ResilientCaller, call_scope, request_deadline
+
+
+@pytest.fixture
+def caller():
+    return ResilientCaller(call_timeout=0.2, max_attempts=1, failure_threshold=2, reset_seconds=60, max_workers=4)
+
+
+def fail():
+    raise ConnectionError("provider down")
+
+
+def test_success_returns_the_result(caller):
+    assert caller.call("llm", lambda: 42) == 42
+    assert caller.stats()["llm"]["calls"] == 1
+
+
+def test_provider_errors_open_the_breaker(caller):
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            caller.call("llm", fail)
+    assert caller.breaker("llm").state == "open"
+    assert caller.stats()["llm"]["failures"] == 2
+
+
+def test_full_timeouts_count_as_failures(caller):
+    with pytest.raises(DeadlineExceeded):
+        caller.call("llm", lambda: time.sleep(0.5), timeout=0.05)
+    stats = caller.stats()["llm"]
+    assert stats["deadline_exceeded"] == 1
+    assert stats["breaker"]["consecutive_failures"] == 1
+
+
+def test_budget_exhaustion_is_not_a_breaker_failure(caller):
+    for _ in range(3):
+        with request_deadline(0.05), pytest.raises(DeadlineExceeded):
+            caller.call("llm", lambda: time.sleep(0.5))
+    with request_deadline(0), pytest.raises(DeadlineExceeded):
+        caller.call("llm", lambda: 42)
+    stats = caller.stats()["llm"]
+    assert stats["budget_exhausted"] == 4
+    assert stats["deadline_exceeded"] == 0
+    assert stats["breaker"]["consecutive_failures"] == 0
+    assert caller.breaker("llm").state == "closed"
+
+
+def test_budget_exhaustion_releases_a_half_open_probe():
+    caller = ResilientCaller(call_timeout=0.2, max_attempts=1, failure_threshold=1, reset_seconds=0)
+    with pytest.raises(ConnectionError):
+        caller.call("llm", fail)
+    with request_deadline(0.05), pytest.raises(DeadlineExceeded):
+        caller.call("llm", lambda: time.sleep(0.5))
+    assert caller.call("llm", lambda: 42) == 42
+    assert caller.breaker("llm").state == "closed"
+
+
+class Unauthorized(Exception):
+    status_code = 401
+
+
+def test_client_errors_do_not_open_the_breaker(caller):
+    def revoked():
+        raise Unauthorized("invalid api key")
+
+    for _ in range(5):
+        with pytest.raises(Unauthorized):
+            caller.call("llm", revoked)
+    stats = caller.stats()["llm"]
+    assert stats["client_errors"] == 5 and stats["failures"] == 0
+    assert caller.breaker("llm").state == "closed"
+
+
+def test_one_tenants_failures_do_not_short_circuit_another(caller):
+    with call_scope("tenant-a"):
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                caller.call("llm", fail)
+        with pytest.raises(CircuitOpenError):
+            caller.call("llm", lambda: 42)
+    with call_scope("tenant-b"):
+        assert caller.call("llm", lambda: 42) == 42
+    assert caller.call("llm", lambda: 42) == 42
+    assert caller.breaker("llm", "tenant-a").state == "open"
+    assert caller.stats()["llm"]["open_scopes"] == 1
+
+
+def test_forgetting_a_scope_resets_its_breaker(caller):
+    with call_scope("tenant-a"):
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                caller.call("llm", fail)
+    caller.forget_scope("tenant-a")
+    with call_scope("tenant-a"):
+        assert caller.call("llm", lambda: 42) == 42
+
+
+def test_queue_wait_is_not_a_breaker_failure():
+    caller = ResilientCaller(call_timeout=0.2, max_attempts=1, failure_threshold=1, reset_seconds=60, max_workers=1)
+    release = threading.Event()
+    with pytest.raises(DeadlineExceeded):
+        caller.call("embedding", release.wait, timeout=0.01)  # Holds the only worker
+    try:
+        with pytest.raises(DeadlineExceeded):
+            caller.call("llm", lambda: 42, timeout=0.05)
+    finally:
+        release.set()
+    stats = caller.stats()["llm"]
+    assert stats["queue_timeouts"] == 1 and stats["deadline_exceeded"] == 0
+    assert caller.breaker("llm").state == "closed"
+    assert caller.call("llm", lambda: 42) == 42
@@ -0,0 +1,116 @@
+import pytest
+
+from backend.ingredients import IngredientNormalizer, normalize_ingredients
+from backend.rules import (
+    VERDICT_BAD,
+    VERDICT_GOOD,
+    VERDICT_MODERATE,
+    IngredientRuleEngine,
+)
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return IngredientRuleEngine()
+
+
+@pytest.mark.parametrize('ingredients, verdict', [
+    ("Whole Grain Oats, Salt", VERDICT_GOOD),
+    ("Whole Grain Oats, Sugar, Salt", VERDICT_MODERATE),
+    ("Corn Meal, Brown Sugar Syrup", VERDICT_MODERATE),
+    ("Oats, Sugar, Red 40", VERDICT_BAD),
+    ("Rice, Yellow No 5", VERDICT_BAD),
+    ("Wheat, BHT (to preserve freshness)", VERDICT_BAD),
+    ("Corn, Partially Hydrogenated Soybean Oil", VERDICT_BAD),
+])
+def test_verdicts(engine, ingredients, verdict):
+    assert engine.classify(ingredients).verdict == verdict
+
+
+def test_longest_match_wins_within_a_span(engine):
+    result = engine.classify("Oats, Brown Sugar")
+    assert [m.term for m in result.added_sugars] == ["sugar"]
+    assert [m.ingredient for m in result.added_sugars] == ["brown sugar"]
+
+
+def test_patterns_do_not_span_items(engine):
+    assert engine.classify("Corn, Syrup").verdict == VERDICT_GOOD
+
+
+def test_allergens_do_not_change_the_verdict(engine):
+    result = engine.classify("Whole Wheat, Almonds, Milk")
+    assert result.verdict == VERDICT_GOOD
+    assert {m.term for m in result.allergens} == {"wheat", "tree nut", "milk"}
+
+
+@pytest.mark.parametrize('ingredients', [
+    "No Sugar Added",
+    "No Added Sugar",
+    "Sugar Free Syrup",
+    "sugar-free sweetener",
+    "Without Artificial Colors",
+    "Oats, No Brown Sugar",
+])
+def test_negated_terms_do_not_match(engine, ingredients):
+    result = engine.classify(ingredients)
+    assert result.verdict == VERDICT_GOOD
+    assert not result.added_sugars and not result.bad_additives
+
+
+def test_negation_is_limited_to_its_item(engine):
+    result = engine.classify("No Added Sugar, Honey")
+    assert [m.ingredient for m in result.added_sugars] == ["honey"]
+
+
+@pytest.mark.parametrize('ingredients, terms', [
+    ("Corn Meal, Sugar, FD&C Red No. 40, Yellow No. 5", {"red 40", "yellow 5"}),
+    ("Rice, Red No. 3", {"red 3"}),
+    ("Oats, Yellow No. 5 Lake", {"yellow 5"}),
+    ("Oats, FD&C Blue No.1", {"blue 1"}),
+])
+def test_color_numbers_after_a_period(engine, ingredients, terms):
+    result = engine.classify(ingredients)
+    assert result.verdict == VERDICT_BAD
+    assert {m.term for m in result.bad_additives} == terms
+
+
+def test_periods_between_items_and_in_numbers(engine):
+    result = engine.classify("Salt 2.5%. Sugar")
+    assert [m.ingredient for m in result.added_sugars] == ["sugar"]
+
+
+def test_color_numbers_are_not_negations(engine):
+    result = engine.classify("Oats, Red No 40 and Yellow 5")
+    assert {m.term for m in result.bad_additives} == {"red 40", "yellow 5"}
+
+
+@pytest.mark.parametrize('ingredients, term', [
+    ("Coconute Sugar", "coconut sugar"),
+    ("Oats, Dextrse", "dextrose"),
+    ("Rice, Molases", "molasses"),
+    ("Oats, Organic Coconute Sugar", "coconut sugar"),
+])
+def test_typos_are_corrected(engine, ingredients, term):
+    result = engine.classify(ingredients)
+    assert term in {m.term for m in result.added_sugars}
+    assert result.corrections
+
+
+def test_matches_use_the_normalized_ingredients(engine):
+    ingredients = "Oats, Contains 2% or less of Coconute Sugar, FD&C Red No. 40"
+    result = engine.classify(ingredients)
+    assert result.corrections == normalize_ingredients(ingredients).corrections == (("coconute", "coconut"),)
+    assert [m.ingredient for m in result.added_sugars] == ["coconut sugar"]
+    assert [m.ingredient for m in result.bad_additives] == ["red 40"]
+
+
+@pytest.mark.parametrize('ingredients', ["Money", "Cake Batter Flavor", "Fried Rice", "Lactase"])
+def test_dictionary_words_are_not_corrected(engine, ingredients):
+    result = engine.classify(ingredients)
+    assert result.corrections == ()
+    assert not result.added_sugars and not result.allergens
+
+
+def test_custom_dictionary(engine):
+    permissive = IngredientRuleEngine(normalizer=IngredientNormalizer(dictionary=[]))
+    assert {m.term for m in permissive.classify("Lactase").allergens} == {"milk"}
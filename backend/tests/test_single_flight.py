@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from backend.single_flight import SingleFlight
+
+
+def run_concurrently(flight, key, fn, callers):
+    results = [None] * callers
+    errors = [None] * callers
+
+    def call(i):
+        try:
+            results[i] = flight.do(key, fn, timeout=5)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def compute():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    threads, results, errors = run_concurrently(flight, "key", compute, 1)
+    assert started.wait(5)
+    waiters, waiter_results, _ = run_concurrently(flight, "key", compute, 4)
+    wait_until(lambda: flight.stats()['coalesced'] == 4)
+    release.set()
+    for thread in threads + waiters:
+        thread.join()
+
+    assert len(runs) == 1
+    assert results == [("result", False)]
+    assert waiter_results == [("result", True)] * 4
+    assert flight.stats() == {'executions': 1, 'coalesced': 4, 'in_flight': 0}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    assert flight.stats()['executions'] == 2
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise ValueError("provider down")
+
+    threads, _, errors = run_concurrently(flight, "key", compute, 3)
+    wait_until(lambda: flight.stats()['coalesced'] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert flight.in_flight() == 0
+
+
+def test_waiter_timeout_leaves_the_leader_running():
+    flight = SingleFlight()
+    release = threading.Event()
+    threads, results, _ = run_concurrently(flight, "key", lambda: release.wait(5) and "done", 1)
+    wait_until(lambda: flight.in_flight() == 1)
+    with pytest.raises(TimeoutError):
+        flight.do("key", lambda: "other", timeout=0.01)
+    release.set()
+    threads[0].join()
+    assert results == [("done", False)]
+
+
+def test_cancelled_leader_hands_over_to_a_waiter():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def cancelled():
+        started.set()
+        release.wait(5)
+        raise SystemExit
+
+    leader = threading.Thread(target=lambda: pytest.raises(SystemExit, flight.do, "key", cancelled))
+    leader.start()
+    assert started.wait(5)
+    waiters, results, errors = run_concurrently(flight, "key", lambda: "recomputed", 1)
+    wait_until(lambda: flight.stats()['coalesced'] == 1)
+    release.set()
+    leader.join()
+    waiters[0].join()
+    assert errors == [None]
+    assert results == [("recomputed", False)]
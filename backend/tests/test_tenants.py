@@ -0,0 +1,47 @@
+import pytest
+
+from backend.tenants import TenantLimitError, TenantRegistry, UnknownTenantError
+
+KEYS = {'openai_api_key': 'sk-a', 'cohere_api_key': ''}
+
+
+@pytest.fixture
+def registry():
+    return TenantRegistry(build_runtime=lambda tenant, snapshot: None, max_registered=2)
+
+
+def test_register_generates_ids_and_tokens(registry):
+    first, first_token = registry.register(KEYS)
+    second, second_token = registry.register(KEYS)
+    assert first.tenant_id != second.tenant_id
+    assert first_token != second_token
+    assert first_token not in first.token_digest
+
+
+def test_authenticate_requires_the_tenants_token(registry):
+    tenant, token = registry.register(KEYS)
+    other, other_token = registry.register(KEYS)
+    assert registry.authenticate(tenant.tenant_id, token) is tenant
+    assert registry.authenticate(tenant.tenant_id, other_token) is None
+    assert registry.authenticate(tenant.tenant_id, '') is None
+    assert registry.authenticate('unknown', token) is None
+
+
+def test_register_respects_the_limit(registry):
+    registry.register(KEYS)
+    registry.register(KEYS)
+    with pytest.raises(TenantLimitError):
+        registry.register(KEYS)
+
+
+def test_update_keeps_the_token(registry):
+    tenant, token = registry.register(KEYS)
+    updated = registry.update(tenant.tenant_id, {'openai_api_key': 'sk-b', 'cohere_api_key': ''}, 'bm25')
+    assert updated.api_keys['openai_api_key'] == 'sk-b'
+    assert updated.retrieval_strategy == 'bm25'
+    assert registry.authenticate(tenant.tenant_id, token) is updated
+
+
+def test_update_of_unknown_tenant_fails(registry):
+    with pytest.raises(UnknownTenantError):
+        registry.update('unknown', KEYS)
@@ -61,6 +61,7 @@ function App() {
                 cerealName={analysisResult.cereal_name}
                 ingredients={analysisResult.ingredients}
                 analysisResult={analysisResult.analysis}
+                sessionId={analysisResult.session_id}
               />
             </>
           )}
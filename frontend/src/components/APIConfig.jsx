@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { configureAPIKeys } from '../services/api';
+import { configureAPIKeys, waitForPipeline } from '../services/api';
 
 const APIConfig = ({ isInitialized, onInitialized }) => {
   const [openaiKey, setOpenaiKey] = useState('');
@@ -35,7 +35,13 @@ const APIConfig = ({ isInitialized, onInitialized }) => {
 
       if (result.success) {
         setStatus({ message: result.message, type: 'success' });
-        onInitialized();
+        const build = await waitForPipeline(result.version);
+        if (build.success) {
+          setStatus({ message: 'RAG system initialized!', type: 'success' });
+          onInitialized();
+        } else {
+          setStatus({ message: `Error: ${build.error}`, type: 'error' });
+        }
       } else {
         setStatus({ message: `Error: ${result.error}`, type: 'error' });
       }
@@ -1,31 +1,49 @@
 import React, { useState, useEffect } from 'react';
-import { getCereals, analyzeIngredients } from '../services/api';
+import { searchCereals, analyzeProduct } from '../services/api';
+
+const SEARCH_DEBOUNCE_MS = 250;
 
 const CerealSelector = ({ isEnabled, onCerealSelect, selectedCereal, onAnalysisComplete }) => {
   const [cereals, setCereals] = useState([]);
+  const [query, setQuery] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [searchMode, setSearchMode] = useState('prefix');
   const [loading, setLoading] = useState(false);
   const [analyzing, setAnalyzing] = useState(false);
   const [notification, setNotification] = useState(null);
 
   useEffect(() => {
-    // Load cereals on mount
-    loadCereals();
-  }, []);
+    // Search as the user types (the first page loads on mount)
+    const timer = setTimeout(() => loadCereals(query), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [query]);
 
-  const loadCereals = async () => {
+  const loadCereals = async (text, cursor = null, mode = 'prefix') => {
+    setLoading(true);
     try {
-      const data = await getCereals();
-      setCereals(data);
+      let data = await searchCereals({ q: text, mode, cursor });
+      if (!cursor && mode === 'prefix' && text.trim() && data.results.length === 0) {
+        // Nothing starts with the query: retry tolerating typos
+        mode = 'fuzzy';
+        data = await searchCereals({ q: text, mode });
+      }
+      // Product IDs are only valid for the catalog version they came from
+      const results = data.results.map((cereal) => ({ ...cereal, catalogEtag: data.catalog_etag }));
+      setCereals((previous) => (cursor ? [...previous, ...results] : results));
+      setNextCursor(data.next_cursor);
+      setSearchMode(mode);
     } catch (error) {
       console.error('Failed to load cereals:', error);
       showNotification('Failed to load cereals', 'error');
+    } finally {
+      setLoading(false);
     }
   };
 
   const handleSelectChange = (e) => {
     const selectedBrand = e.target.value;
     if (selectedBrand) {
-      const cereal = cereals.find((c) => c.brand === selectedBrand);
+      const cereal = cereals.find((c) => c.brand === selectedBrand) || selectedCereal;
       onCerealSelect(cereal);
     } else {
       onCerealSelect(null);
@@ -46,10 +64,7 @@ const CerealSelector = ({ isEnabled, onCerealSelect, selectedCereal, onAnalysisC
     setAnalyzing(true);
 
     try {
-      const result = await analyzeIngredients(
-        selectedCereal.brand,
-        selectedCereal.ingredients
-      );
+      const result = await analyzeProduct(selectedCereal.id, selectedCereal.catalogEtag);
 
       if (result.success) {
         onAnalysisComplete(result);
@@ -94,19 +109,40 @@ const CerealSelector = ({ isEnabled, onCerealSelect, selectedCereal, onAnalysisC
               <span className="label-icon">📦</span>
               Select Cereal Brand
             </label>
+            <input
+              type="search"
+              className="cereal-select"
+              placeholder="Search brands..."
+              value={query}
+              onChange={(e) => setQuery(e.target.value)}
+            />
             <select
               id="cereal-select"
               className="cereal-select"
               onChange={handleSelectChange}
               value={selectedCereal?.brand || ''}
             >
-              <option value="">-- Choose a cereal --</option>
-              {cereals.map((cereal, index) => (
-                <option key={index} value={cereal.brand}>
+              <option value="">
+                {loading ? 'Searching...' : `-- Choose a cereal (${cereals.length}${nextCursor ? '+' : ''}) --`}
+              </option>
+              {selectedCereal && !cereals.some((c) => c.brand === selectedCereal.brand) && (
+                <option value={selectedCereal.brand}>{selectedCereal.brand}</option>
+              )}
+              {cereals.map((cereal) => (
+                <option key={cereal.id} value={cereal.brand}>
                   {cereal.brand}
                 </option>
               ))}
             </select>
+            {nextCursor && (
+              <button
+                className="analyze-btn"
+                onClick={() => loadCereals(query, nextCursor, searchMode)}
+                disabled={loading}
+              >
+                Load more
+              </button>
+            )}
           </div>
 
           {selectedCereal && (
@@ -1,7 +1,7 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { sendChatMessage } from '../services/api';
 
-const Chatbot = ({ cerealName, ingredients, analysisResult }) => {
+const Chatbot = ({ cerealName, ingredients, analysisResult, sessionId }) => {
   const [messages, setMessages] = useState([
     {
       role: 'assistant',
@@ -31,14 +31,30 @@ const Chatbot = ({ cerealName, ingredients, analysisResult }) => {
     setMessages((prev) => [...prev, { role: 'user', content: userMessage }]);
     setLoading(true);
 
+    // Without a server-side session, resend the analysis and history
+    const fullPayload = {
+      cereal_name: cerealName,
+      ingredients: ingredients,
+      previous_analysis: analysisResult,
+      question: userMessage,
+      chat_history: messages,
+    };
+
     try {
-      const response = await sendChatMessage({
-        cereal_name: cerealName,
-        ingredients: ingredients,
-        previous_analysis: analysisResult,
-        question: userMessage,
-        chat_history: messages,
-      });
+      let response;
+      if (sessionId) {
+        try {
+          response = await sendChatMessage({
+            session_id: sessionId,
+            question: userMessage,
+          });
+        } catch (error) {
+          if (!error.response?.data?.session_expired) throw error;
+          response = await sendChatMessage(fullPayload);
+        }
+      } else {
+        response = await sendChatMessage(fullPayload);
+      }
 
       if (response.success) {
         setMessages((prev) => [
@@ -19,11 +19,36 @@ export const getCereals = async () => {
   return response.data;
 };
 
+// Indexed catalog search; pass the previous response's next_cursor to
+// fetch the following page.
+export const searchCereals = async ({ q = '', mode = 'prefix', limit = 20, cursor } = {}) => {
+  const response = await api.get('/api/cereals/search', {
+    params: { q, mode, limit, ...(cursor ? { cursor } : {}) },
+  });
+  return response.data;
+};
+
 export const configureAPIKeys = async (config) => {
   const response = await api.post('/api/configure', config);
   return response.data;
 };
 
+// The backend builds the pipeline in the background; poll until the
+// requested configuration version is published or its build fails.
+export const waitForPipeline = async (version, intervalMs = 1000) => {
+  for (;;) {
+    const status = await checkSystemStatus();
+    const build = status.pipeline?.build || {};
+    if (build.version === version && build.state === 'ready') {
+      return { success: true, status };
+    }
+    if (build.version === version && build.state === 'failed') {
+      return { success: false, error: build.error };
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
+
 export const analyzeIngredients = async (cerealName, ingredients) => {
   const response = await api.post('/api/analyze', {
     cereal_name: cerealName,
@@ -32,6 +57,15 @@ export const analyzeIngredients = async (cerealName, ingredients) => {
   return response.data;
 };
 
+// Analyze a catalog product by ID; the backend looks up its ingredients.
+export const analyzeProduct = async (productId, catalogEtag) => {
+  const response = await api.post('/api/analyze', {
+    product_id: productId,
+    catalog_etag: catalogEtag,
+  });
+  return response.data;
+};
+
 export const sendChatMessage = async (chatData) => {
   const response = await api.post('/api/chat', chatData);
   return response.data;